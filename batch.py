@@ -0,0 +1,241 @@
+"""
+Пакетная обработка изображений без графического интерфейса.
+
+Применяет к набору файлов те же настройки, что и ползунки редактора
+(ширина, высота, яркость, контрастность, насыщенность, размытие).
+
+Пример:
+    python -m batch --recipe recipe.json --output out "photos/*.jpg" "scans/*.png"
+
+Файл рецепта - JSON со значениями в формате PhotoEditor.get_slider_values():
+    {"width": 1920, "height": 1080, "brightness": 1.1, "contrast": 1.0, "saturation": 1.2, "blur": 0}
+Ширина и высота необязательны: без них сохраняется исходный размер.
+"""
+import argparse
+import collections
+import concurrent.futures
+import glob
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures.process import BrokenProcessPool
+from utilities.image_processing import apply_adjustments, load_image, save_image
+from utilities.parallel import set_worker_count
+
+# Файл в выходном каталоге со списком уже обработанных изображений
+MANIFEST_NAME = ".batch_manifest.jsonl"
+
+DEFAULT_RECIPE = {"brightness": 1.0, "contrast": 1.0, "saturation": 1.0, "blur": 0}
+
+def load_recipe(recipe_path):
+    """
+    Загружает рецепт обработки из JSON-файла.
+
+    Args:
+        recipe_path (str): Путь к файлу рецепта.
+
+    Returns:
+        dict: Настройки с подставленными значениями по умолчанию.
+    """
+    with open(recipe_path, encoding="utf-8") as recipe_file:
+        recipe = json.load(recipe_file)
+    unknown = set(recipe) - set(DEFAULT_RECIPE) - {"width", "height"}
+    if unknown:
+        raise ValueError(f"Неизвестные параметры рецепта: {', '.join(sorted(unknown))}")
+    return {**DEFAULT_RECIPE, **recipe}
+
+def collect_inputs(patterns):
+    # Раскрытие шаблонов путей в отсортированный список файлов без повторов
+    paths = set()
+    for pattern in patterns:
+        paths.update(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+    return sorted(paths)
+
+def output_path_for(input_path, output_dir, output_format=None):
+    # Путь результата в выходном каталоге; расширение задает формат сохранения
+    stem, extension = os.path.splitext(os.path.basename(input_path))
+    if output_format:
+        extension = "." + output_format.lstrip(".").lower()
+    return os.path.join(output_dir, stem + extension)
+
+def init_worker():
+    # Инициализация рабочего процесса: процессы уже заняли все ядра, поэтому
+    # обработка полос внутри процесса идет в одном потоке (иначе потоков было бы ядра в квадрате)
+    set_worker_count(1)
+
+def process_file(input_path, output_path, recipe):
+    """
+    Обрабатывает один файл; выполняется в рабочем процессе.
+
+    Ошибки не выбрасываются, а возвращаются в результате, чтобы сбой одного
+    файла не останавливал обработку остальных.
+
+    Returns:
+        dict: Статус, размеры входного и выходного файлов, время и текст ошибки.
+    """
+    started = time.perf_counter()
+    result = {"input": input_path, "output": output_path, "input_bytes": 0, "output_bytes": 0, "error": None}
+    try:
+        result["input_bytes"] = os.path.getsize(input_path)
+        with load_image(input_path) as image:
+            width = recipe.get("width") or image.width
+            height = recipe.get("height") or image.height
+            adjusted_image = apply_adjustments(image, width, height, recipe["brightness"], recipe["contrast"], recipe["saturation"], recipe["blur"])
+
+        # save_image пишет во временный файл и атомарно заменяет результат:
+        # прерванный запуск не оставит обрезанный файл
+        result["output_bytes"] = save_image(adjusted_image, output_path)["bytes"]
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+def file_signature(input_path, recipe):
+    # Отпечаток входного файла и рецепта для продолжения после перезапуска
+    stat = os.stat(input_path)
+    recipe_hash = hashlib.sha1(json.dumps(recipe, sort_keys=True).encode("utf-8")).hexdigest()
+    return {"input": os.path.abspath(input_path), "mtime": stat.st_mtime_ns, "size": stat.st_size, "recipe": recipe_hash}
+
+def load_manifest(output_dir):
+    # Множество отпечатков уже обработанных файлов
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    completed = set()
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as manifest_file:
+            for line in manifest_file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Строка могла быть оборвана при аварийном завершении
+                    continue
+                # Файлы с ошибкой обрабатываются заново при следующем запуске
+                if record.get("status", "done") == "done":
+                    completed.add((record["input"], record["mtime"], record["size"], record["recipe"]))
+    return completed
+
+def write_manifest_record(manifest_file, signature, error=None):
+    # Запись результата файла в манифест сразу на диск
+    record = dict(signature, status="failed", error=error) if error else dict(signature, status="done")
+    manifest_file.write(json.dumps(record) + "\n")
+    manifest_file.flush()
+
+def run_batch(patterns, recipe, output_dir, workers=None, output_format=None, resume=True):
+    """
+    Обрабатывает все файлы, подходящие под шаблоны, в пуле процессов.
+
+    Args:
+        patterns (list): Шаблоны путей к входным файлам.
+        recipe (dict): Настройки обработки.
+        output_dir (str): Каталог для результатов.
+        workers (int): Число рабочих процессов (по умолчанию - число ядер).
+        output_format (str): Расширение выходных файлов или None, чтобы сохранить исходное.
+        resume (bool): Пропускать файлы, уже обработанные с тем же рецептом.
+
+    В пуле одновременно не больше workers файлов. Если рабочий процесс аварийно
+    завершается (сбой декодера, нехватка памяти), пул становится непригодным: файлы,
+    которые в нем обрабатывались, записываются в манифест как ошибочные (и будут
+    обработаны заново при следующем запуске), а остальные файлы обрабатываются в новом пуле.
+
+    Returns:
+        dict: Сводка: обработано, пропущено, ошибки, время, изображений/с, МБ/с.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    completed = load_manifest(output_dir) if resume else set()
+
+    jobs = []
+    seen_outputs = {}
+    skipped = 0
+    for input_path in collect_inputs(patterns):
+        output_path = output_path_for(input_path, output_dir, output_format)
+        if output_path in seen_outputs:
+            logging.warning(f"Пропуск {input_path}: результат совпадает с {seen_outputs[output_path]}")
+            skipped += 1
+            continue
+        seen_outputs[output_path] = input_path
+        signature = file_signature(input_path, recipe)
+        if tuple(signature.values()) in completed and os.path.exists(output_path):
+            skipped += 1
+            continue
+        jobs.append((input_path, output_path, signature))
+
+    summary = {"processed": 0, "skipped": skipped, "failed": 0, "errors": [], "input_bytes": 0, "output_bytes": 0}
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    pending = collections.deque(jobs)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(manifest_path, "a", encoding="utf-8") as manifest_file:
+        while pending:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+                _run_pool(executor, pending, workers, recipe, summary, manifest_file)
+
+    elapsed = time.perf_counter() - started
+    summary["seconds"] = elapsed
+    summary["images_per_second"] = summary["processed"] / elapsed if elapsed > 0 else 0.0
+    summary["megabytes_per_second"] = summary["input_bytes"] / 1024 / 1024 / elapsed if elapsed > 0 else 0.0
+    return summary
+
+def _run_pool(executor, pending, workers, recipe, summary, manifest_file):
+    # Обработка файлов из pending в пуле, пока они не кончатся или пул не сломается
+    running = {}
+    while pending or running:
+        while pending and len(running) < workers:
+            input_path, output_path, signature = pending.popleft()
+            running[executor.submit(process_file, input_path, output_path, recipe)] = (input_path, signature)
+        concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+        broken = False
+        for future in [future for future in running if future.done()]:
+            input_path, signature = running.pop(future)
+            if isinstance(future.exception(), BrokenProcessPool):
+                broken = True
+                running[future] = (input_path, signature)
+                continue
+            _record_result(summary, manifest_file, future.result(), signature)
+        if broken:
+            # Какой из файлов вызвал сбой, неизвестно: ошибочными считаются все, что были в пуле
+            for input_path, signature in running.values():
+                _record_failure(summary, manifest_file, input_path, signature,
+                                "BrokenProcessPool: рабочий процесс аварийно завершился")
+            logging.warning("Пул процессов пересоздается, осталось файлов: %d", len(pending))
+            return
+
+def _record_result(summary, manifest_file, result, signature):
+    if result["error"]:
+        _record_failure(summary, manifest_file, result["input"], signature, result["error"])
+        return
+    summary["processed"] += 1
+    summary["input_bytes"] += result["input_bytes"]
+    summary["output_bytes"] += result["output_bytes"]
+    write_manifest_record(manifest_file, signature)
+    logging.info(f"Обработано {result['input']} -> {result['output']} за {result['seconds']:.2f} с")
+
+def _record_failure(summary, manifest_file, input_path, signature, error):
+    summary["failed"] += 1
+    summary["errors"].append((input_path, error))
+    write_manifest_record(manifest_file, signature, error)
+    logging.error(f"Ошибка обработки {input_path}: {error}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m batch", description="Пакетная обработка изображений без графического интерфейса")
+    parser.add_argument("inputs", nargs="+", help="Шаблоны путей к входным файлам (glob, поддерживается **)")
+    parser.add_argument("--recipe", required=True, help="JSON-файл с настройками обработки")
+    parser.add_argument("--output", required=True, help="Каталог для результатов")
+    parser.add_argument("--workers", type=int, default=None, help="Число рабочих процессов (по умолчанию - число ядер)")
+    parser.add_argument("--format", dest="output_format", default=None, help="Формат результатов по расширению, например jpg или png")
+    parser.add_argument("--no-resume", action="store_true", help="Обработать заново уже обработанные файлы")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    recipe = load_recipe(args.recipe)
+    summary = run_batch(args.inputs, recipe, args.output, workers=args.workers, output_format=args.output_format, resume=not args.no_resume)
+
+    print(f"Обработано: {summary['processed']}, пропущено: {summary['skipped']}, ошибок: {summary['failed']}")
+    print(f"Время: {summary['seconds']:.2f} с, {summary['images_per_second']:.2f} изобр./с, {summary['megabytes_per_second']:.2f} МБ/с")
+    for input_path, error in summary["errors"]:
+        print(f"  {input_path}: {error}", file=sys.stderr)
+    return 1 if summary["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
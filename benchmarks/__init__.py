@@ -0,0 +1,15 @@
+"""
+Тесты производительности основных операций редактора без графического интерфейса.
+
+Пример:
+    python -m benchmarks run --sizes 1 4 16 --output baseline.json
+    python -m benchmarks run --sizes 1 4 16 --output current.json --compare baseline.json --threshold 0.2
+    python -m benchmarks compare baseline.json current.json
+    python -m benchmarks replay session.json --realtime --budget-ms 100
+
+Каждое сочетание (операция, режим, размер) выполняется в отдельном процессе, чтобы
+пиковый объем памяти (RSS) относился только к нему. Результаты - перцентили задержки,
+пропускная способность в мегапикселях в секунду и пиковый RSS - сохраняются в JSON.
+Команда replay воспроизводит записанную сессию (utilities.session_recorder) и выводит
+задержку от ввода до пикселей для каждого события.
+"""
@@ -0,0 +1,470 @@
+import argparse
+import json
+import logging
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from PIL import Image
+import PIL
+
+from utilities import parallel
+from utilities.image_processing import apply_adjustments, apply_blur, apply_color_adjustments, load_image, save_image
+from utilities.strokes import Stroke
+
+# Формат файла результатов; меняется при несовместимых изменениях
+RESULTS_VERSION = 1
+
+DEFAULT_SIZES = (1, 4, 16)
+DEFAULT_MODES = ("RGB", "RGBA", "L")
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.2
+DEFAULT_WORKERS = (1, 2, 4, 8, 16)
+
+PERCENTILES = (50, 90, 99)
+
+# Зарегистрированные операции: имя -> (функция подготовки, поддерживаемые режимы)
+CASES = {}
+
+def case(name, modes=None):
+    """
+    Регистрирует операцию для измерения.
+
+    Функция получает синтетическое изображение и рабочий каталог и возвращает пару
+    (prepare, action): prepare вызывается перед каждым замером и не измеряется,
+    action - измеряемое действие.
+    """
+    def register(function):
+        CASES[name] = (function, modes)
+        return function
+    return register
+
+def make_image(mode, megapixels, seed=0):
+    """
+    Создает воспроизводимое синтетическое изображение 4:3 с шумом и градиентами.
+
+    Args:
+        mode (str): Режим изображения ("RGB", "RGBA" или "L").
+        megapixels (float): Размер в мегапикселях.
+        seed (int): Зерно генератора шума.
+
+    Returns:
+        PIL.Image.Image: Изображение.
+    """
+    width = max(1, round(math.sqrt(megapixels * 1e6 * 4 / 3)))
+    height = max(1, round(width * 3 / 4))
+    # Плитка шума из зерна повторяется по всему изображению: быстро и одинаково при каждом запуске
+    tile = Image.frombytes("L", (256, 256), random.Random(seed).randbytes(256 * 256))
+    noise = Image.new("L", (width, height))
+    for y in range(0, height, 256):
+        for x in range(0, width, 256):
+            noise.paste(tile, (x, y))
+    gradient = Image.linear_gradient("L").resize((width, height), Image.BILINEAR)
+    radial = Image.radial_gradient("L").resize((width, height), Image.BILINEAR)
+    if mode == "L":
+        return Image.blend(noise, gradient, 0.5)
+    image = Image.merge("RGB", (noise, gradient, radial))
+    if mode == "RGBA":
+        image.putalpha(gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT))
+    return image
+
+def open_editor(image):
+    # Редактор без экрана с открытым изображением (импорт откладывается: он тянет модули интерфейса)
+    from utilities.headless import create_editor, open_document
+    return open_document(create_editor(), image)
+
+@case("apply_adjustments")
+def bench_apply_adjustments(image, work_dir):
+    width, height = int(image.width * 0.75), int(image.height * 0.75)
+    return None, lambda: apply_adjustments(image, width, height, 1.2, 1.1, 1.3, 2)
+
+@case("update_display_image")
+def bench_update_display_image(image, work_dir):
+    editor = open_editor(image)
+    return None, editor.update_display_image
+
+def edit_document(editor, positions):
+    # Штрих кисти и изменение яркости, еще не сохраненные в историю (не измеряется)
+    index = next(positions)
+    offset = index * 37 % max(1, editor.image.width - 64)
+    stroke = Stroke("#ff0000", 3)
+    stroke.add_point(offset, 10)
+    stroke.add_point(offset + 60, 50)
+    editor.draw_tab.drawn_items.append(stroke)
+    editor.filter_tab.brightness_scale.set(1.0 + (index % 50 + 1) / 100)
+    editor.apply_adjustments()
+
+@case("save_history")
+def bench_save_history(image, work_dir):
+    # Добавление версии графа со снимком изображения в историю
+    editor = open_editor(image)
+    positions = iter(range(10 ** 9))
+    return lambda: edit_document(editor, positions), editor.save_history
+
+def _undo_cases():
+    # Отмена с результатами рендера в кэше и после их вытеснения (изображение из снимка истории)
+    for name, evict in (("undo", False), ("undo_after_eviction", True)):
+        @case(name)
+        def bench_undo(image, work_dir, evict=evict):
+            editor = open_editor(image)
+            positions = iter(range(10 ** 9))
+
+            def prepare():
+                edit_document(editor, positions)
+                editor.save_history()
+                if evict:
+                    editor.render_cache.clear()
+            return prepare, editor.undo
+
+_undo_cases()
+
+@case("get_final_image")
+def bench_get_final_image(image, work_dir):
+    editor = open_editor(image)
+    draw_tab = editor.draw_tab
+    generator = random.Random(1)
+    width, height = editor.image.size
+    for _ in range(20):
+        stroke = Stroke("#ff0000", 5)
+        x, y = generator.randrange(width), generator.randrange(height)
+        for _ in range(100):
+            x = min(max(0, x + generator.randint(-15, 15)), width - 1)
+            y = min(max(0, y + generator.randint(-15, 15)), height - 1)
+            stroke.add_point(x, y)
+        draw_tab.drawn_items.append(stroke)
+    for index in range(5):
+        draw_tab.text_items.append({"id": None, "text": f"Подпись {index}", "font_family": "Arial", "font_size": 32,
+                                    "x": 50 + index * 40, "y": 50 + index * 60, "color": "#ffffff"})
+    return None, draw_tab.get_final_image
+
+def _file_cases(extension, modes):
+    # Загрузка и сохранение в формате extension
+    @case(f"load_{extension}", modes)
+    def bench_load(image, work_dir):
+        path = os.path.join(work_dir, f"input.{extension}")
+        save_image(image, path)
+
+        def action():
+            with load_image(path) as loaded:
+                loaded.load()
+        return None, action
+
+    @case(f"save_{extension}", modes)
+    def bench_save(image, work_dir):
+        path = os.path.join(work_dir, f"output.{extension}")
+        return None, lambda: save_image(image, path)
+
+_file_cases("png", None)
+_file_cases("jpg", ("RGB", "L"))
+
+def percentile(samples, percent):
+    # Перцентиль с линейной интерполяцией между соседними значениями
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * percent / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def peak_rss_bytes():
+    # Пиковый объем резидентной памяти текущего процесса или None, если узнать нельзя
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux сообщает килобайты, macOS - байты
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        pass
+    if sys.platform.startswith("win"):
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize
+    return None
+
+def run_case(name, mode, megapixels, repeat=DEFAULT_REPEAT, warmup=1):
+    """
+    Выполняет одну операцию в текущем процессе.
+
+    Returns:
+        dict: Замеры, перцентили, пропускная способность и пиковый RSS.
+    """
+    function, _ = CASES[name]
+    image = make_image(mode, megapixels)
+    with tempfile.TemporaryDirectory(prefix="photo_editor_bench_") as work_dir:
+        prepare, action = function(image, work_dir)
+        samples = []
+        for index in range(warmup + repeat):
+            if prepare:
+                prepare()
+            started = time.perf_counter()
+            action()
+            elapsed = time.perf_counter() - started
+            if index >= warmup:
+                samples.append(elapsed)
+    result = {"case": name, "mode": mode, "megapixels": megapixels, "size": list(image.size), "samples": samples}
+    for percent in PERCENTILES:
+        result[f"p{percent}"] = percentile(samples, percent)
+    result["mean"] = sum(samples) / len(samples)
+    result["min"] = min(samples)
+    result["max"] = max(samples)
+    pixels = image.width * image.height / 1e6
+    result["megapixels_per_second"] = pixels / result["p50"] if result["p50"] > 0 else None
+    peak = peak_rss_bytes()
+    result["peak_rss_mb"] = peak / 1024 / 1024 if peak is not None else None
+    return result
+
+def run_case_subprocess(name, mode, megapixels, repeat, warmup):
+    # Выполнение операции в отдельном процессе: пиковый RSS не смешивается с другими операциями
+    command = [sys.executable, "-m", "benchmarks", "case", name, mode, str(megapixels), "--repeat", str(repeat), "--warmup", str(warmup)]
+    project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    completed = subprocess.run(command, capture_output=True, text=True, cwd=project_dir)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{name} {mode} {megapixels} МП: {completed.stderr.strip()}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def run_suite(cases=None, modes=DEFAULT_MODES, sizes=DEFAULT_SIZES, repeat=DEFAULT_REPEAT, warmup=1, isolated=True, progress=None):
+    """
+    Выполняет набор операций для всех сочетаний режимов и размеров.
+
+    Args:
+        cases (list): Имена операций (по умолчанию - все).
+        modes (list): Режимы изображений.
+        sizes (list): Размеры изображений в мегапикселях.
+        repeat (int): Число замеров каждой операции.
+        warmup (int): Число неизмеряемых прогонов перед замерами.
+        isolated (bool): Выполнять каждую операцию в отдельном процессе.
+        progress (callable): Вызывается с результатом каждой операции.
+
+    Returns:
+        dict: Результаты в формате файла базовой линии.
+    """
+    results = []
+    for name in cases or sorted(CASES):
+        supported_modes = CASES[name][1]
+        for mode in modes:
+            if supported_modes and mode not in supported_modes:
+                continue
+            for megapixels in sizes:
+                if isolated:
+                    result = run_case_subprocess(name, mode, megapixels, repeat, warmup)
+                else:
+                    result = run_case(name, mode, megapixels, repeat, warmup)
+                results.append(result)
+                if progress:
+                    progress(result)
+    return {
+        "version": RESULTS_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {"python": platform.python_version(), "pillow": PIL.__version__, "platform": platform.platform(),
+                        "processor": platform.processor(), "cpu_count": os.cpu_count(), "workers": parallel.get_worker_count()},
+        "results": results,
+    }
+
+def result_key(result):
+    return result["case"], result["mode"], float(result["megapixels"])
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD, rss_threshold=None):
+    """
+    Сравнивает результаты с базовой линией.
+
+    Операция считается регрессией, если ее медианная задержка (или пиковый RSS при
+    заданном rss_threshold) выросла больше чем в (1 + порог) раз.
+
+    Returns:
+        tuple: (строки сравнения, список регрессий).
+    """
+    baseline_results = {result_key(result): result for result in baseline["results"]}
+    rows = []
+    regressions = []
+    for result in current["results"]:
+        reference = baseline_results.get(result_key(result))
+        if reference is None:
+            rows.append((result_key(result), None, result["p50"], None, "нет в базовой линии"))
+            continue
+        ratio = result["p50"] / reference["p50"] if reference["p50"] else None
+        status = "ok"
+        if ratio is not None and ratio > 1 + threshold:
+            status = "регрессия времени"
+            regressions.append((result_key(result), "p50", reference["p50"], result["p50"]))
+        if rss_threshold is not None and reference.get("peak_rss_mb") and result.get("peak_rss_mb"):
+            if result["peak_rss_mb"] > reference["peak_rss_mb"] * (1 + rss_threshold):
+                status = "регрессия памяти" if status == "ok" else status + ", памяти"
+                regressions.append((result_key(result), "peak_rss_mb", reference["peak_rss_mb"], result["peak_rss_mb"]))
+        rows.append((result_key(result), reference["p50"], result["p50"], ratio, status))
+    return rows, regressions
+
+def format_result(result):
+    rss = f"{result['peak_rss_mb']:.0f} МБ" if result.get("peak_rss_mb") is not None else "-"
+    return (f"{result['case']:<22} {result['mode']:<5} {result['megapixels']:>6} МП  "
+            f"p50 {result['p50'] * 1000:9.1f} мс  p90 {result['p90'] * 1000:9.1f} мс  p99 {result['p99'] * 1000:9.1f} мс  "
+            f"{result['megapixels_per_second'] or 0:8.1f} МП/с  RSS {rss}")
+
+def print_comparison(rows, regressions):
+    for (name, mode, megapixels), before, after, ratio, status in rows:
+        before_text = f"{before * 1000:9.1f} мс" if before is not None else " " * 12
+        ratio_text = f"{ratio:6.2f}x" if ratio is not None else " " * 7
+        print(f"{name:<22} {mode:<5} {megapixels:>6} МП  {before_text} -> {after * 1000:9.1f} мс  {ratio_text}  {status}")
+    if regressions:
+        print(f"Регрессий: {len(regressions)}", file=sys.stderr)
+
+def run_scaling(mode="RGB", megapixels=50, workers=DEFAULT_WORKERS, repeat=3, progress=None):
+    """
+    Измеряет ускорение цветокоррекции и размытия от числа потоков обработки.
+
+    Args:
+        mode (str): Режим изображения.
+        megapixels (float): Размер изображения в мегапикселях.
+        workers (list): Числа потоков; ускорение считается относительно первого.
+        repeat (int): Число замеров; берется медиана.
+        progress (callable): Вызывается с каждой строкой результата.
+
+    Returns:
+        list: Словари с полями workers, color_s, blur_s, total_s и speedup.
+    """
+    image = make_image(mode, megapixels)
+    previous = parallel.get_worker_count()
+    rows = []
+    try:
+        for count in workers:
+            parallel.set_worker_count(count)
+            timings = {}
+            for name, action in (("color", lambda: apply_color_adjustments(image, 1.2, 1.1, 1.3)),
+                                 ("blur", lambda: apply_blur(image, 3))):
+                action()
+                samples = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    action()
+                    samples.append(time.perf_counter() - started)
+                timings[name] = percentile(samples, 50)
+            total = timings["color"] + timings["blur"]
+            row = {"workers": count, "color_s": timings["color"], "blur_s": timings["blur"], "total_s": total,
+                   "speedup": rows[0]["total_s"] / total if rows else 1.0}
+            rows.append(row)
+            if progress:
+                progress(row)
+    finally:
+        parallel.set_worker_count(previous)
+    return rows
+
+def load_results(path):
+    with open(path, encoding="utf-8") as results_file:
+        results = json.load(results_file)
+    if results.get("version") != RESULTS_VERSION:
+        raise ValueError(f"Неподдерживаемая версия файла результатов {path}: {results.get('version')}")
+    return results
+
+def replay(args):
+    # Воспроизведение сессии: задержка каждого события и перцентили по методам
+    from utilities.session_recorder import load_session, replay_session, summarize_latency
+    image = Image.open(args.image) if args.image else None
+    _, results = replay_session(load_session(args.session), image=image, realtime=args.realtime)
+    if args.events:
+        for result in results:
+            latency = "-" if result["latency_ms"] is None else f"{result['latency_ms']:.1f}"
+            print(f"{result['index']:>5}  {result['target'] + '.' + result['method']:<32} обработчик {result['handler_ms']:>8.1f} мс  до пикселей {latency:>8} мс")
+    summary = summarize_latency(results)
+    for name, stats in summary.items():
+        print(f"{name:<32} n={stats['count']:<5} p50 {stats['p50_ms']:>8.1f} мс  p90 {stats['p90_ms']:>8.1f} мс  "
+              f"p99 {stats['p99_ms']:>8.1f} мс  макс {stats['max_ms']:>8.1f} мс")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump({"session": args.session, "events": results, "summary": summary}, output_file, indent=2, ensure_ascii=False)
+    over_budget = [result for result in results if args.budget_ms is not None
+                   and (result["latency_ms"] is None or result["latency_ms"] > args.budget_ms)]
+    for result in over_budget:
+        print(f"ПРЕВЫШЕНИЕ: событие {result['index']} {result['target']}.{result['method']}: {result['latency_ms']} мс")
+    return 1 if over_budget else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Тесты производительности редактора без графического интерфейса")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Выполнить набор операций")
+    run_parser.add_argument("--cases", nargs="+", choices=sorted(CASES), help="Операции (по умолчанию - все)")
+    run_parser.add_argument("--modes", nargs="+", default=list(DEFAULT_MODES), choices=DEFAULT_MODES, help="Режимы изображений")
+    run_parser.add_argument("--sizes", nargs="+", type=float, default=list(DEFAULT_SIZES), help="Размеры изображений в мегапикселях, например 1 4 16 50 100")
+    run_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Число замеров каждой операции")
+    run_parser.add_argument("--warmup", type=int, default=1, help="Число прогонов без замера")
+    run_parser.add_argument("--output", help="JSON-файл для результатов")
+    run_parser.add_argument("--compare", help="JSON-файл базовой линии для сравнения")
+    run_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Допустимый рост медианной задержки (0.2 = 20%%)")
+    run_parser.add_argument("--rss-threshold", type=float, default=None, help="Допустимый рост пикового RSS; без него память не сравнивается")
+    run_parser.add_argument("--in-process", action="store_true", help="Выполнять операции в текущем процессе (RSS будет общим)")
+
+    compare_parser = commands.add_parser("compare", help="Сравнить два файла результатов")
+    compare_parser.add_argument("baseline", help="JSON-файл базовой линии")
+    compare_parser.add_argument("current", help="JSON-файл текущих результатов")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Допустимый рост медианной задержки (0.2 = 20%%)")
+    compare_parser.add_argument("--rss-threshold", type=float, default=None, help="Допустимый рост пикового RSS")
+
+    case_parser = commands.add_parser("case", help="Выполнить одну операцию и вывести JSON (используется командой run)")
+    case_parser.add_argument("name", choices=sorted(CASES))
+    case_parser.add_argument("mode", choices=DEFAULT_MODES)
+    case_parser.add_argument("megapixels", type=float)
+    case_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    case_parser.add_argument("--warmup", type=int, default=1)
+
+    replay_parser = commands.add_parser("replay", help="Воспроизвести записанную сессию и измерить задержку от ввода до пикселей")
+    replay_parser.add_argument("session", help="JSON-файл сессии (PHOTO_EDITOR_RECORD=session.json python main.py)")
+    replay_parser.add_argument("--image", help="Изображение вместо исходного, если запись начата с открытым файлом")
+    replay_parser.add_argument("--realtime", action="store_true", help="Соблюдать интервалы между событиями, как при записи")
+    replay_parser.add_argument("--events", action="store_true", help="Вывести задержку каждого события")
+    replay_parser.add_argument("--budget-ms", type=float, default=None, help="Допустимая задержка события; при превышении код возврата 1")
+    replay_parser.add_argument("--output", help="JSON-файл для результатов")
+
+    scaling_parser = commands.add_parser("scaling", help="Ускорение цветокоррекции и размытия от числа потоков")
+    scaling_parser.add_argument("--mode", default="RGB", choices=DEFAULT_MODES, help="Режим изображения")
+    scaling_parser.add_argument("--size", type=float, default=50, help="Размер изображения в мегапикселях")
+    scaling_parser.add_argument("--workers", nargs="+", type=int, default=list(DEFAULT_WORKERS), help="Числа потоков")
+    scaling_parser.add_argument("--repeat", type=int, default=3, help="Число замеров")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.command == "case":
+        print(json.dumps(run_case(args.name, args.mode, args.megapixels, args.repeat, args.warmup)))
+        return 0
+
+    if args.command == "replay":
+        return replay(args)
+
+    if args.command == "scaling":
+        print(f"{os.cpu_count()} ядер, {args.mode} {args.size} МП")
+        run_scaling(args.mode, args.size, args.workers, args.repeat,
+                    progress=lambda row: print(f"{row['workers']:>3} потоков: цвет {row['color_s'] * 1000:>8.1f} мс  размытие {row['blur_s'] * 1000:>8.1f} мс  "
+                                               f"ускорение {row['speedup']:.2f}x", flush=True))
+        return 0
+
+    if args.command == "compare":
+        rows, regressions = compare_results(load_results(args.baseline), load_results(args.current), args.threshold, args.rss_threshold)
+        print_comparison(rows, regressions)
+        return 1 if regressions else 0
+
+    results = run_suite(args.cases, args.modes, args.sizes, args.repeat, args.warmup, isolated=not args.in_process,
+                        progress=lambda result: print(format_result(result), flush=True))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(results, output_file, indent=2, ensure_ascii=False)
+    if args.compare:
+        rows, regressions = compare_results(load_results(args.compare), results, args.threshold, args.rss_threshold)
+        print_comparison(rows, regressions)
+        return 1 if regressions else 0
+    return 0
@@ -1,20 +1,32 @@
 import logging
 import collections
 from tkinter import ttk, colorchooser, simpledialog, font
-from PIL import Image, ImageDraw, ImageFont, ImageOps
+from PIL import Image, ImageOps
+from utilities.strokes import Stroke, DEFAULT_SIMPLIFY_TOLERANCE
+from utilities.fonts import get_font_index
+from utilities.profiling import timed
+from utilities.edit_graph import draw_strokes, draw_texts
 
 class DrawTab:
     def __init__(self, notebook, editor):
         logging.info("Инициализация DrawTab")
         self.editor = editor
         self.frame = ttk.Frame(notebook, style="TFrame")
+        self.init_state()
+        self.setup_ui()
+        self.bind_text_events("text_item")
 
+    def init_state(self):
+        # Состояние рисования, не связанное с виджетами вкладки
         self.drawing = False
         self.color = "#000000"
         self.brush_size = 3
         self.start_x = None
         self.start_y = None
+        # Штрихи (Stroke), по одному на каждое нажатие кисти
         self.drawn_items = []
+        self.current_stroke = None
+        self.simplify_tolerance = DEFAULT_SIMPLIFY_TOLERANCE
         self.text_items = []
         self.selected_text = None
         self.selected_text_item = None
@@ -23,7 +35,12 @@ class DrawTab:
         self.history = collections.deque(maxlen=20)
         self.redo_stack = collections.deque(maxlen=20)
 
-        self.setup_ui()
+        # Сцена холста сохраняется между перерисовками: элементы создаются один раз,
+        # а при изменении масштаба только преобразуются их координаты
+        self.background_item = None
+        self.scene_scale = 1.0
+        self.scene_strokes = []
+        self.stroke_items = []
 
     def setup_ui(self):
         logging.info("Настройка UI для DrawTab")
@@ -53,7 +70,8 @@ class DrawTab:
         # Комбобокс для выбора шрифта
         self.font_label = ttk.Label(self.frame, text="Шрифт")
         self.font_label.pack(pady=5)
-        self.font_combobox = ttk.Combobox(self.frame, values=font.families())
+        # Список семейств берется из индекса шрифтов, которыми затем рисуется текст
+        self.font_combobox = ttk.Combobox(self.frame, values=get_font_index().families() or sorted(font.families()))
         self.font_combobox.pack(pady=5)
         self.font_combobox.set("Arial")
         self.editor.add_tooltip(self.font_combobox, "Выбрать шрифт для текста")
@@ -88,30 +106,37 @@ class DrawTab:
             self.editor.image_canvas.unbind("<ButtonRelease-1>")
 
     def paint(self, event):
-        # Рисование на изображении
-        if self.start_x and self.start_y:
+        # Рисование на изображении; координаты сегментов хранятся в пикселях изображения
+        # Пиксели изображения не изменяются: штрих показывается на холсте, а в итоговое
+        # изображение попадает через узел strokes графа правки
+        if self.start_x is not None and self.start_y is not None:
             x1, y1 = (self.start_x, self.start_y)
-            x2, y2 = (event.x, event.y)
-            self.draw_line(x1, y1, x2, y2)
+            x2, y2 = (round(event.x / self.scene_scale), round(event.y / self.scene_scale))
+            # Временный сегмент; по завершении штриха сегменты заменяются одной ломаной
+            self.editor.image_canvas.create_line(x1 * self.scene_scale, y1 * self.scene_scale, event.x, event.y, fill=self.color, width=self.brush_size,
+                                                 capstyle="round", tags=("scene", "active_stroke"))
             self.start_x, self.start_y = x2, y2
 
-            self.drawn_items.append((x1, y1, x2, y2, self.color, self.brush_size))
-            logging.debug(f"Рисование линии: ({x1}, {y1}) -> ({x2}, {y2}), цвет: {self.color}, размер кисти: {self.brush_size}")
+            if self.current_stroke is None:
+                self.current_stroke = Stroke(self.color, self.brush_size, (x1, y1))
+                self.drawn_items.append(self.current_stroke)
+            self.current_stroke.add_point(x2, y2)
+            logging.debug("Рисование линии: (%s, %s) -> (%s, %s), цвет: %s, размер кисти: %s", x1, y1, x2, y2, self.color, self.brush_size)
         else:
-            self.start_x, self.start_y = event.x, event.y
+            self.start_x, self.start_y = (round(event.x / self.scene_scale), round(event.y / self.scene_scale))
 
     def reset(self, event):
-        # Сброс координат рисования
+        # Сброс координат рисования и завершение штриха
         self.start_x, self.start_y = None, None
         logging.debug("Сброс координат рисования")
+        if self.current_stroke is not None:
+            if self.simplify_tolerance > 0 and self.drawn_items and self.drawn_items[-1] is self.current_stroke:
+                self.drawn_items[-1] = self.current_stroke.simplified(self.simplify_tolerance)
+                logging.debug("Штрих упрощен: %d -> %d точек", len(self.current_stroke), len(self.drawn_items[-1]))
+            self.current_stroke = None
+        self.sync_strokes()
         self.save_history()
 
-    def draw_line(self, x1, y1, x2, y2):
-        # Отрисовка линии на изображении
-        draw = ImageDraw.Draw(self.editor.image)
-        draw.line((x1, y1, x2, y2), fill=self.color, width=self.brush_size)
-        self.editor.update_display_image()
-
     def add_text(self):
         # Добавление текста на изображение
         text = simpledialog.askstring("Добавить текст", "Введите текст:")
@@ -124,31 +149,19 @@ class DrawTab:
             self.update_text_on_canvas(self.text_items[-1])
             self.save_history()
 
-    def draw_text(self, text, font_family, font_size, x, y, color):
-        # Отрисовка текста на изображении
-        draw = ImageDraw.Draw(self.editor.image)
-        try:
-            font_path = f"C:/Windows/Fonts/{font_family}.ttf"
-            font = ImageFont.truetype(font_path, font_size)
-        except IOError:
-            font = ImageFont.load_default()
-        draw.text((x, y), text, font=font, fill=color)
-        self.editor.update_display_image()
-
     def update_text_on_canvas(self, text_item):
-        # Обновление текста на холсте
+        # Создание текста на холсте; события привязаны к общему тегу text_item
         text_item["id"] = self.editor.image_canvas.create_text(
-            text_item["x"], text_item["y"],
+            text_item["x"] * self.scene_scale, text_item["y"] * self.scene_scale,
             text=text_item["text"], font=(text_item["font_family"], text_item["font_size"]),
-            fill=text_item["color"], anchor="nw"
+            fill=text_item["color"], anchor="nw", tags=("scene", "text_item")
         )
-        self.bind_text_events(text_item["id"])
 
-    def bind_text_events(self, text_id):
-        # Привязка событий к тексту на холсте
-        self.editor.image_canvas.tag_bind(text_id, "<ButtonPress-1>", self.select_text)
-        self.editor.image_canvas.tag_bind(text_id, "<B1-Motion>", self.drag_text)
-        self.editor.image_canvas.tag_bind(text_id, "<ButtonRelease-1>", self.release_text)
+    def bind_text_events(self, tag):
+        # Привязка событий к тексту на холсте (к элементу или тегу)
+        self.editor.image_canvas.tag_bind(tag, "<ButtonPress-1>", self.select_text)
+        self.editor.image_canvas.tag_bind(tag, "<B1-Motion>", self.drag_text)
+        self.editor.image_canvas.tag_bind(tag, "<ButtonRelease-1>", self.release_text)
 
     def select_text(self, event):
         # Выбор текстового элемента
@@ -166,9 +179,9 @@ class DrawTab:
         # Перемещение текстового элемента
         if self.dragging and self.selected_text:
             self.editor.image_canvas.coords(self.selected_text, event.x, event.y)
-            self.selected_text_item["x"] = event.x
-            self.selected_text_item["y"] = event.y
-            logging.debug(f"Перемещение текста с ID {self.selected_text}: ({event.x}, {event.y})")
+            self.selected_text_item["x"] = round(event.x / self.scene_scale)
+            self.selected_text_item["y"] = round(event.y / self.scene_scale)
+            logging.debug("Перемещение текста с ID %s: (%s, %s)", self.selected_text, event.x, event.y)
 
     def release_text(self, event):
         # Завершение перемещения текстового элемента
@@ -177,45 +190,95 @@ class DrawTab:
         logging.debug("Завершение перемещения текста")
         self.save_history()
 
+    @timed("redraw")
     def redraw_items(self):
-        # Перерисовка элементов на холсте
-        logging.info("Перерисовка элементов на Canvas")
-        self.editor.image_canvas.delete("all")
+        # Обновление сцены на холсте без пересоздания неизменившихся элементов
+        logging.debug("Перерисовка элементов на Canvas")
+        canvas = self.editor.image_canvas
         if self.editor.display_image:
-            self.editor.image_canvas.create_image(0, 0, anchor="nw", image=self.editor.display_image)
-        for item in self.drawn_items:
-            x1, y1, x2, y2, color, brush_size = item
-            logging.debug(f"Перерисовка линии: ({x1}, {y1}) -> ({x2}, {y2}), цвет: {color}, размер кисти: {brush_size}")
-            self.editor.image_canvas.create_line(x1, y1, x2, y2, fill=color, width=brush_size, capstyle="round", smooth=True)
+            if self.background_item is None or not canvas.type(self.background_item):
+                self.background_item = canvas.create_image(0, 0, anchor="nw", image=self.editor.display_image, tags="background")
+            else:
+                canvas.itemconfig(self.background_item, image=self.editor.display_image)
+            canvas.tag_lower(self.background_item)
+
+        # При изменении масштаба отображения все элементы сцены преобразуются одной командой
+        scale = self.editor.display_scale or 1.0
+        if scale != self.scene_scale:
+            factor = scale / self.scene_scale
+            canvas.scale("scene", 0, 0, factor, factor)
+            self.scene_scale = scale
+            logging.debug("Масштаб сцены: %s", scale)
+
+        self.sync_strokes()
+        self.sync_texts()
+
+    def sync_strokes(self):
+        # Приведение линий на холсте к drawn_items: совпадающие штрихи остаются на месте,
+        # новые и изменившиеся создаются заново, по одной ломаной на штрих
+        canvas = self.editor.image_canvas
+        canvas.delete("active_stroke")
+        items = self.drawn_items
+        common = 0
+        limit = min(len(items), len(self.scene_strokes))
+        while common < limit and items[common] is self.scene_strokes[common][0] and len(items[common]) == self.scene_strokes[common][1]:
+            common += 1
+
+        for item_id in self.stroke_items[common:]:
+            canvas.delete(item_id)
+        del self.stroke_items[common:]
+
+        scale = self.scene_scale
+        for stroke in items[common:]:
+            points = [coordinate * scale for coordinate in stroke.points]
+            item_id = canvas.create_line(*points, fill=stroke.color, width=stroke.brush_size, capstyle="round", joinstyle="round", tags=("scene", "stroke"))
+            self.stroke_items.append(item_id)
+            logging.debug("Штрих из %d точек, цвет: %s, размер кисти: %s", len(stroke), stroke.color, stroke.brush_size)
+        self.scene_strokes = [(stroke, len(stroke)) for stroke in items]
+
+    def sync_texts(self):
+        # Приведение текста на холсте к text_items с сохранением существующих элементов
+        canvas = self.editor.image_canvas
+        live_ids = set()
         for text_item in self.text_items:
-            logging.debug(f"Перерисовка текста с ID {text_item['id']}: '{text_item['text']}', координаты: ({text_item['x']}, {text_item['y']})")
-            self.update_text_on_canvas(text_item)
+            if text_item["id"] is not None and canvas.type(text_item["id"]) == "text":
+                canvas.coords(text_item["id"], text_item["x"] * self.scene_scale, text_item["y"] * self.scene_scale)
+            else:
+                logging.debug("Создание текста '%s', координаты: (%s, %s)", text_item["text"], text_item["x"], text_item["y"])
+                self.update_text_on_canvas(text_item)
+            live_ids.add(text_item["id"])
+        for item_id in canvas.find_withtag("text_item"):
+            if item_id not in live_ids:
+                canvas.delete(item_id)
 
     def get_final_image(self):
         # Получение финального изображения с нарисованными элементами и текстом
-        logging.info("Получение финального изображения")
-        final_image = self.editor.image.copy()
-        draw = ImageDraw.Draw(final_image)
+        return self.final_image_job()()
 
-        for item in self.drawn_items:
-            x1, y1, x2, y2, color, brush_size = item
-            draw.line((x1, y1, x2, y2), fill=color, width=brush_size)
+    def final_image_job(self):
+        # Функция без аргументов, собирающая финальное изображение из текущего состояния;
+        # штрихи и текст запоминаются сразу, поэтому ее можно выполнить позже в другом потоке
+        image = self.editor.image
+        strokes = list(self.drawn_items)
+        text_items = [dict(item) for item in self.text_items]
 
-        for text_item in self.text_items:
-            try:
-                font_path = f"C:/Windows/Fonts/{text_item['font_family']}.ttf"
-                font = ImageFont.truetype(font_path, text_item["font_size"])
-            except IOError:
-                font = ImageFont.load_default()
-            draw.text((text_item["x"], text_item["y"]), text_item["text"], fill=text_item["color"], font=font)
+        def build():
+            logging.info("Получение финального изображения")
+            # Штрихи и текст - последние узлы графа правки; на экране они показаны элементами холста
+            final_image = image.copy()
+            draw_strokes(final_image, strokes)
+            draw_texts(final_image, text_items)
+            return final_image
 
-        return final_image
+        return build
 
     def save_history(self):
-        # Сохранение текущего состояния всех элементов в историю
+        # Сохранение текущего состояния всех элементов в историю; завершенный штрих или
+        # перемещение текста сразу попадает в граф правки редактора
         self.history.append((list(self.drawn_items), list(self.text_items)))
         self.redo_stack.clear()
-        logging.debug(f"История сохранена. Текущая история: {self.history}")
+        logging.debug("История сохранена. Текущая история: %s", self.history)
+        self.editor.save_history()
 
     def undo(self):
         # Отмена последнего действия
@@ -223,7 +286,7 @@ class DrawTab:
             self.redo_stack.append((list(self.drawn_items), list(self.text_items)))
             self.drawn_items, self.text_items = self.history.pop()
             self.redraw_items()
-            logging.debug(f"Отмена действия. Текущая история: {self.history}")
+            logging.debug("Отмена действия. Текущая история: %s", self.history)
 
     def redo(self):
         # Повтор последнего отмененного действия
@@ -231,4 +294,4 @@ class DrawTab:
             self.history.append((list(self.drawn_items), list(self.text_items)))
             self.drawn_items, self.text_items = self.redo_stack.pop()
             self.redraw_items()
-            logging.debug(f"Повтор действия. Текущая история: {self.history}")
+            logging.debug("Повтор действия. Текущая история: %s", self.history)
@@ -54,18 +54,18 @@ class EditTab:
     def update_width(self, event=None):
         # Обновление ширины изображения
         self.width_value_label.config(text=str(int(self.width_scale.get())))
-        self.apply_adjustments()
-        logging.info(f"Обновление ширины изображения: {self.width_scale.get()}")
+        self.apply_adjustments(interactive=True)
+        logging.info("Обновление ширины изображения: %s", self.width_scale.get())
 
     def update_height(self, event=None):
         # Обновление высоты изображения
         self.height_value_label.config(text=str(int(self.height_scale.get())))
-        self.apply_adjustments()
-        logging.info(f"Обновление высоты изображения: {self.height_scale.get()}")
+        self.apply_adjustments(interactive=True)
+        logging.info("Обновление высоты изображения: %s", self.height_scale.get())
 
-    def apply_adjustments(self):
-        # Применение изменений к изображению
-        self.editor.apply_adjustments()
+    def apply_adjustments(self, interactive=False):
+        # Применение изменений к изображению (interactive - предпросмотр во время перемещения ползунка)
+        self.editor.apply_adjustments(interactive=interactive)
 
     def save_width(self, event):
         # Сохранение состояния после изменения ширины
@@ -150,10 +150,7 @@ class EditTab:
         # Применение поворота изображения
         try:
             angle = float(self.angle_entry.get())
-            self.editor.image = self.editor.image.rotate(angle, expand=True)
-            self.editor.original_image = self.editor.image.copy()  # Обновить оригинальное изображение
-            self.editor.save_history()
-            self.editor.update_display_image()
+            self.editor.rotate_image(angle)
             self.clear_additional_controls()
             self.rotate_button.config(text='Повернуть')
             logging.info(f"Поворот изображения на угол: {angle}")
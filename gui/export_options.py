@@ -0,0 +1,85 @@
+import logging
+from tkinter import Toplevel, BooleanVar, StringVar
+from tkinter import ttk
+from utilities.image_processing import ENCODER_DEFAULTS, JPEG_SUBSAMPLING
+
+class ExportOptionsDialog:
+    """Окно параметров кодировщиков JPEG и PNG для сохранения изображения."""
+
+    def __init__(self, editor):
+        logging.info("Открытие параметров сохранения")
+        self.editor = editor
+        options = {**ENCODER_DEFAULTS, **editor.encoder_options}
+        self.window = Toplevel(editor.root)
+        self.window.title("Параметры сохранения")
+        self.window.configure(bg="#2E3440")
+        self.frame = ttk.Frame(self.window, style="TFrame")
+        self.frame.pack(fill="both", expand=True, padx=10, pady=10)
+
+        # Параметры JPEG
+        ttk.Label(self.frame, text="JPEG").grid(row=0, column=0, columnspan=2, sticky="w", pady=(0, 5))
+        ttk.Label(self.frame, text="Качество").grid(row=1, column=0, sticky="w")
+        self.quality_value_label = ttk.Label(self.frame, text=str(options["jpeg_quality"]))
+        self.quality_value_label.grid(row=1, column=2, sticky="e")
+        self.quality_scale = ttk.Scale(self.frame, from_=1, to=95, orient="horizontal",
+                                       command=lambda value: self.quality_value_label.config(text=str(int(float(value)))))
+        self.quality_scale.set(options["jpeg_quality"])
+        self.quality_scale.grid(row=1, column=1, sticky="we", padx=5)
+        editor.add_tooltip(self.quality_scale, "Качество JPEG: больше - лучше изображение и больше файл")
+
+        self.progressive = BooleanVar(value=options["jpeg_progressive"])
+        progressive_check = ttk.Checkbutton(self.frame, text="Прогрессивный", variable=self.progressive)
+        progressive_check.grid(row=2, column=0, columnspan=3, sticky="w")
+        editor.add_tooltip(progressive_check, "Изображение в браузере проявляется постепенно; кодирование дольше")
+
+        self.optimize = BooleanVar(value=options["jpeg_optimize"])
+        optimize_check = ttk.Checkbutton(self.frame, text="Оптимизировать таблицы Хаффмана", variable=self.optimize)
+        optimize_check.grid(row=3, column=0, columnspan=3, sticky="w")
+        editor.add_tooltip(optimize_check, "Файл меньше на несколько процентов без потери качества; кодирование дольше")
+
+        ttk.Label(self.frame, text="Цветность").grid(row=4, column=0, sticky="w")
+        self.subsampling = StringVar(value=options["jpeg_subsampling"])
+        subsampling_combobox = ttk.Combobox(self.frame, textvariable=self.subsampling, values=JPEG_SUBSAMPLING, state="readonly", width=8)
+        subsampling_combobox.grid(row=4, column=1, sticky="w", padx=5)
+        editor.add_tooltip(subsampling_combobox, "4:4:4 - цвет без прореживания (четче мелкие цветные детали), 4:2:0 - меньше файл")
+
+        # Параметры PNG
+        ttk.Label(self.frame, text="PNG").grid(row=5, column=0, columnspan=2, sticky="w", pady=(10, 5))
+        ttk.Label(self.frame, text="Сжатие").grid(row=6, column=0, sticky="w")
+        self.compress_value_label = ttk.Label(self.frame, text=str(options["png_compress_level"]))
+        self.compress_value_label.grid(row=6, column=2, sticky="e")
+        self.compress_scale = ttk.Scale(self.frame, from_=0, to=9, orient="horizontal",
+                                        command=lambda value: self.compress_value_label.config(text=str(int(float(value)))))
+        self.compress_scale.set(options["png_compress_level"])
+        self.compress_scale.grid(row=6, column=1, sticky="we", padx=5)
+        editor.add_tooltip(self.compress_scale, "Уровень сжатия PNG: 1-3 кодируются в несколько раз быстрее 6-9, файл больше")
+
+        buttons = ttk.Frame(self.frame, style="TFrame")
+        buttons.grid(row=7, column=0, columnspan=3, pady=(10, 0))
+        ttk.Button(buttons, text="Применить", command=self.apply).pack(side="left", padx=5)
+        ttk.Button(buttons, text="По умолчанию", command=self.reset).pack(side="left", padx=5)
+        ttk.Button(buttons, text="Отмена", command=self.window.destroy).pack(side="left", padx=5)
+
+    def get_options(self):
+        # Параметры кодировщиков, выбранные в окне
+        return {
+            "jpeg_quality": int(float(self.quality_scale.get())),
+            "jpeg_progressive": self.progressive.get(),
+            "jpeg_optimize": self.optimize.get(),
+            "jpeg_subsampling": self.subsampling.get(),
+            "png_compress_level": int(float(self.compress_scale.get())),
+        }
+
+    def apply(self):
+        # Сохранение параметров в редакторе и закрытие окна
+        self.editor.encoder_options = self.get_options()
+        logging.info("Параметры сохранения: %s", self.editor.encoder_options)
+        self.window.destroy()
+
+    def reset(self):
+        # Возврат значений по умолчанию в элементах окна
+        self.quality_scale.set(ENCODER_DEFAULTS["jpeg_quality"])
+        self.progressive.set(ENCODER_DEFAULTS["jpeg_progressive"])
+        self.optimize.set(ENCODER_DEFAULTS["jpeg_optimize"])
+        self.subsampling.set(ENCODER_DEFAULTS["jpeg_subsampling"])
+        self.compress_scale.set(ENCODER_DEFAULTS["png_compress_level"])
@@ -0,0 +1,199 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import Toplevel, Canvas
+from tkinter import ttk
+from PIL import ImageTk
+from utilities.thumbnail_cache import ThumbnailCache, THUMBNAIL_SIDE, list_images
+
+# Размер ячейки сетки: миниатюра, поля и подпись с именем файла
+CELL_PADDING = 8
+LABEL_HEIGHT = 18
+CELL_WIDTH = THUMBNAIL_SIDE + 2 * CELL_PADDING
+CELL_HEIGHT = THUMBNAIL_SIDE + 2 * CELL_PADDING + LABEL_HEIGHT
+
+# Строки выше и ниже видимой области, миниатюры которых загружаются заранее
+PREFETCH_ROWS = 1
+
+# Число миниатюр, которые остаются в памяти после прокрутки; дальние от видимой области удаляются
+MAX_LOADED_THUMBNAILS = 300
+
+# Интервал проверки готовых миниатюр
+POLL_INTERVAL_MS = 30
+
+# Потоки построения миниатюр: декодирование в Pillow отпускает GIL, но диск не любит много потоков
+THUMBNAIL_WORKERS = min(4, os.cpu_count() or 1)
+
+class Filmstrip:
+    """
+    Окно с сеткой миниатюр изображений каталога.
+
+    Миниатюры строятся в пуле потоков только для видимых ячеек (и PREFETCH_ROWS строк
+    вокруг них); задачи для ячеек, ушедших из вида при прокрутке, отменяются. Готовые
+    миниатюры сохраняются в ThumbnailCache, поэтому повторное открытие каталога
+    только читает маленькие файлы из кэша. Двойной щелчок открывает изображение в редакторе.
+    """
+
+    def __init__(self, editor, directory, cache=None):
+        logging.info("Обзор каталога: %s", directory)
+        self.window = Toplevel(editor.root)
+        self.window.title(f"Обзор папки - {directory}")
+        self.window.geometry(f"{CELL_WIDTH * 5 + 30}x{CELL_HEIGHT * 4}")
+        self.window.configure(bg="#2E3440")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.canvas = Canvas(self.window, bg="#3B4252", highlightthickness=0, yscrollincrement=CELL_HEIGHT // 4)
+        scrollbar = ttk.Scrollbar(self.window, orient="vertical", command=self.on_scroll)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+
+        self.init_state(editor, directory, cache)
+
+        self.canvas.bind("<Configure>", lambda event: self.layout())
+        self.canvas.bind("<Double-Button-1>", self.on_double_click)
+        self.canvas.bind("<MouseWheel>", lambda event: self.scroll_units(-event.delta // 120))
+        self.canvas.bind("<Button-4>", lambda event: self.scroll_units(-3))
+        self.canvas.bind("<Button-5>", lambda event: self.scroll_units(3))
+
+    def init_state(self, editor, directory, cache=None):
+        # Состояние обзора, не связанное с виджетами окна
+        self.editor = editor
+        self.directory = directory
+        self.cache = cache if cache is not None else ThumbnailCache()
+        self.paths = list_images(directory)
+        self.executor = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS, thread_name_prefix="thumbnail")
+        # Ячейка -> Future миниатюры, которая еще строится
+        self.requested = {}
+        # Ячейка -> PhotoImage показанной миниатюры (None, если файл не удалось прочитать)
+        self.photos = {}
+        self.columns = 1
+        self.poll_job = None
+        self.photo_image_factory = ImageTk.PhotoImage
+        logging.info("Изображений в каталоге: %d", len(self.paths))
+
+    def cell_origin(self, index):
+        # Левый верхний угол ячейки на холсте
+        row, column = divmod(index, self.columns)
+        return column * CELL_WIDTH, row * CELL_HEIGHT
+
+    def layout(self):
+        #Размещение ячеек по ширине окна: рамки и подписи создаются сразу для всех файлов,
+        #миниатюры - только для видимых
+        columns = max(1, self.canvas.winfo_width() // CELL_WIDTH)
+        if columns != self.columns or not self.canvas.find_withtag("cell"):
+            self.columns = columns
+            self.canvas.delete("all")
+            self.photos.clear()
+            for index, path in enumerate(self.paths):
+                x, y = self.cell_origin(index)
+                self.canvas.create_rectangle(x + CELL_PADDING, y + CELL_PADDING, x + CELL_PADDING + THUMBNAIL_SIDE,
+                                             y + CELL_PADDING + THUMBNAIL_SIDE, outline="#4C566A", tags="cell")
+                self.canvas.create_text(x + CELL_WIDTH // 2, y + CELL_HEIGHT - LABEL_HEIGHT // 2 - 2,
+                                        text=self.short_name(path), fill="#D8DEE9", font=("Helvetica", 9), tags="label")
+            rows = -(-len(self.paths) // self.columns)
+            self.canvas.config(scrollregion=(0, 0, self.columns * CELL_WIDTH, rows * CELL_HEIGHT))
+        self.update_visible()
+
+    @staticmethod
+    def short_name(path):
+        # Имя файла, укороченное под ширину ячейки
+        name = os.path.basename(path)
+        return name if len(name) <= 20 else name[:9] + "..." + name[-8:]
+
+    def visible_cells(self):
+        # Номера ячеек в видимой области и PREFETCH_ROWS строках вокруг нее, сверху вниз
+        top = self.canvas.canvasy(0)
+        bottom = top + self.canvas.winfo_height()
+        first_row = max(0, int(top // CELL_HEIGHT) - PREFETCH_ROWS)
+        last_row = int(bottom // CELL_HEIGHT) + PREFETCH_ROWS
+        return range(first_row * self.columns, min(len(self.paths), (last_row + 1) * self.columns))
+
+    def update_visible(self):
+        #Запрос миниатюр видимых ячеек и отмена запросов для ячеек, ушедших из вида
+        visible = self.visible_cells()
+        for index, future in list(self.requested.items()):
+            if index not in visible and future.cancel():
+                del self.requested[index]
+        for index in visible:
+            if index not in self.photos and index not in self.requested:
+                self.requested[index] = self.executor.submit(self.cache.thumbnail, self.paths[index])
+        self.evict_thumbnails(visible)
+        if self.requested and self.poll_job is None:
+            self.poll_job = self.editor.root.after(POLL_INTERVAL_MS, self.poll)
+
+    def evict_thumbnails(self, visible):
+        # Удаление миниатюр, самых дальних от видимой области, сверх MAX_LOADED_THUMBNAILS
+        excess = len(self.photos) - MAX_LOADED_THUMBNAILS
+        if excess <= 0:
+            return
+        center = (visible.start + visible.stop) // 2
+        hidden = sorted((index for index in self.photos if index not in visible), key=lambda index: abs(index - center))
+        for index in hidden[max(0, len(hidden) - excess):]:
+            del self.photos[index]
+            self.canvas.delete(f"thumbnail{index}")
+
+    def poll(self):
+        #Вывод миниатюр, построенных с прошлой проверки
+        self.poll_job = None
+        for index, future in list(self.requested.items()):
+            if not future.done():
+                continue
+            del self.requested[index]
+            if future.cancelled():
+                continue
+            try:
+                thumbnail = future.result()
+            except Exception as e:
+                logging.warning(f"Не удалось построить миниатюру {self.paths[index]}: {e}")
+                self.photos[index] = None
+                continue
+            self.show_thumbnail(index, thumbnail)
+        if self.requested:
+            self.poll_job = self.editor.root.after(POLL_INTERVAL_MS, self.poll)
+
+    def show_thumbnail(self, index, thumbnail):
+        # Миниатюра по центру рамки ячейки
+        x, y = self.cell_origin(index)
+        photo = self.photo_image_factory(thumbnail)
+        self.photos[index] = photo
+        self.canvas.create_image(x + CELL_WIDTH // 2, y + CELL_PADDING + THUMBNAIL_SIDE // 2, image=photo,
+                                 tags=("thumbnail", f"thumbnail{index}"))
+
+    def on_scroll(self, *args):
+        #Прокрутка полосой прокрутки
+        self.canvas.yview(*args)
+        self.update_visible()
+
+    def scroll_units(self, units):
+        #Прокрутка колесом мыши
+        if units:
+            self.canvas.yview_scroll(units, "units")
+            self.update_visible()
+
+    def cell_at(self, x, y):
+        # Номер ячейки под точкой окна холста или None
+        column = int(self.canvas.canvasx(x) // CELL_WIDTH)
+        row = int(self.canvas.canvasy(y) // CELL_HEIGHT)
+        index = row * self.columns + column
+        if 0 <= column < self.columns and 0 <= index < len(self.paths):
+            return index
+        return None
+
+    def on_double_click(self, event):
+        #Открытие изображения под курсором в редакторе
+        index = self.cell_at(event.x, event.y)
+        if index is not None:
+            self.editor.load_image(self.paths[index])
+
+    def close(self):
+        #Закрытие окна: недостроенные миниатюры отменяются
+        if self.poll_job is not None:
+            self.editor.root.after_cancel(self.poll_job)
+            self.poll_job = None
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.requested.clear()
+        self.photos.clear()
+        self.window.destroy()
+        if getattr(self.editor, "filmstrip", None) is self:
+            self.editor.filmstrip = None
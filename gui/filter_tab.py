@@ -1,13 +1,28 @@
 import logging
-from tkinter import ttk
+from tkinter import ttk, Canvas
 from utilities.image_processing import apply_adjustments
 
+# Размер панели гистограммы
+HISTOGRAM_WIDTH = 256
+HISTOGRAM_HEIGHT = 80
+
+# Цвета кривых гистограммы по каналам
+HISTOGRAM_COLORS = {"R": "#BF616A", "G": "#A3BE8C", "B": "#5E81AC", "L": "#D8DEE9"}
+
 class FilterTab:
     def __init__(self, notebook, editor):
         logging.info("Инициализация FilterTab")
         self.editor = editor
         self.frame = ttk.Frame(notebook, style="TFrame")
 
+        # Гистограмма результата и автоуровни
+        self.histogram_canvas = Canvas(self.frame, width=HISTOGRAM_WIDTH, height=HISTOGRAM_HEIGHT, bg="#3B4252", highlightthickness=0)
+        self.histogram_canvas.pack(pady=(10, 0))
+        self.editor.add_tooltip(self.histogram_canvas, "Гистограмма каналов R, G, B и яркости")
+        self.auto_levels_button = ttk.Button(self.frame, text="Автоуровни", command=self.editor.auto_levels)
+        self.auto_levels_button.pack(pady=5)
+        self.editor.add_tooltip(self.auto_levels_button, "Подобрать яркость и контрастность по гистограмме")
+
         # Фрейм и элементы управления для яркости
         self.brightness_frame = ttk.Frame(self.frame)
         self.brightness_frame.pack(pady=10)
@@ -83,10 +98,27 @@ class FilterTab:
             self.blur_value_label.config(text=str(int(self.blur_scale.get())))
             self.apply_adjustments()
 
+    def draw_histogram(self, histogram):
+        # Кривые гистограммы; histogram=None очищает панель
+        self.histogram_canvas.delete("histogram")
+        if not histogram:
+            return
+        # Крайние значения (отсеченные тени и света) не растягивают масштаб
+        peak = max(max(counts[1:255]) for counts in histogram.values()) or 1
+        for channel, color in HISTOGRAM_COLORS.items():
+            counts = histogram.get(channel)
+            if counts is None:
+                continue
+            points = []
+            for value, count in enumerate(counts):
+                points.append(value * (HISTOGRAM_WIDTH - 1) / 255)
+                points.append(HISTOGRAM_HEIGHT - min(count / peak, 1.0) * (HISTOGRAM_HEIGHT - 1))
+            self.histogram_canvas.create_line(*points, fill=color, tags="histogram")
+
     def apply_adjustments(self):
         # Применение изменений к изображению
         if hasattr(self.editor, 'image') and self.editor.image is not None:
-            self.editor.apply_adjustments()
+            self.editor.apply_adjustments(interactive=True)
 
     def save_brightness(self, event):
         # Сохранение состояния после изменения яркости
@@ -2,12 +2,26 @@ import logging
 from tkinter import Tk
 from ttkthemes import ThemedTk
 from photo_editor import PhotoEditor
+from utilities import profiling
+from utilities.session_recorder import SessionRecorder
+from utilities.tiled_image import configure_pixel_limit
 import os
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
     logging.info("Запуск приложения")
 
+    # Сканы и панорамы больше ограничения Pillow по умолчанию; настраивается до запуска фоновых потоков
+    configure_pixel_limit()
+
+    # PHOTO_EDITOR_PROFILE=1 включает замеры времени операций с запуска
+    if os.environ.get("PHOTO_EDITOR_PROFILE"):
+        profiling.enable()
+
+    # PHOTO_EDITOR_RECORD=session.json записывает действия пользователя для python -m benchmarks replay
+    record_path = os.environ.get("PHOTO_EDITOR_RECORD")
+    recorder = SessionRecorder().install() if record_path else None
+
     root = ThemedTk(theme="equilux")
     icon_path = os.path.join(os.path.dirname(__file__), 'image', 'frame.ico')
     if os.path.exists(icon_path):
@@ -17,3 +31,9 @@ if __name__ == "__main__":
 
     app = PhotoEditor(root)
     root.mainloop()
+    # Начатые сохранения дописываются до конца
+    app.wait_for_exports()
+    app.workspace.close_all()
+    app.history_snapshots.close()
+    if recorder is not None:
+        recorder.save(record_path)
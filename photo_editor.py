@@ -1,15 +1,54 @@
 import logging
 import collections
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import filedialog, messagebox, Canvas, PhotoImage, Menu, Toplevel, Text
 from tkinter import ttk
 from PIL import Image, ImageTk, ImageEnhance, ImageFilter, ImageGrab
 from gui.edit_tab import EditTab
 from gui.filter_tab import FilterTab
 from gui.draw_tab import DrawTab
+from gui.export_options import ExportOptionsDialog
+from gui.filmstrip import Filmstrip
 from utilities.tooltip import Tooltip
-from utilities.image_processing import apply_adjustments
+from utilities.render_scheduler import RenderScheduler
+from utilities.edit_graph import EditGraph, EditHistory, OVERLAY_KINDS
+from utilities.workspace import Workspace
+from utilities.render_cache import RenderCache
+from utilities.history import SnapshotStore
+from utilities.image_loader import LoadTask, load_document_image
+from utilities.thumbnail_cache import ThumbnailCache
+from utilities.histogram import HistogramTracker, auto_levels
+from utilities.image_processing import apply_color_adjustments, apply_blur, resample, save_image as save_image_file, ENCODER_DEFAULTS
+from utilities import profiling
+from utilities.profiling import span, timed
+import math
 import os
 
+# Число версий графа правки в истории
+HISTORY_LENGTH = 100
+
+# Лимит памяти снимков изображений версий истории; более старые снимки выгружаются на диск
+HISTORY_SNAPSHOT_BYTES = 1024 * 1024 * 1024
+HISTORY_SPILL_TO_DISK = True
+
+# Лимит памяти кэша результатов рендера
+RENDER_CACHE_BYTES = 512 * 1024 * 1024
+
+# Изображения больше этого числа пикселей открываются через плиточный движок;
+# редактирование идет на рабочей копии с большей стороной TILED_WORKING_SIDE
+TILED_IMAGE_PIXELS = 100 * 1000 * 1000
+TILED_WORKING_SIDE = 4096
+
+# Пауза после изменения размера окна, после которой изображение перерисовывается в итоговом качестве
+RESIZE_SETTLE_MS = 200
+
+# Интервал обновления прогресса и предпросмотра фоновой загрузки
+LOAD_PROGRESS_INTERVAL_MS = 100
+
+# Интервал проверки завершения фоновых сохранений
+EXPORT_POLL_INTERVAL_MS = 100
+
 class PhotoEditor:
     def __init__(self, root):
         logging.info("Инициализация PhotoEditor")
@@ -30,9 +69,7 @@ class PhotoEditor:
         self.style.configure("TScale", background="#2E3440", troughcolor="#4C566A", sliderrelief="flat", sliderlength=15)
         self.style.map("TButton", background=[('active', '#81A1C1')])
 
-        # Инициализация истории и стека для отмены/повтора действий
-        self.history = collections.deque(maxlen=20)
-        self.redo_stack = collections.deque(maxlen=20)
+        self.init_state()
 
         # Создание фрейма для кнопок
         self.button_frame = ttk.Frame(root)
@@ -48,6 +85,10 @@ class PhotoEditor:
         self.save_button.pack(pady=10)
         self.add_tooltip(self.save_button, "Сохранить текущее изображение в файл")
 
+        # Строка состояния: результат последнего сохранения
+        self.status_label = ttk.Label(self.button_frame, text="", wraplength=220, font=("Helvetica", 10))
+        self.status_label.pack(side="bottom", pady=5)
+
         # Загрузка изображений для кнопок отмены и повтора с проверкой успешности
         self.undo_photo = self.load_image_safe('image/undo.png', (30, 30))
         if self.undo_photo is None:
@@ -81,12 +122,78 @@ class PhotoEditor:
         self.image_canvas = Canvas(root, bg="#3B4252", highlightbackground="#2E3440", highlightthickness=1)
         self.image_canvas.pack(side="right", fill="both", expand=True, padx=10, pady=10)
 
+        self.draw_tab = DrawTab(self.notebook, self)
+
+        # Обработка изменения размера холста
+        self.image_canvas.bind("<Configure>", self.on_canvas_resize)
+        self.add_menu()
+
+    def init_state(self):
+        #Состояние документа, не связанное с виджетами (используется и редактором без экрана)
+        # Граф правки документа и история его версий для отмены/повтора действий;
+        # снимки изображений версий (общие для всех документов) избавляют отмену от пересчета графа
+        self.edit_graph = EditGraph()
+        self.history_snapshots = SnapshotStore(HISTORY_SNAPSHOT_BYTES, spill_to_disk=HISTORY_SPILL_TO_DISK)
+        self.history = EditHistory(maxlen=HISTORY_LENGTH, snapshots=self.history_snapshots)
+        # Версия графа, в координатах итогового изображения которой заданы штрихи и текст DrawTab
+        self.overlay_graph = self.edit_graph
+
         self.image = None
         self.image_path = None
         self.display_image = None
         self.original_image = None
+        self.tiled_image = None
 
-        self.draw_tab = DrawTab(self.notebook, self)
+        # Масштаб и размер отображаемого изображения (оно выводится в левый верхний угол холста)
+        self.display_scale = 1.0
+        self.display_size = (0, 0)
+
+        # Предпросмотр в разрешении холста во время перемещения ползунков
+        self.preview_image = None
+        self.preview_proxy = None
+        self.full_render_pending = False
+
+        # Уровень качества изображения на экране: "draft", "interactive" или "final"
+        self.quality_tier = "final"
+        self.resize_settle_job = None
+
+        # Версия документа увеличивается при каждом фиксированном изменении (загрузка, история, отмена)
+        self.document_version = 0
+        self.render_scheduler = RenderScheduler(self.root, lambda: self.document_version)
+
+        # Фоновое декодирование при загрузке; новая загрузка отменяет предыдущую
+        self.load_version = 0
+        self.load_scheduler = RenderScheduler(self.root, lambda: self.load_version)
+        self.load_task = None
+        self.load_preview_photo = None
+
+        # Кадр, подготовленный потоком загрузки: (изображение, размер, уменьшенное изображение)
+        self.prepared_display = None
+
+        # Фоновое сохранение: файлы кодируются по очереди в одном потоке
+        self.export_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="export")
+        self.pending_exports = []
+        self.export_poll_job = None
+        self.encoder_options = dict(ENCODER_DEFAULTS)
+
+        # Гистограмма результата правки (по маленькой копии исходника)
+        self.histogram_tracker = HistogramTracker()
+        self.histogram = None
+
+        # Окно обзора каталога и постоянный кэш миниатюр для него
+        self.filmstrip = None
+        self.thumbnail_cache = ThumbnailCache()
+
+        # Кэш результатов рендера; source_key идентифицирует содержимое original_image
+        self.render_cache = RenderCache(RENDER_CACHE_BYTES)
+        self.source_keys = itertools.count(1)
+        self.source_key = None
+
+        # Фабрика изображений Tk для холста; редактор без экрана подменяет ее
+        self.photo_image_factory = ImageTk.PhotoImage
+
+        # Открытые документы; пиксели неактивных выгружаются на диск
+        self.workspace = Workspace(self)
 
         # Переменные для выделения области
         self.selection_top_x = 0
@@ -95,9 +202,58 @@ class PhotoEditor:
         self.selection_bottom_y = 0
         self.selection_rect = None
 
-        # Обработка изменения размера холста
-        self.image_canvas.bind("<Configure>", self.on_canvas_resize)
-        self.add_menu()
+    def blank_document_state(self):
+        #Состояние пустого документа для рабочей области
+        return {"image": None, "original_image": None, "image_path": None, "tiled_image": None,
+                "edit_graph": EditGraph(), "history": EditHistory(maxlen=HISTORY_LENGTH, snapshots=self.history_snapshots), "source_key": None, "slider_values": None,
+                "drawn_items": [], "text_items": [],
+                "draw_history": collections.deque(maxlen=20), "draw_redo_stack": collections.deque(maxlen=20)}
+
+    def get_document_state(self):
+        #Состояние текущего документа: изображения, история, ползунки и элементы рисования
+        return {"image": self.image, "original_image": self.original_image, "image_path": self.image_path,
+                "tiled_image": self.tiled_image, "edit_graph": self.edit_graph, "history": self.history,
+                "source_key": self.source_key,
+                "slider_values": self.get_slider_values() if self.image is not None else None,
+                "drawn_items": self.draw_tab.drawn_items, "text_items": self.draw_tab.text_items,
+                "draw_history": self.draw_tab.history, "draw_redo_stack": self.draw_tab.redo_stack}
+
+    def set_document_state(self, state):
+        #Переключение редактора на документ с состоянием state (из get_document_state)
+        self.cancel_load()
+        self.clear_preview()
+        self.preview_proxy = None
+        self.image = state["image"]
+        self.original_image = state["original_image"]
+        self.image_path = state["image_path"]
+        self.tiled_image = state["tiled_image"]
+        self.edit_graph = state["edit_graph"]
+        self.history = state["history"]
+        self.source_key = state["source_key"]
+        self.document_version += 1
+        self.draw_tab.drawn_items = state["drawn_items"]
+        self.draw_tab.text_items = state["text_items"]
+        self.draw_tab.history = state["draw_history"]
+        self.draw_tab.redo_stack = state["draw_redo_stack"]
+        self.draw_tab.current_stroke = None
+        self.overlay_graph = self.graph_with_overlays(self.edit_graph)
+        if state["slider_values"] is not None:
+            self.set_slider_values(state["slider_values"])
+        else:
+            self.filter_tab.reset_sliders()
+        if self.image is not None:
+            # Быстрый первый кадр; итоговое качество - после паузы, как при изменении размера окна
+            self.update_canvas_size()
+            self.update_display_image(quality="interactive")
+            if self.resize_settle_job is not None:
+                self.root.after_cancel(self.resize_settle_job)
+            self.resize_settle_job = self.root.after(RESIZE_SETTLE_MS, self.finish_canvas_resize)
+        else:
+            self.display_image = None
+            self.display_size = (0, 0)
+            self.image_canvas.delete("background")
+            self.draw_tab.background_item = None
+            self.draw_tab.redraw_items()
 
     def add_tooltip(self, widget, text):
         #Функция для добавления подсказок к виджетам
@@ -131,14 +287,81 @@ class PhotoEditor:
             self.load_image(file_path)
 
     def load_image(self, file_path):
-        #Загрузка изображения и обновление состояния приложения
+        #Запуск фоновой загрузки изображения; загрузка, которая еще идет, отменяется
+        #Пока файл декодируется, на холсте показываются прогресс и предпросмотр, а документ
+        #(изображение, история, ползунки) заменяется только после полного декодирования
+        logging.info("Загрузка изображения: %s", file_path)
+        self.cancel_load()
+        task = LoadTask(file_path, (self.image_canvas.winfo_width(), self.image_canvas.winfo_height()))
+        self.load_task = task
+        self.load_scheduler.submit(lambda: load_document_image(task, TILED_IMAGE_PIXELS, TILED_WORKING_SIDE),
+                                   lambda loaded: self.finish_async_load(task, loaded), self.load_version,
+                                   on_error=lambda error: self.fail_load(task, error))
+        self.show_load_progress(task)
+
+    def cancel_load(self):
+        #Отмена фоновой загрузки: декодирование прерывается, результат не применяется
+        self.load_version += 1
+        self.load_scheduler.cancel()
+        if self.load_task is not None:
+            logging.debug("Загрузка %s отменена", self.load_task.path)
+            self.load_task.cancel()
+            self.load_task = None
+        self.clear_load_progress()
+
+    def show_load_progress(self, task):
+        #Вывод прогресса и последнего предпросмотра загрузки; повторяется, пока загрузка не завершится
+        if task is not self.load_task:
+            return
+        canvas = self.image_canvas
+        preview = task.take_preview()
+        if preview is not None:
+            self.load_preview_photo = self.photo_image_factory(preview)
+            canvas.delete("load_preview")
+            canvas.create_image(0, 0, anchor="nw", image=self.load_preview_photo, tags="load_preview")
+        text = "Загрузка..." if task.progress is None else f"Загрузка: {task.progress:.0%}"
+        if canvas.find_withtag("load_progress"):
+            canvas.itemconfig("load_progress", text=text)
+        else:
+            canvas.create_text(10, 10, anchor="nw", text=text, fill="#ECEFF4", tags="load_progress")
+        canvas.tag_raise("load_progress")
+        self.root.after(LOAD_PROGRESS_INTERVAL_MS, self.show_load_progress, task)
+
+    def clear_load_progress(self):
+        #Удаление прогресса и предпросмотра загрузки с холста
+        self.image_canvas.delete("load_preview", "load_progress")
+        self.load_preview_photo = None
+
+    def finish_async_load(self, task, loaded):
+        #Применение результата фоновой загрузки (вызывается планировщиком в потоке Tk)
+        if task is not self.load_task:
+            return
+        self.load_task = None
+        self.clear_load_progress()
+        self.prepared_display = (loaded.image, loaded.display_image.size, loaded.display_image)
+        self.finish_load(loaded.path, loaded.image, loaded.tiled_image, loaded.original_image)
+
+    def fail_load(self, task, error):
+        #Ошибка фоновой загрузки: текущий документ остается без изменений
+        if task is not self.load_task:
+            return
+        self.load_task = None
+        self.clear_load_progress()
+        logging.error(f"Ошибка при загрузке изображения {task.path}: {error}")
+        messagebox.showerror("Ошибка", f"Не удалось загрузить изображение: {error}")
+
+    def finish_load(self, file_path, image, tiled_image=None, original_image=None):
+        #Установка полностью декодированного изображения как нового документа
+        #original_image - уже сделанная копия image (поток загрузки копирует ее заранее)
         try:
-            logging.info(f"Загрузка изображения: {file_path}")
-            self.image = Image.open(file_path)
-            self.original_image = self.image.copy()
+            self.image = image
+            self.tiled_image = tiled_image
+            self.set_original_image(original_image if original_image is not None else self.image.copy())
             self.image_path = file_path
+            self.document_version += 1
+            self.clear_preview()
+            self.edit_graph = EditGraph().set("resize", width=image.width, height=image.height)
             self.history.clear()
-            self.redo_stack.clear()
             self.reset_sliders()
             self.save_history()
             self.update_canvas_size()
@@ -147,6 +370,48 @@ class PhotoEditor:
             logging.error(f"Ошибка при загрузке изображения {file_path}: {e}")
             messagebox.showerror("Ошибка", f"Не удалось загрузить изображение: {e}")
 
+    def open_folder_dialog(self):
+        #Обзор изображений каталога в окне с миниатюрами
+        directory = filedialog.askdirectory()
+        if directory:
+            self.show_filmstrip(directory)
+
+    def show_filmstrip(self, directory):
+        #Открытие окна обзора каталога; предыдущее окно обзора закрывается
+        if self.filmstrip is not None:
+            self.filmstrip.close()
+        self.filmstrip = Filmstrip(self, directory, self.thumbnail_cache)
+
+    def load_image_as_new_document(self):
+        #Открытие изображения в новом документе; текущий документ выгружается на диск
+        file_path = filedialog.askopenfilename()
+        if file_path:
+            if self.image is not None:
+                self.workspace.new_document()
+            self.load_image(file_path)
+
+    def switch_document(self, index):
+        #Переключение на другой открытый документ
+        try:
+            self.workspace.switch_to(index)
+        except Exception as e:
+            logging.error(f"Ошибка при переключении документа: {e}")
+            messagebox.showerror("Ошибка", f"Не удалось переключить документ: {e}")
+
+    def close_document(self):
+        #Закрытие активного документа
+        self.workspace.close()
+
+    def update_documents_menu(self):
+        #Перестроение меню документов перед его открытием
+        self.documents_menu.delete(0, "end")
+        self.documents_menu.add_command(label="Открыть в новом документе", command=self.load_image_as_new_document)
+        self.documents_menu.add_command(label="Закрыть документ", command=self.close_document)
+        self.documents_menu.add_separator()
+        for index, name in enumerate(self.workspace.names()):
+            label = f"{index + 1}. {name}" + (" (активный)" if index == self.workspace.active else "")
+            self.documents_menu.add_command(label=label, command=lambda index=index: self.switch_document(index))
+
     def save_image_to_dialog(self):
         #Сохранение изображения через диалоговое окно
         if self.image:
@@ -155,12 +420,16 @@ class PhotoEditor:
                 self.save_image(save_path)
 
     def save_image(self, save_path):
-        #Сохранение изображения по указанному пути
+        #Запуск фонового сохранения изображения со штрихами и текстом по указанному пути
+        #Итоговое изображение собирается и кодируется в потоке сохранения; файл заменяется атомарно
         try:
             if self.image:
                 logging.info(f"Сохранение изображения: {save_path}")
-                final_image = self.draw_tab.get_final_image()
-                final_image.save(save_path)
+                self.ensure_full_render()
+                build_final_image = self.draw_tab.final_image_job()
+                options = dict(self.encoder_options)
+                future = self.export_executor.submit(self.export_image, build_final_image, save_path, options)
+                self.track_export(save_path, future)
             else:
                 logging.error("Нет изображения для сохранения")
                 messagebox.showerror("Ошибка", "Нет изображения для сохранения")
@@ -168,6 +437,52 @@ class PhotoEditor:
             logging.error(f"Ошибка при сохранении изображения {save_path}: {e}")
             messagebox.showerror("Ошибка", f"Не удалось сохранить изображение: {e}")
 
+    @staticmethod
+    @timed("save")
+    def export_image(build_final_image, save_path, options):
+        #Сборка и кодирование итогового изображения (выполняется в потоке сохранения)
+        return save_image_file(build_final_image(), save_path, options)
+
+    def track_export(self, save_path, future):
+        #Отслеживание фонового сохранения: результат показывается в строке состояния
+        self.pending_exports.append((save_path, future))
+        self.set_status(f"Сохранение {os.path.basename(save_path)}...")
+        if self.export_poll_job is None:
+            self.export_poll_job = self.root.after(EXPORT_POLL_INTERVAL_MS, self.poll_exports)
+
+    def poll_exports(self):
+        #Обработка завершенных сохранений в потоке Tk: время кодирования и размер файла или ошибка
+        self.export_poll_job = None
+        remaining = []
+        for save_path, future in self.pending_exports:
+            if not future.done():
+                remaining.append((save_path, future))
+                continue
+            name = os.path.basename(save_path)
+            try:
+                result = future.result()
+            except Exception as e:
+                self.set_status(f"Ошибка сохранения {name}")
+                messagebox.showerror("Ошибка", f"Не удалось сохранить изображение: {e}")
+            else:
+                self.set_status(f"Сохранено {name}: {result['bytes'] / 1024 / 1024:.1f} МБ, кодирование {result['seconds']:.2f} с")
+        self.pending_exports = remaining
+        if remaining:
+            self.export_poll_job = self.root.after(EXPORT_POLL_INTERVAL_MS, self.poll_exports)
+
+    def wait_for_exports(self):
+        #Ожидание всех начатых сохранений (при выходе из приложения)
+        self.export_executor.shutdown(wait=True)
+
+    def set_status(self, text):
+        #Текст строки состояния
+        logging.info(text)
+        self.status_label.config(text=text)
+
+    def show_export_options(self):
+        #Окно параметров кодировщиков JPEG и PNG
+        ExportOptionsDialog(self)
+
     def capture_canvas(self):
         #Захват текущего содержимого холста
         x = self.root.winfo_rootx() + self.image_canvas.winfo_x()
@@ -176,76 +491,258 @@ class PhotoEditor:
         y1 = y + self.image_canvas.winfo_height()
         return ImageGrab.grab().crop((x, y, x1, y1))
 
+    @timed("history")
     def save_history(self):
-        #Сохранение текущего состояния изображения в историю
+        #Сохранение текущей версии графа правки (вместе со штрихами и текстом) в историю
+        #Версия, совпадающая с текущей, не добавляется
         if self.image:
             logging.info("Сохранение текущего состояния изображения в историю")
-            self.history.append((self.image.copy(), self.original_image.copy(), self.get_slider_values(), list(self.draw_tab.drawn_items), list(self.draw_tab.text_items)))
-            self.redo_stack.clear()
-            logging.debug(f"История сохранена в PhotoEditor: {len(self.history)} элементов")
+            # Штрихи и текст DrawTab заданы в координатах текущего графа; рендер после
+            # предпросмотра переносит их от этой версии
+            self.overlay_graph = self.graph_with_overlays(self.edit_graph)
+            self.ensure_full_render()
+            self.edit_graph = self.overlay_graph = self.graph_with_overlays(self.edit_graph)
+            if self.edit_graph == self.history.current():
+                return
+            self.document_version += 1
+            self.history.append(self.edit_graph, self.image)
+            logging.debug("История сохранена в PhotoEditor: %d версий, узлов в графе: %d, снимки: %d байт в памяти, %d байт на диске",
+                          len(self.history), len(self.edit_graph), self.history_snapshots.memory_usage(), self.history_snapshots.disk_usage())
+
+    def graph_with_overlays(self, graph):
+        #Граф graph с текущими штрихами и текстом DrawTab
+        text_items = tuple({key: value for key, value in item.items() if key != "id"} for item in self.draw_tab.text_items)
+        return graph.set("strokes", strokes=tuple(self.draw_tab.drawn_items)).set("text", items=text_items)
 
     def undo(self):
-        #Отмена последнего действия
-        if len(self.history) > 1:
+        #Отмена последнего действия: переход к предыдущей версии графа правки
+        graph = self.history.undo()
+        if graph is not None:
             logging.info("Отмена последнего действия в PhotoEditor")
-            self.redo_stack.append(self.history.pop())
-            self.image, self.original_image, slider_values, drawn_state, text_state = self.history[-1]
-            self.update_display_image()
-            self.set_slider_values(slider_values)
-            self.draw_tab.drawn_items = drawn_state
-            self.draw_tab.text_items = text_state
-            self.draw_tab.redraw_items()
-            logging.debug(f"История после отмены: {len(self.history)} элементов")
+            self.restore_graph(graph)
+            logging.debug("История после отмены: %d версий", len(self.history))
         else:
             logging.warning("Нет действий для отмены в PhotoEditor")
 
     def redo(self):
-        #Повтор последнего отмененного действия
-        if self.redo_stack:
+        #Повтор последнего отмененного действия: переход к следующей версии графа правки
+        graph = self.history.redo()
+        if graph is not None:
             logging.info("Повтор последнего действия в PhotoEditor")
-            self.history.append(self.redo_stack.pop())
-            self.image, self.original_image, slider_values, drawn_state, text_state = self.history[-1]
-            self.update_display_image()
-            self.set_slider_values(slider_values)
-            self.draw_tab.drawn_items = drawn_state
-            self.draw_tab.text_items = text_state
-            self.draw_tab.redraw_items()
-            logging.debug(f"История после повтора: {len(self.history)} элементов")
+            self.restore_graph(graph)
+            logging.debug("История после повтора: %d версий", len(self.history))
         else:
             logging.warning("Нет действий для повтора в PhotoEditor")
 
+    def restore_graph(self, graph):
+        #Переход к текущей версии истории: ползунки, штрихи и текст берутся из графа,
+        #изображение - из снимка версии, а если его нет - из кэша результатов узлов
+        #или пересчитывается от ближайшего закэшированного узла
+        self.edit_graph = self.overlay_graph = graph
+        self.document_version += 1
+        self.clear_preview()
+        self.set_slider_values(self.get_graph_slider_values(graph))
+        self.load_overlays(graph)
+        if self.original_image is not None:
+            self.image = self.history.image()
+            if self.image is None:
+                self.render_graph()
+            self.update_canvas_size()
+        self.update_display_image()
+        self.draw_tab.redraw_items()
+
+    def load_overlays(self, graph):
+        #Штрихи и текст DrawTab из узлов strokes и text графа; элементы холста текста
+        #сохраняются, если список текстов не изменил длину (перенос координат)
+        strokes = graph.find("strokes")
+        texts = graph.find("text")
+        ids = [item["id"] for item in self.draw_tab.text_items]
+        self.draw_tab.drawn_items = list(strokes["strokes"]) if strokes else []
+        self.draw_tab.text_items = [dict(item, id=None) for item in texts["items"]] if texts else []
+        if len(ids) == len(self.draw_tab.text_items):
+            for item, item_id in zip(self.draw_tab.text_items, ids):
+                item["id"] = item_id
+
+    def remap_overlays(self, graph, previous):
+        #Граф graph со штрихами и текстом previous в координатах итогового изображения graph
+        remapped = graph.remap_overlays(previous, self.original_image.size)
+        if remapped is not graph:
+            self.load_overlays(remapped)
+        return remapped
+
+    def render_graph(self, quality="final"):
+        #Полное вычисление растровой части графа правки в self.image
+        self.image = self.edit_graph.evaluate(self.original_image, self.source_key, self.render_cache, quality=quality)
+
+    def get_graph_slider_values(self, graph):
+        #Значения ползунков, соответствующие узлам resize, color и blur графа
+        resize = graph.find("resize")
+        color = graph.find("color")
+        blur = graph.find("blur")
+        return {
+            "brightness": color["brightness"] if color else 1.0,
+            "contrast": color["contrast"] if color else 1.0,
+            "saturation": color["saturation"] if color else 1.0,
+            "width": resize["width"] if resize else self.original_image.width,
+            "height": resize["height"] if resize else self.original_image.height,
+            "blur": blur["radius"] if blur else 0
+        }
+
+    def set_original_image(self, image):
+        #Замена исходного изображения, от которого строится рендер
+        self.original_image = image
+        self.source_key = next(self.source_keys)
+
     def update_canvas_size(self):
         #Обновление размера холста в зависимости от изображения
         if self.image:
             self.image_canvas.config(scrollregion=(0, 0, self.image.width, self.image.height))
 
-    def update_display_image(self, region=None):
+    def update_display_image(self, region=None, quality=None):
+        #quality - уровень качества уменьшения под размер холста; по умолчанию "interactive",
+        #пока на экране предпросмотр или черновой рендер, и "final" в остальных случаях
         try:
             if region:
                 x0, y0, x1, y1 = region
                 self.image_canvas.delete("region")
-                resized_image = self.image.crop((x0, y0, x1, y1))
-                self.display_image = ImageTk.PhotoImage(resized_image)
+                if self.tiled_image:
+                    # Видимая область в полном разрешении из плиток исходного файла
+                    resized_image = self.render_tiled_region(region)
+                else:
+                    resized_image = self.image.crop((x0, y0, x1, y1))
+                with span("display", region=True):
+                    self.display_image = self.photo_image_factory(resized_image)
                 self.image_canvas.create_image(x0, y0, anchor="nw", image=self.display_image, tags="region")
             else:
-                self.image_canvas.delete("all")
+                self.image_canvas.delete("region")
                 if self.image:
+                    # Во время интерактивного редактирования показывается предпросмотр
+                    source_image = self.preview_image if self.preview_image is not None else self.image
                     canvas_width = self.image_canvas.winfo_width()
                     canvas_height = self.image_canvas.winfo_height()
-                    image_width, image_height = self.image.size
+                    image_width, image_height = source_image.size
 
                     scale = min(canvas_width / image_width, canvas_height / image_height, 1.0)
                     new_width = int(image_width * scale)
                     new_height = int(image_height * scale)
 
-                    resized_image = self.image.resize((new_width, new_height), Image.LANCZOS)
-                    self.display_image = ImageTk.PhotoImage(resized_image)
-                    self.image_canvas.create_image((canvas_width // 2, canvas_height // 2), anchor="center", image=self.display_image)
+                    if quality is None:
+                        quality = "interactive" if self.preview_image is not None or self.full_render_pending else "final"
+                    # Первый кадр после загрузки уже уменьшен потоком загрузки
+                    prepared = self.prepared_display
+                    self.prepared_display = None
+                    with span("display", quality=quality):
+                        if (new_width, new_height) == source_image.size:
+                            resized_image = source_image
+                        elif prepared is not None and prepared[0] is source_image and prepared[1] == (new_width, new_height):
+                            resized_image = prepared[2]
+                        else:
+                            resized_image = resample(source_image, (new_width, new_height), quality)
+                        self.display_image = self.photo_image_factory(resized_image)
+                    self.quality_tier = quality
+                    self.display_scale = new_width / self.image.width if self.image.width else scale
+                    self.display_size = (new_width, new_height)
+                    # Фон сцены обновляет DrawTab, сохраняя остальные элементы холста
                     self.image_canvas.image = self.display_image
                     self.draw_tab.redraw_items()
+                self.update_histogram()
         except Exception as e:
             logging.error(f"Ошибка при обновлении изображения: {e}")
 
+    @timed("histogram")
+    def update_histogram(self):
+        #Обновление гистограммы во вкладке "Фильтры" по текущему графу правки
+        if self.original_image is None:
+            self.histogram = None
+        else:
+            self.histogram = self.histogram_tracker.update(self.original_image, self.source_key, self.edit_graph)
+        self.filter_tab.draw_histogram(self.histogram)
+
+    def auto_levels(self):
+        #Автоуровни: ползунки яркости и контрастности растягивают диапазон яркости изображения на 0-255
+        if self.original_image is None:
+            logging.error("Изображение не загружено")
+            messagebox.showerror("Ошибка", "Изображение не загружено")
+            return
+        histogram = self.histogram_tracker.base_histogram(self.original_image, self.source_key, self.edit_graph)
+        brightness, contrast = auto_levels(histogram)
+        logging.info("Автоуровни: яркость %.2f, контрастность %.2f", brightness, contrast)
+        values = self.get_slider_values()
+        values.update(brightness=brightness, contrast=contrast)
+        self.set_slider_values(values)
+        self.apply_adjustments()
+        self.save_history()
+
+    def get_tiled_processing(self, graph=None):
+        #Функция обработки плитки полного разрешения узлами графа правки и ширина полей для нее
+        #Размер изображения при этом не меняется: узел resize задает только масштаб радиусов размытия.
+        #Поворот, обрезка, непропорциональное изменение размера, штрихи и текст по плиткам
+        #не выполняются - ValueError вместо результата без них
+        graph = graph if graph is not None else self.edit_graph
+        full_width, full_height = self.tiled_image.size
+        # Пикселей полного разрешения на пиксель изображения в текущей точке графа
+        scale = full_width / self.original_image.width
+        operations = []
+        halo = 0
+        prefix = []
+        for node in graph:
+            if node.is_neutral():
+                continue
+            if node.kind == "resize":
+                if abs(node["width"] / node["height"] - full_width / full_height) > 0.01 * full_width / full_height:
+                    raise ValueError("Экспорт в полном разрешении не поддерживает изменение пропорций")
+                scale = full_width / node["width"]
+            elif node.kind == "color":
+                # Средняя яркость для контрастности - по всему изображению перед узлом, а не по плитке
+                reference = EditGraph(prefix).evaluate(self.original_image, self.source_key, self.render_cache)
+                operations.append(lambda tile, node=node, reference=reference: apply_color_adjustments(
+                    tile, node["brightness"], node["contrast"], node["saturation"], reference=reference))
+            elif node.kind == "blur":
+                # Точное размытие: плитки с полями должны совпадать на стыках
+                radius = node["radius"] * scale
+                operations.append(lambda tile, radius=radius: apply_blur(tile, radius, exact=True))
+                halo += math.ceil(3 * radius)
+            elif node.kind in OVERLAY_KINDS:
+                raise ValueError("Экспорт в полном разрешении не поддерживает штрихи и текст")
+            else:
+                raise ValueError("Экспорт в полном разрешении не поддерживает поворот и обрезку")
+            prefix.append(node)
+
+        def process(tile):
+            for operation in operations:
+                tile = operation(tile)
+            return tile
+
+        return process, halo
+
+    def render_tiled_region(self, region):
+        #Рендер области исходного изображения в полном разрешении с текущими настройками
+        x0, y0, x1, y1 = region
+        process, halo = self.get_tiled_processing()
+        expanded = (max(0, x0 - halo), max(0, y0 - halo), min(self.tiled_image.width, x1 + halo), min(self.tiled_image.height, y1 + halo))
+        rendered = process(self.tiled_image.read_region(expanded))
+        return rendered.crop((x0 - expanded[0], y0 - expanded[1], x1 - expanded[0], y1 - expanded[1]))
+
+    def export_full_resolution_dialog(self):
+        #Экспорт большого изображения в полном разрешении через диалоговое окно
+        if not self.tiled_image:
+            messagebox.showinfo("Экспорт", "Экспорт в полном разрешении доступен для изображений, открытых через плиточный движок")
+            return
+        save_path = filedialog.asksaveasfilename(defaultextension=".tif", filetypes=[("TIFF files", "*.tif")])
+        if save_path:
+            self.export_full_resolution(save_path)
+
+    def export_full_resolution(self, save_path):
+        #Фоновое потоковое сохранение исходного разрешения в плиточный TIFF с узлами графа правки
+        try:
+            logging.info(f"Экспорт в полном разрешении: {save_path}")
+            process, halo = self.get_tiled_processing()
+            future = self.export_executor.submit(self.tiled_image.save_tiled_tiff, save_path, process=process, halo=halo)
+            self.track_export(save_path, future)
+        except Exception as e:
+            logging.error(f"Ошибка при экспорте изображения {save_path}: {e}")
+            messagebox.showerror("Ошибка", f"Не удалось экспортировать изображение: {e}")
+
     def reset_sliders(self):
         #Сброс значений ползунков к исходным
         self.edit_tab.reset_sliders()
@@ -277,8 +774,10 @@ class PhotoEditor:
         self.edit_tab.height_value_label.config(text=str(int(values["height"])))
         self.filter_tab.blur_value_label.config(text=str(int(values["blur"])))
 
-    def apply_adjustments(self):
+    @timed("adjust")
+    def apply_adjustments(self, interactive=False):
         #Применение изменений к изображению
+        #При interactive=True (перемещение ползунка) рендер выполняется на уменьшенной копии в размере холста
         if self.original_image:
             logging.info("Применение настроек к изображению")
             new_width = max(100, int(self.edit_tab.width_scale.get()))
@@ -287,13 +786,94 @@ class PhotoEditor:
             contrast = self.filter_tab.contrast_scale.get()
             saturation = self.filter_tab.saturation_scale.get()
             blur_radius = self.filter_tab.blur_scale.get()
+            # Ползунки задают узлы resize, color и blur; остальные узлы графа сохраняются
+            graph = self.edit_graph.set("resize", width=new_width, height=new_height)
+            graph = graph.set("color", brightness=brightness, contrast=contrast, saturation=saturation)
+            graph = graph.set("blur", radius=blur_radius)
+            # Штрихи и текст переносятся от последней сохраненной версии, а не от предыдущего
+            # шага ползунка: при перемещении ползунка ошибки округления не накапливаются
+            self.edit_graph = graph = self.remap_overlays(graph, self.overlay_graph)
 
-            self.image = apply_adjustments(self.original_image, new_width, new_height, brightness, contrast, saturation, blur_radius)
-            self.update_display_image()
+            preview_size = self.get_preview_size(new_width, new_height) if interactive else None
+            if preview_size:
+                # Рендер предпросмотра в фоновом потоке; применяется только самый свежий результат
+                preview_width, preview_height = preview_size
+                preview_scale = preview_width / new_width
+                source = self.original_image
+                source_key = self.source_key
+                canvas_size = (self.image_canvas.winfo_width(), self.image_canvas.winfo_height())
+
+                def render():
+                    proxy = self.get_preview_proxy(source, canvas_size)
+                    # Узлы вычисляются на уменьшенной копии: размеры и радиусы умножаются на preview_scale
+                    return graph.evaluate(proxy, (source_key, proxy.size), self.render_cache, scale=preview_scale, quality="interactive")
+
+                self.full_render_pending = True
+                self.render_scheduler.submit(render, self.show_preview, self.document_version)
+                # Гистограмма не ждет предпросмотра: при смене яркости и контрастности она пересчитывается без пикселей
+                self.update_histogram()
+            else:
+                # Во время перемещения ползунка - быстрый фильтр; итоговый LANCZOS при отпускании
+                quality = "interactive" if interactive else "final"
+                self.render_graph(quality)
+                self.clear_preview()
+                self.full_render_pending = quality != "final"
+                self.update_display_image()
         else:
             logging.error("Изображение не загружено")
             messagebox.showerror("Ошибка", "Изображение не загружено")
 
+    def get_preview_size(self, width, height):
+        #Размер предпросмотра для результата width x height или None, если нужен полный рендер
+        canvas_width = self.image_canvas.winfo_width()
+        canvas_height = self.image_canvas.winfo_height()
+        scale = min(canvas_width / width, canvas_height / height)
+        if scale >= 1.0:
+            # Масштаб 1:1 - предпросмотр ничего не экономит
+            return None
+        preview_width = int(width * scale)
+        preview_height = int(height * scale)
+        if preview_width < 100 or preview_height < 100:
+            return None
+        return preview_width, preview_height
+
+    def get_preview_proxy(self, source, canvas_size):
+        #Уменьшенная копия source, покрывающая холст; пересоздается при смене исходника или размера холста
+        #Вызывается из фонового потока рендера, поэтому не обращается к виджетам Tk
+        cached = self.preview_proxy
+        if cached:
+            cached_source, cached_canvas_size, proxy = cached
+            if cached_source is source and cached_canvas_size == canvas_size:
+                return proxy
+
+        image_width, image_height = source.size
+        scale = min(max(canvas_size[0] / image_width, canvas_size[1] / image_height), 1.0)
+        if scale < 1.0:
+            proxy_size = (max(1, round(image_width * scale)), max(1, round(image_height * scale)))
+            proxy = resample(source, proxy_size, "interactive")
+        else:
+            proxy = source
+        self.preview_proxy = (source, canvas_size, proxy)
+        logging.debug("Создана копия для предпросмотра: %s", proxy.size)
+        return proxy
+
+    def show_preview(self, preview_image):
+        #Отображение готового предпросмотра (вызывается планировщиком в потоке Tk)
+        self.preview_image = preview_image
+        self.update_display_image()
+
+    def ensure_full_render(self):
+        #Полный рендер текущих настроек, если на экране пока только предпросмотр
+        if self.full_render_pending:
+            logging.info("Полный рендер после предпросмотра")
+            self.apply_adjustments()
+
+    def clear_preview(self):
+        #Сброс предпросмотра после полного рендера или замены изображения
+        self.render_scheduler.cancel()
+        self.preview_image = None
+        self.full_render_pending = False
+
     def start_area_selection(self):
         #Начало выделения области для обрезки
         self.image_canvas.bind("<Button-1>", self.get_selection_start_pos)
@@ -318,18 +898,93 @@ class PhotoEditor:
         self.crop_image()
 
     def crop_image(self):
-        #Обрезка изображения по выделенной области
+        #Обрезка изображения по выделенной области: в граф правки добавляется узел crop
+        if self.image:
+            self.ensure_full_render()
+            if self.selection_rect is not None:
+                self.image_canvas.delete(self.selection_rect)
+                self.selection_rect = None
+            # Выделение задано в координатах холста; узел хранит доли размера изображения
+            scale = self.display_scale or 1.0
+            width, height = self.image.size
+            left, right = sorted((self.selection_top_x / scale, self.selection_bottom_x / scale))
+            top, bottom = sorted((self.selection_top_y / scale, self.selection_bottom_y / scale))
+            left, top = max(0, left), max(0, top)
+            right, bottom = min(width, right), min(height, bottom)
+            if right - left < 1 or bottom - top < 1:
+                logging.warning("Пустая область выделения, обрезка не выполнена")
+                return
+            graph = self.edit_graph.append("crop", box=(left / width, top / height, right / width, bottom / height))
+            self.edit_graph = self.remap_overlays(graph, self.graph_with_overlays(self.edit_graph))
+            self.document_version += 1
+            self.render_graph()
+            self.update_canvas_size()
+            self.update_display_image()
+            self.save_history()
+
+    def rotate_image(self, angle):
+        #Поворот изображения: в граф правки добавляется узел rotate
         if self.image:
-            cropped_image = self.image.crop((self.selection_top_x, self.selection_top_y, self.selection_bottom_x, self.selection_bottom_y))
-            self.image = cropped_image
+            self.ensure_full_render()
+            self.edit_graph = self.remap_overlays(self.edit_graph.append("rotate", angle=angle), self.graph_with_overlays(self.edit_graph))
+            self.document_version += 1
+            self.render_graph()
             self.update_canvas_size()
             self.update_display_image()
             self.save_history()
 
     def on_canvas_resize(self, event):
-        #Обработка изменения размера холста
+        #Обработка изменения размера холста: черновое качество, пока размер меняется,
+        #и итоговое после паузы RESIZE_SETTLE_MS
+        self.update_display_image(quality="draft")
+        if self.resize_settle_job is not None:
+            self.root.after_cancel(self.resize_settle_job)
+        self.resize_settle_job = self.root.after(RESIZE_SETTLE_MS, self.finish_canvas_resize)
+
+    def finish_canvas_resize(self):
+        #Перерисовка в полном качестве после завершения изменения размера окна
+        self.resize_settle_job = None
         self.update_display_image()
 
+    def toggle_profiling(self):
+        #Включение или выключение замеров времени операций
+        if profiling.is_enabled():
+            profiling.disable()
+        else:
+            profiling.enable()
+        logging.info("Замеры времени операций: %s", "включены" if profiling.is_enabled() else "выключены")
+
+    def profile_next_action(self):
+        #Запуск cProfile для следующего действия пользователя; профиль сохраняется в файл
+        save_path = filedialog.asksaveasfilename(defaultextension=".prof", filetypes=[("cProfile", "*.prof")])
+        if save_path:
+            profiling.profile_next(output_path=save_path)
+
+    def show_profiling_summary(self):
+        #Отображение гистограмм времени операций
+        summary_window = Toplevel(self.root)
+        summary_window.title("Сводка по операциям")
+        summary_window.geometry("800x400")
+        summary_window.configure(bg="#2E3440")
+        text_widget = Text(summary_window, wrap="none", bg="#3B4252", fg="#D8DEE9", font=("Courier", 11))
+        text_widget.pack(expand=1, fill="both")
+        if profiling.summary():
+            text_widget.insert("1.0", profiling.format_summary())
+        else:
+            text_widget.insert("1.0", "Нет данных. Включите замеры времени в меню \"Профилирование\".")
+        text_widget.config(state="disabled")
+
+    def export_trace_dialog(self):
+        #Сохранение событий в формате Chrome trace-event (открывается в chrome://tracing или Perfetto)
+        save_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("Trace JSON", "*.json")])
+        if save_path:
+            try:
+                count = profiling.export_chrome_trace(save_path)
+                logging.info("Сохранено событий трассировки: %d", count)
+            except Exception as e:
+                logging.error(f"Ошибка при экспорте трассировки {save_path}: {e}")
+                messagebox.showerror("Ошибка", f"Не удалось сохранить трассировку: {e}")
+
     def show_documentation(self):
         #Отображение окна документации
         doc_window = Toplevel(self.root)
@@ -353,10 +1008,16 @@ class PhotoEditor:
         Загрузка изображения
         1. Нажмите кнопку "Загрузить изображение".
         2. Выберите изображение в диалоговом окне.
+        Меню "Файл" -> "Открыть папку..." показывает миниатюры всех 
+        изображений каталога; двойной щелчок открывает изображение. 
+        Миниатюры сохраняются в кэше, и повторное открытие папки быстрое.
 
         Сохранение изображения
         1. Нажмите кнопку "Сохранить изображение".
         2. Выберите место и формат для сохранения.
+        Сохранение идет в фоне; время кодирования и размер файла 
+        появляются под кнопками. Качество JPEG и сжатие PNG задаются 
+        в меню "Файл" -> "Параметры сохранения".
 
         Изменение размеров
         1. Используйте ползунки "Ширина" и "Высота" во вкладке "Редактирование" 
@@ -374,6 +1035,9 @@ class PhotoEditor:
         Регулировка яркости, контрастности, насыщенности и размытия
         1. Перейдите во вкладку "Фильтры".
         2. Используйте соответствующие ползунки для регулировки.
+        Над ползунками показана гистограмма каналов R, G, B и яркости. 
+        Кнопка "Автоуровни" подбирает яркость и контрастность так, чтобы 
+        яркость изображения занимала весь диапазон.
 
         Рисование и добавление текста
         1. Перейдите во вкладку "Рисование".
@@ -404,9 +1068,15 @@ class PhotoEditor:
 
         file_menu = Menu(menu_bar, tearoff=0)
         file_menu.add_command(label="Загрузить изображение", command=self.load_image_from_dialog)
+        file_menu.add_command(label="Открыть папку...", command=self.open_folder_dialog)
         file_menu.add_command(label="Сохранить изображение", command=self.save_image_to_dialog)
+        file_menu.add_command(label="Параметры сохранения...", command=self.show_export_options)
+        file_menu.add_command(label="Экспорт в полном разрешении (TIFF)", command=self.export_full_resolution_dialog)
         menu_bar.add_cascade(label="Файл", menu=file_menu)
 
+        self.documents_menu = Menu(menu_bar, tearoff=0, postcommand=self.update_documents_menu)
+        menu_bar.add_cascade(label="Документы", menu=self.documents_menu)
+
         edit_menu = Menu(menu_bar, tearoff=0)
         edit_menu.add_command(label="Отмена", command=self.undo)
         edit_menu.add_command(label="Повтор", command=self.redo)
@@ -420,6 +1090,13 @@ class PhotoEditor:
         in_development_menu.add_command(label="Рисовать", command=self.draw_tab.toggle_drawing)
         menu_bar.add_cascade(label="В разработке", menu=in_development_menu)
 
+        profiling_menu = Menu(menu_bar, tearoff=0)
+        profiling_menu.add_command(label="Включить/выключить замеры времени", command=self.toggle_profiling)
+        profiling_menu.add_command(label="Профилировать следующее действие (cProfile)", command=self.profile_next_action)
+        profiling_menu.add_command(label="Сводка по операциям", command=self.show_profiling_summary)
+        profiling_menu.add_command(label="Экспорт трассировки (Chrome)", command=self.export_trace_dialog)
+        menu_bar.add_cascade(label="Профилирование", menu=profiling_menu)
+
         help_menu = Menu(menu_bar, tearoff=0)
         help_menu.add_command(label="Документация", command=self.show_documentation)
         menu_bar.add_cascade(label="Справка", menu=help_menu)
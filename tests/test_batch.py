@@ -0,0 +1,89 @@
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from PIL import Image
+from batch import load_recipe, run_batch, process_file, init_worker, MANIFEST_NAME
+from utilities.parallel import get_worker_count
+
+def crashing_process_file(input_path, output_path, recipe):
+    # Рабочий процесс аварийно завершается на файле crash.png, как при сбое декодера
+    if os.path.basename(input_path) == "crash.png":
+        os._exit(1)
+    return process_file(input_path, output_path, recipe)
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.input_dir = os.path.join(self.temp_dir.name, "input")
+        self.output_dir = os.path.join(self.temp_dir.name, "output")
+        os.makedirs(self.input_dir)
+        for index in range(3):
+            Image.new("RGB", (300, 200), (index * 40, 100, 50)).save(os.path.join(self.input_dir, f"image{index}.png"))
+        self.recipe_path = os.path.join(self.temp_dir.name, "recipe.json")
+        with open(self.recipe_path, "w", encoding="utf-8") as recipe_file:
+            json.dump({"width": 150, "height": 120, "brightness": 1.2}, recipe_file)
+
+    def run_batch(self):
+        return run_batch([os.path.join(self.input_dir, "*.png")], load_recipe(self.recipe_path), self.output_dir, workers=2)
+
+    def test_process_and_resume(self):
+        # Все файлы обрабатываются, повторный запуск пропускает готовые
+        summary = self.run_batch()
+        self.assertEqual(summary["processed"], 3)
+        self.assertEqual(summary["failed"], 0)
+        with Image.open(os.path.join(self.output_dir, "image0.png")) as result:
+            self.assertEqual(result.size, (150, 120))
+        summary = self.run_batch()
+        self.assertEqual(summary["processed"], 0)
+        self.assertEqual(summary["skipped"], 3)
+
+    def test_error_isolation(self):
+        # Поврежденный файл не мешает обработке остальных
+        with open(os.path.join(self.input_dir, "broken.png"), "wb") as broken_file:
+            broken_file.write(b"not an image")
+        summary = self.run_batch()
+        self.assertEqual(summary["processed"], 3)
+        self.assertEqual(summary["failed"], 1)
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, "broken.png")))
+
+    @unittest.skipUnless(multiprocessing.get_start_method() == "fork", "подмена функции передается рабочим процессам только при fork")
+    def test_worker_crash_isolation(self):
+        # Аварийное завершение рабочего процесса не прерывает запуск; файлы из сломанного пула
+        # записываются в манифест как ошибочные и обрабатываются при следующем запуске
+        for index in range(3, 8):
+            Image.new("RGB", (300, 200), (index * 20, 100, 50)).save(os.path.join(self.input_dir, f"image{index}.png"))
+        Image.new("RGB", (300, 200)).save(os.path.join(self.input_dir, "crash.png"))
+        with patch("batch.process_file", crashing_process_file):
+            summary = self.run_batch()
+        self.assertEqual(summary["processed"] + summary["failed"], 9)
+        self.assertIn(os.path.join(self.input_dir, "crash.png"), [input_path for input_path, _ in summary["errors"]])
+        self.assertLessEqual(summary["failed"], 2)
+        with open(os.path.join(self.output_dir, MANIFEST_NAME), encoding="utf-8") as manifest_file:
+            records = [json.loads(line) for line in manifest_file]
+        self.assertEqual(sum(record["status"] == "failed" for record in records), summary["failed"])
+
+        summary = self.run_batch()
+        self.assertEqual(summary["failed"], 0)
+        self.assertEqual(summary["skipped"] + summary["processed"], 9)
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, "crash.png")))
+
+    def test_worker_processes_single_threaded(self):
+        # Рабочие процессы не создают собственный пул потоков на все ядра
+        with concurrent.futures.ProcessPoolExecutor(max_workers=2, initializer=init_worker) as executor:
+            self.assertEqual(executor.submit(get_worker_count).result(), 1)
+
+    def test_unknown_recipe_key(self):
+        # Опечатка в рецепте обнаруживается до начала обработки
+        with open(self.recipe_path, "w", encoding="utf-8") as recipe_file:
+            json.dump({"brigthness": 1.2}, recipe_file)
+        with self.assertRaises(ValueError):
+            load_recipe(self.recipe_path)
+
+if __name__ == '__main__':
+    unittest.main(argv=[''], exit=False)
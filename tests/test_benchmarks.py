@@ -0,0 +1,64 @@
+import json
+import os
+import tempfile
+import unittest
+from benchmarks.suite import CASES, compare_results, make_image, percentile, run_scaling, run_suite, main
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_percentile(self):
+        samples = [4.0, 1.0, 3.0, 2.0]
+        self.assertEqual(percentile(samples, 0), 1.0)
+        self.assertEqual(percentile(samples, 50), 2.5)
+        self.assertEqual(percentile(samples, 100), 4.0)
+
+    def test_synthetic_image_is_reproducible(self):
+        # Одинаковые параметры дают одинаковое изображение нужного размера
+        for mode in ("RGB", "RGBA", "L"):
+            with self.subTest(mode=mode):
+                image = make_image(mode, 0.03)
+                self.assertEqual(image.mode, mode)
+                self.assertAlmostEqual(image.width * image.height / 1e6, 0.03, delta=0.001)
+                self.assertEqual(image.tobytes(), make_image(mode, 0.03).tobytes())
+
+    def test_all_cases_run(self):
+        # Каждая операция выполняется и возвращает замеры
+        results = run_suite(modes=("RGB",), sizes=(0.02,), repeat=2, warmup=0, isolated=False)
+        self.assertEqual({result["case"] for result in results["results"]}, set(CASES))
+        for result in results["results"]:
+            self.assertEqual(len(result["samples"]), 2)
+            self.assertLessEqual(result["p50"], result["p99"])
+
+    def test_compare_detects_regression(self):
+        baseline = {"version": 1, "results": [{"case": "save_png", "mode": "RGB", "megapixels": 1, "p50": 0.100, "peak_rss_mb": 100}]}
+        current = {"version": 1, "results": [{"case": "save_png", "mode": "RGB", "megapixels": 1.0, "p50": 0.115, "peak_rss_mb": 150}]}
+        rows, regressions = compare_results(baseline, current, threshold=0.2)
+        self.assertEqual(regressions, [])
+        self.assertAlmostEqual(rows[0][3], 1.15)
+        _, regressions = compare_results(baseline, current, threshold=0.1)
+        self.assertEqual(len(regressions), 1)
+        _, regressions = compare_results(baseline, current, threshold=0.2, rss_threshold=0.2)
+        self.assertEqual(regressions[0][1], "peak_rss_mb")
+
+    def test_cli_baseline_and_compare(self):
+        # Файл базовой линии записывается, сравнение с самим собой проходит
+        with tempfile.TemporaryDirectory() as temp_dir:
+            baseline_path = os.path.join(temp_dir, "baseline.json")
+            code = main(["run", "--cases", "apply_adjustments", "--modes", "L", "--sizes", "0.02", "--repeat", "1",
+                         "--output", baseline_path])
+            self.assertEqual(code, 0)
+            with open(baseline_path, encoding="utf-8") as baseline_file:
+                baseline = json.load(baseline_file)
+            self.assertEqual(baseline["results"][0]["case"], "apply_adjustments")
+            self.assertIsNotNone(baseline["results"][0]["peak_rss_mb"])
+            self.assertEqual(main(["compare", baseline_path, baseline_path]), 0)
+
+    def test_scaling(self):
+        # Замеры для каждого числа потоков; ускорение относительно первого
+        rows = run_scaling("L", 0.05, workers=(1, 2), repeat=1)
+        self.assertEqual([row["workers"] for row in rows], [1, 2])
+        self.assertEqual(rows[0]["speedup"], 1.0)
+        self.assertGreater(rows[1]["total_s"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
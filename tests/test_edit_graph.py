@@ -0,0 +1,212 @@
+import unittest
+from unittest.mock import patch
+from PIL import Image, ImageChops, ImageStat
+from utilities.edit_graph import EditGraph, EditHistory, OPERATIONS
+from utilities.image_processing import apply_adjustments
+from utilities.render_cache import RenderCache
+from utilities.headless import create_editor, open_document, HeadlessEvent
+from utilities.strokes import Stroke
+
+class TestEditGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.image = Image.effect_noise((200, 150), 60).convert("RGB")
+        self.cache = RenderCache(64 * 1024 * 1024)
+        self.graph = (EditGraph().set("resize", width=300, height=200)
+                      .set("color", brightness=1.2, contrast=0.9, saturation=1.3).set("blur", radius=2))
+
+    def test_matches_slider_pipeline(self):
+        # Узлы resize, color и blur дают тот же результат, что и apply_adjustments
+        result = self.graph.evaluate(self.image, 1, self.cache)
+        expected = apply_adjustments(self.image, 300, 200, 1.2, 0.9, 1.3, 2)
+        self.assertIsNone(ImageChops.difference(result, expected).getbbox())
+
+    def test_set_replaces_in_place(self):
+        graph = self.graph.append("rotate", angle=90).set("color", brightness=1.5, contrast=1.0, saturation=1.0)
+        self.assertEqual([node.kind for node in graph], ["resize", "color", "blur", "rotate"])
+        self.assertIs(graph.set("blur", radius=2), graph)
+        # Нейтральный узел, которого еще нет, не добавляется
+        self.assertEqual(len(EditGraph().set("color", brightness=1.0, contrast=1.0, saturation=1.0)), 0)
+
+    def test_overlays_stay_last(self):
+        graph = EditGraph().set("strokes", strokes=("a",)).append("crop", box=(0, 0, 0.5, 0.5))
+        self.assertEqual([node.kind for node in graph], ["crop", "strokes"])
+        self.assertEqual([node.kind for node in graph.raster()], ["crop"])
+
+    def test_overlays_follow_geometry(self):
+        # Штрихи и текст переводятся в координаты итогового изображения после обрезки и поворота
+        stroke = Stroke("#ff0000", 4, (10, 20, 110, 20))
+        text = {"text": "A", "font_family": "Arial", "font_size": 20, "x": 50, "y": 60, "color": "#ffffff"}
+        graph = EditGraph().set("strokes", strokes=(stroke,)).set("text", items=(text,))
+        cropped = graph.append("crop", box=(0.05, 0.1, 1.0, 1.0)).remap_overlays(graph, (200, 150))
+        self.assertEqual(list(cropped.find("strokes")["strokes"][0].points), [0, 5, 100, 5])
+        self.assertEqual((cropped.find("text")["items"][0]["x"], cropped.find("text")["items"][0]["y"]), (40, 45))
+        rotated = graph.append("rotate", angle=90).remap_overlays(graph, (200, 150))
+        # Пиксель (x, y) после поворота на 90 градусов против часовой стрелки - (y, 199 - x)
+        self.assertEqual(list(rotated.find("strokes")["strokes"][0].points), [20, 189, 20, 89])
+        resized = graph.set("resize", width=400, height=300).remap_overlays(graph, (200, 150))
+        self.assertEqual(resized.find("strokes")["strokes"][0].brush_size, 8)
+        self.assertEqual(resized.find("text")["items"][0]["font_size"], 40)
+        self.assertIs(graph.set("color", brightness=1.5, contrast=1.0, saturation=1.0).remap_overlays(graph, (200, 150)).find("strokes"),
+                      graph.find("strokes"))
+
+    def test_change_reevaluates_only_later_nodes(self):
+        # Изменение узла пересчитывает его и следующие узлы; предыдущие берутся из кэша
+        graph = self.graph.append("crop", box=(0.1, 0.1, 0.9, 0.9))
+        graph.evaluate(self.image, 1, self.cache)
+        calls = []
+        wrapped = {kind: (lambda kind, operation: lambda *args: calls.append(kind) or operation(*args))(kind, operation)
+                   for kind, operation in OPERATIONS.items()}
+        with patch.dict(OPERATIONS, wrapped):
+            graph.set("blur", radius=3).evaluate(self.image, 1, self.cache)
+            self.assertEqual(calls, ["blur", "crop"])
+            calls.clear()
+            graph.evaluate(self.image, 1, self.cache)
+            self.assertEqual(calls, [])
+
+    def test_preview_scale(self):
+        # На уменьшенной копии размеры узлов умножаются на масштаб, доли обрезки сохраняются
+        graph = self.graph.append("crop", box=(0, 0, 0.5, 0.5))
+        self.assertEqual(graph.evaluate(self.image, 1, self.cache).size, (150, 100))
+        self.assertEqual(graph.evaluate(self.image.reduce(2), 2, self.cache, scale=0.5).size, (75, 50))
+
+class TestEditHistory(unittest.TestCase):
+
+    def test_pointer_moves(self):
+        history = EditHistory(maxlen=3)
+        graphs = [EditGraph().set("blur", radius=radius) for radius in (1, 2, 3, 4)]
+        for graph in graphs:
+            history.append(graph)
+        self.assertEqual(len(history), 3)
+        self.assertIs(history.undo(), graphs[2])
+        self.assertIs(history.undo(), graphs[1])
+        self.assertIsNone(history.undo())
+        self.assertIs(history.redo(), graphs[2])
+        self.assertEqual(history.redo_count(), 1)
+        history.append(graphs[0])
+        self.assertEqual(history.redo_count(), 0)
+        self.assertIs(history[-1], graphs[0])
+
+class TestEditorGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.source = Image.effect_noise((800, 600), 40).convert("RGB")
+        self.editor = open_document(create_editor((800, 600)), self.source)
+
+    def test_crop_survives_slider_change(self):
+        editor = self.editor
+        editor.selection_top_x, editor.selection_top_y = 100, 100
+        editor.selection_bottom_x, editor.selection_bottom_y = 500, 400
+        editor.crop_image()
+        self.assertEqual(editor.image.size, (400, 300))
+        editor.filter_tab.brightness_scale.set(1.5)
+        editor.apply_adjustments()
+        self.assertEqual(editor.image.size, (400, 300))
+        self.assertIsNone(ImageChops.difference(editor.original_image, self.source).getbbox())
+
+    def test_rotate_keeps_original(self):
+        editor = self.editor
+        editor.rotate_image(90)
+        self.assertEqual(editor.image.size, (600, 800))
+        self.assertIsNone(ImageChops.difference(editor.original_image, self.source).getbbox())
+        editor.undo()
+        self.assertEqual(editor.image.size, (800, 600))
+
+    def draw_stroke_and_text(self):
+        # Штрих и текст поверх однотонного изображения (масштаб холста 1)
+        self.editor.finish_load("<memory>", Image.new("RGB", (800, 600), "gray"))
+        draw_tab = self.editor.draw_tab
+        draw_tab.color, draw_tab.brush_size = "#ff0000", 6
+        for x, y in ((150, 150), (300, 200), (450, 180)):
+            draw_tab.paint(HeadlessEvent(x, y))
+        draw_tab.reset(HeadlessEvent(450, 180))
+        # Текст добавляется в (100, 100) и перетаскивается в (200, 250); граф правки
+        # получает штрих и текст при завершении каждого действия
+        draw_tab.text_items.append({"id": None, "text": "Текст", "font_family": "Arial", "font_size": 30,
+                                    "x": 100, "y": 100, "color": "#0000ff"})
+        draw_tab.update_text_on_canvas(draw_tab.text_items[-1])
+        draw_tab.save_history()
+        draw_tab.select_text(HeadlessEvent(100, 100))
+        draw_tab.drag_text(HeadlessEvent(200, 250))
+        draw_tab.release_text(HeadlessEvent(200, 250))
+        return draw_tab.get_final_image()
+
+    def test_draw_then_resize(self):
+        # Завершенные штрих и перемещение текста не теряются при изменении размера
+        editor = self.editor
+        self.draw_stroke_and_text()
+        self.assertEqual(len(editor.edit_graph.find("strokes")["strokes"]), 1)
+        editor.edit_tab.width_scale.set(400)
+        editor.edit_tab.height_scale.set(300)
+        editor.apply_adjustments()
+        self.assertEqual(len(editor.draw_tab.drawn_items), 1)
+        self.assertEqual(list(editor.draw_tab.drawn_items[0].points[:2]), [75, 75])
+        self.assertEqual((editor.draw_tab.text_items[0]["x"], editor.draw_tab.text_items[0]["y"]), (100, 125))
+
+    def test_draw_then_crop(self):
+        # Штрихи и текст остаются на тех же местах изображения после обрезки
+        editor = self.editor
+        before = self.draw_stroke_and_text()
+        editor.selection_top_x, editor.selection_top_y = 100, 120
+        editor.selection_bottom_x, editor.selection_bottom_y = 500, 400
+        editor.crop_image()
+        self.assertIsNone(ImageChops.difference(editor.draw_tab.get_final_image(), before.crop((100, 120, 500, 400))).getbbox())
+        self.assertEqual((editor.draw_tab.text_items[0]["x"], editor.draw_tab.text_items[0]["y"]), (100, 130))
+        self.assertEqual(editor.image_canvas.coords(editor.draw_tab.text_items[0]["id"]), [100, 130])
+        editor.undo()
+        self.assertIsNone(ImageChops.difference(editor.draw_tab.get_final_image(), before).getbbox())
+
+    def test_draw_then_rotate(self):
+        editor = self.editor
+        before = self.draw_stroke_and_text()
+        editor.rotate_image(90)
+        after = editor.draw_tab.get_final_image()
+        self.assertEqual(after.size, (600, 800))
+        # Красные пиксели штриха совпадают с повернутыми, кроме краев линии
+        expected = before.transpose(Image.ROTATE_90).getchannel("R").point(lambda value: 255 if value == 255 else 0)
+        actual = after.getchannel("R").point(lambda value: 255 if value == 255 else 0)
+        overlap = ImageStat.Stat(ImageChops.multiply(expected, actual)).sum[0]
+        self.assertGreater(overlap / ImageStat.Stat(expected).sum[0], 0.8)
+        # Левый верхний угол текста переносится вместе с изображением
+        self.assertEqual((editor.draw_tab.text_items[0]["x"], editor.draw_tab.text_items[0]["y"]), (250, 599))
+
+    def test_resize_slider_does_not_drift_overlays(self):
+        editor = self.editor
+        self.draw_stroke_and_text()
+        strokes = list(editor.draw_tab.drawn_items)
+        for width, height in ((400, 300), (533, 400), (800, 600)):
+            editor.edit_tab.width_scale.set(width)
+            editor.edit_tab.height_scale.set(height)
+            editor.apply_adjustments(interactive=True)
+        self.assertEqual(editor.draw_tab.drawn_items, strokes)
+        editor.edit_tab.width_scale.set(400)
+        editor.edit_tab.height_scale.set(300)
+        editor.apply_adjustments()
+        self.assertEqual(editor.draw_tab.drawn_items[0].brush_size, 3)
+        self.assertEqual(list(editor.draw_tab.drawn_items[0].points[:2]), [75, 75])
+
+    def test_undo_restores_strokes_and_sliders(self):
+        editor = self.editor
+        editor.filter_tab.brightness_scale.set(1.4)
+        editor.apply_adjustments()
+        editor.save_history()
+        draw_tab = editor.draw_tab
+        for x, y in ((10, 10), (60, 40)):
+            draw_tab.paint(HeadlessEvent(x, y))
+        draw_tab.reset(HeadlessEvent(60, 40))
+        editor.save_history()
+        stroke = draw_tab.drawn_items[0]
+        self.assertEqual(editor.edit_graph.find("strokes")["strokes"], (stroke,))
+        editor.undo()
+        self.assertEqual(draw_tab.drawn_items, [])
+        self.assertEqual(editor.filter_tab.brightness_scale.get(), 1.4)
+        editor.undo()
+        self.assertEqual(editor.filter_tab.brightness_scale.get(), 1.0)
+        editor.redo()
+        editor.redo()
+        self.assertEqual(draw_tab.drawn_items, [stroke])
+        # Сохраненное изображение содержит штрихи из графа
+        self.assertIsNotNone(ImageChops.difference(draw_tab.get_final_image(), editor.image).getbbox())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from utilities import fonts
+from utilities.fonts import FontIndex, get_font, load_font
+
+def fake_font_name(path):
+    # Имя шрифта по имени файла вида "Family-Style.ttf"
+    family, style = os.path.splitext(os.path.basename(path))[0].split("-")
+    return family, style
+
+class TestFontIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.font_dir = os.path.join(self.temp_dir, "fonts")
+        os.makedirs(os.path.join(self.font_dir, "sub"))
+        for name in ("Sans-Bold.ttf", "Sans-Regular.ttf", os.path.join("sub", "Serif-Italic.otf"), "readme.txt"):
+            with open(os.path.join(self.font_dir, name), "wb") as font_file:
+                font_file.write(b"")
+        self.cache_path = os.path.join(self.temp_dir, "cache", "font_index.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    @patch("utilities.fonts.read_font_name", side_effect=fake_font_name)
+    def test_scan_maps_families_to_files(self, mock_read):
+        index = FontIndex([self.font_dir], self.cache_path).load()
+        self.assertEqual(index.find("sans"), os.path.join(self.font_dir, "Sans-Regular.ttf"))
+        self.assertEqual(index.find("Serif"), os.path.join(self.font_dir, "sub", "Serif-Italic.otf"))
+        self.assertEqual(index.find("Sans-Bold"), os.path.join(self.font_dir, "Sans-Bold.ttf"))
+        self.assertIsNone(index.find("Missing"))
+        self.assertEqual(index.families(), ["Sans", "Serif"])
+        self.assertEqual(mock_read.call_count, 3)
+
+    @patch("utilities.fonts.read_font_name", side_effect=fake_font_name)
+    def test_index_is_persisted_between_runs(self, mock_read):
+        FontIndex([self.font_dir], self.cache_path).load()
+        self.assertTrue(os.path.exists(self.cache_path))
+        mock_read.reset_mock()
+
+        # Повторный запуск читает сохраненный индекс без сканирования
+        index = FontIndex([self.font_dir], self.cache_path).load()
+        mock_read.assert_not_called()
+        self.assertEqual(index.find("Sans"), os.path.join(self.font_dir, "Sans-Regular.ttf"))
+
+        # Изменение каталога приводит к повторному сканированию
+        with open(os.path.join(self.font_dir, "Mono-Regular.ttf"), "wb") as font_file:
+            font_file.write(b"")
+        os.utime(self.font_dir, ns=(0, os.stat(self.font_dir).st_mtime_ns + 10**9))
+        index = FontIndex([self.font_dir], self.cache_path).load()
+        self.assertEqual(mock_read.call_count, 4)
+        self.assertIsNotNone(index.find("Mono"))
+
+    def test_unknown_family_falls_back_to_default(self):
+        index = FontIndex([self.font_dir]).load()
+        self.assertIsNotNone(get_font("Missing", 20, index))
+        self.assertIs(fonts.load_default_font(), fonts.load_default_font())
+
+    def test_loaded_fonts_are_cached(self):
+        index = FontIndex(fonts.default_font_dirs()).load()
+        families = index.families()
+        if not families:
+            self.skipTest("В системе нет шрифтов")
+        font = get_font(families[0], 24, index)
+        self.assertIs(get_font(families[0], 24, index), font)
+        self.assertIs(load_font(index.find(families[0]), 24), font)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+from unittest.mock import patch
+from PIL import Image, ImageChops, ImageStat
+from utilities.edit_graph import EditGraph
+from utilities.geometry import apply_geometry, plan_geometry
+from utilities.render_cache import RenderCache
+
+def sequential(image, steps):
+    # Эталон: шаги по очереди, каждый со своей передискретизацией
+    for kind, value in steps:
+        if kind == "resize":
+            image = image.resize(value, Image.LANCZOS)
+        elif kind == "rotate":
+            image = image.rotate(value, Image.BICUBIC, expand=True)
+        else:
+            width, height = image.size
+            image = image.crop((round(value[0] * width), round(value[1] * height), round(value[2] * width), round(value[3] * height)))
+    return image
+
+def mean_difference(first, second):
+    return max(ImageStat.Stat(ImageChops.difference(first, second)).mean)
+
+class TestGeometry(unittest.TestCase):
+
+    def setUp(self):
+        self.image = Image.effect_noise((301, 203), 60).convert("RGB")
+        self.smooth = Image.radial_gradient("L").resize((400, 300)).convert("RGB")
+
+    def test_rotation_matches_pillow(self):
+        for angle in (0, 90, 180, 270, -90, 450, 30, -17.5, 45):
+            result = apply_geometry(self.image, [("rotate", angle)])
+            expected = self.image.rotate(angle, Image.BICUBIC, expand=True)
+            self.assertEqual(result.size, expected.size)
+            self.assertIsNone(ImageChops.difference(result, expected).getbbox(), angle)
+
+    def test_right_angles_do_not_resample(self):
+        # Повороты на 90 градусов и целочисленная обрезка - перестановка пикселей
+        steps = [("rotate", 90), ("crop", (0.1, 0.2, 0.7, 0.9)), ("rotate", 180)]
+        with patch.object(Image.Image, "transform", side_effect=AssertionError("transform")), \
+             patch.object(Image.Image, "resize", side_effect=AssertionError("resize")):
+            result = apply_geometry(self.image, steps)
+        self.assertIsNone(ImageChops.difference(result, sequential(self.image, steps)).getbbox())
+
+    def test_sizes_match_sequential(self):
+        for steps in ([("resize", (600, 400)), ("rotate", 30), ("crop", (0.1, 0.2, 0.8, 0.9))],
+                      [("rotate", 15), ("rotate", -40)],
+                      [("crop", (0.25, 0.25, 0.75, 0.75)), ("resize", (500, 500)), ("rotate", 90)]):
+            self.assertEqual(plan_geometry(self.image.size, steps)[1], sequential(self.image, steps).size)
+            self.assertEqual(apply_geometry(self.image, steps).size, sequential(self.image, steps).size)
+
+    def test_fused_close_to_sequential(self):
+        steps = [("resize", (600, 450)), ("rotate", 30), ("crop", (0.1, 0.2, 0.8, 0.9))]
+        self.assertLess(mean_difference(apply_geometry(self.smooth, steps), sequential(self.smooth, steps)), 2.0)
+        # Растяжение вдоль осей с поворотом на 90 градусов - Image.resize с областью box
+        steps = [("resize", (600, 450)), ("rotate", 90), ("crop", (0.1, 0.2, 0.8, 0.9))]
+        self.assertLess(mean_difference(apply_geometry(self.smooth, steps), sequential(self.smooth, steps)), 1.0)
+
+    def test_downscale_rotation_is_smoothed(self):
+        # Сильное уменьшение с поворотом усредняет пиксели, а не выбирает отдельные
+        noise = Image.effect_noise((1600, 1200), 80).convert("L")
+        result = apply_geometry(noise, [("resize", (200, 150)), ("rotate", 20)])
+        self.assertLess(ImageStat.Stat(result.crop((60, 60, 140, 100))).stddev[0], ImageStat.Stat(noise).stddev[0] / 2)
+
+    def test_graph_fuses_geometry(self):
+        graph = EditGraph().set("resize", width=600, height=400).append("rotate", angle=30).append("crop", box=(0.1, 0.1, 0.9, 0.9))
+        cache = RenderCache(64 * 1024 * 1024)
+        with patch("utilities.edit_graph.apply_geometry", wraps=apply_geometry) as fused:
+            result = graph.evaluate(self.image, 1, cache)
+        fused.assert_called_once()
+        self.assertEqual(len(fused.call_args[0][1]), 3)
+        self.assertEqual(result.size, sequential(self.image, [("resize", (600, 400)), ("rotate", 30), ("crop", (0.1, 0.1, 0.9, 0.9))]).size)
+        # Результат группы кэшируется под ключом последнего узла
+        with patch("utilities.edit_graph.apply_geometry", side_effect=AssertionError("пересчет")):
+            graph.set("color", brightness=1.2, contrast=1.0, saturation=1.0).evaluate(self.image, 1, cache)
+
+if __name__ == "__main__":
+    unittest.main()
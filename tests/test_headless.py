@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+from PIL import Image
+from utilities.headless import create_editor, open_document, HeadlessEvent
+
+class TestHeadlessEditor(unittest.TestCase):
+
+    def setUp(self):
+        self.editor = open_document(create_editor((400, 300)), Image.effect_noise((800, 600), 40).convert("RGB"))
+
+    def test_open_document(self):
+        # Изображение показано на холсте и сохранено в истории
+        self.assertEqual(self.editor.display_size, (400, 300))
+        self.assertEqual(len(self.editor.history), 1)
+        self.assertEqual(self.editor.image_canvas.type("background"), "image")
+
+    def test_slider_drag_and_release(self):
+        # Перемещение ползунка показывает предпросмотр, отпускание - полный рендер
+        filter_tab = self.editor.filter_tab
+        filter_tab.brightness_scale.set(1.5)
+        filter_tab.update_brightness()
+        self.assertTrue(self.editor.root.run_until(self.editor.render_scheduler.is_idle, timeout=10))
+        self.assertIsNotNone(self.editor.preview_image)
+        filter_tab.save_brightness(None)
+        self.assertIsNone(self.editor.preview_image)
+        self.assertEqual(self.editor.quality_tier, "final")
+        self.assertEqual(len(self.editor.history), 2)
+
+    def test_stroke_and_undo(self):
+        draw_tab = self.editor.draw_tab
+        image = self.editor.image
+        pixels = image.tobytes()
+        for x, y in ((10, 10), (60, 40), (120, 20)):
+            draw_tab.paint(HeadlessEvent(x, y))
+        # Во время рисования штрих есть только на холсте, пиксели документа не изменяются
+        self.assertEqual(len(self.editor.image_canvas.find_withtag("active_stroke")), 2)
+        self.assertIs(self.editor.image, image)
+        self.assertEqual(image.tobytes(), pixels)
+        draw_tab.reset(HeadlessEvent(120, 20))
+        self.assertEqual(len(draw_tab.drawn_items), 1)
+        self.assertEqual(len(self.editor.image_canvas.find_withtag("stroke")), 1)
+        self.editor.save_history()
+        self.editor.undo()
+        self.assertEqual(draw_tab.drawn_items, [])
+        self.assertEqual(self.editor.image_canvas.find_withtag("stroke"), ())
+
+    def test_background_export(self):
+        # Сохранение со штрихом выполняется в фоне; в строке состояния - размер файла и время кодирования
+        draw_tab = self.editor.draw_tab
+        for x, y in ((10, 10), (60, 40)):
+            draw_tab.paint(HeadlessEvent(x, y))
+        draw_tab.reset(HeadlessEvent(60, 40))
+        self.editor.encoder_options["png_compress_level"] = 1
+        with tempfile.TemporaryDirectory() as temp_dir:
+            save_path = os.path.join(temp_dir, "export.png")
+            self.editor.save_image(save_path)
+            self.assertTrue(self.editor.root.run_until(lambda: not self.editor.pending_exports, timeout=30))
+            self.assertIn("Сохранено export.png", self.editor.status_label.cget("text"))
+            with Image.open(save_path) as saved:
+                self.assertEqual(saved.size, (800, 600))
+                # Штрих из (20, 20) в (120, 80) в координатах изображения (масштаб холста 0.5)
+                self.assertEqual(saved.convert("RGB").getpixel((70, 50)), (0, 0, 0))
+
+if __name__ == '__main__':
+    unittest.main()
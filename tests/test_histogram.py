@@ -0,0 +1,84 @@
+import unittest
+from PIL import Image, ImageStat
+from utilities.edit_graph import EditGraph
+from utilities.headless import create_editor, open_document
+from utilities.histogram import HistogramTracker, auto_levels, color_table, compute_histogram, histogram_proxy, percentile_level, remap_histogram
+from utilities.image_processing import apply_color_adjustments
+
+def make_low_contrast_image(size=(600, 400)):
+    # Изображение с яркостью в узком диапазоне 80-170
+    noise = Image.effect_noise(size, 40).convert("L").point(lambda value: 80 + value * 90 // 255)
+    gradient = Image.linear_gradient("L").resize(size).point(lambda value: 80 + value * 90 // 255)
+    return Image.merge("RGB", (noise, gradient, noise.transpose(Image.FLIP_LEFT_RIGHT)))
+
+class TestHistogram(unittest.TestCase):
+
+    def test_compute_histogram(self):
+        image = make_low_contrast_image()
+        histogram = compute_histogram(image)
+        self.assertEqual(sorted(histogram), ["B", "G", "L", "R"])
+        self.assertEqual(sum(histogram["L"]), image.width * image.height)
+        self.assertEqual(histogram["L"], image.convert("L").histogram())
+        self.assertEqual(list(compute_histogram(image.convert("L"))), ["L"])
+
+    def test_remap_matches_adjusted_image(self):
+        # Перенос через таблицу совпадает с гистограммой скорректированного изображения
+        image = make_low_contrast_image()
+        histogram = compute_histogram(image)
+        for brightness, contrast in [(1.3, 1.0), (0.7, 1.8), (1.5, 0.6)]:
+            remapped = remap_histogram(histogram, color_table(histogram, brightness, contrast))
+            adjusted = compute_histogram(apply_color_adjustments(image, brightness, contrast, 1.0))
+            for channel in "RGB":
+                self.assertEqual(remapped[channel], adjusted[channel])
+
+    def test_tracker_remaps_color_changes(self):
+        image = make_low_contrast_image((1200, 800))
+        tracker = HistogramTracker()
+        graph = EditGraph().set("resize", width=1200, height=800)
+        tracker.update(image, 1, graph)
+        self.assertEqual(tracker.scans, 1)
+        for brightness in (0.8, 1.1, 1.4):
+            histogram = tracker.update(image, 1, graph.set("color", brightness=brightness, contrast=1.2, saturation=1.0))
+        self.assertEqual(tracker.scans, 1)
+        proxy = histogram_proxy(image)
+        expected = compute_histogram(apply_color_adjustments(proxy, 1.4, 1.2, 1.0))
+        self.assertEqual(histogram["G"], expected["G"])
+
+        # Насыщенность и размытие требуют нового подсчета
+        tracker.update(image, 1, graph.set("color", brightness=1.4, contrast=1.2, saturation=1.5))
+        self.assertEqual(tracker.scans, 2)
+        tracker.update(image, 1, graph.set("blur", radius=3))
+        self.assertEqual(tracker.scans, 3)
+        tracker.update(image, 2, graph)
+        self.assertEqual(tracker.scans, 4)
+
+    def test_auto_levels_stretches_range(self):
+        image = make_low_contrast_image()
+        brightness, contrast = auto_levels(compute_histogram(image))
+        self.assertGreater(contrast, 1.0)
+        adjusted = compute_histogram(apply_color_adjustments(image, brightness, contrast, 1.0))["L"]
+        original = compute_histogram(image)["L"]
+        adjusted_range = percentile_level(adjusted, 0.995) - percentile_level(adjusted, 0.005)
+        original_range = percentile_level(original, 0.995) - percentile_level(original, 0.005)
+        self.assertGreater(adjusted_range, original_range * 1.5)
+
+    def test_auto_levels_keeps_full_range_image(self):
+        image = Image.linear_gradient("L").resize((256, 256)).convert("RGB")
+        brightness, contrast = auto_levels(compute_histogram(image))
+        self.assertAlmostEqual(brightness, 1.0, delta=0.05)
+        self.assertAlmostEqual(contrast, 1.0, delta=0.05)
+
+    def test_editor_histogram_and_auto_levels(self):
+        editor = open_document(create_editor((400, 300)), make_low_contrast_image())
+        canvas = editor.filter_tab.histogram_canvas
+        self.assertEqual(len(canvas.find_withtag("histogram")), 4)
+        history_length = len(editor.history)
+        editor.auto_levels()
+        self.assertGreater(editor.filter_tab.contrast_scale.get(), 1.0)
+        self.assertEqual(len(editor.history), history_length + 1)
+        self.assertGreater(ImageStat.Stat(editor.image.convert("L")).stddev[0],
+                           ImageStat.Stat(editor.original_image.convert("L")).stddev[0])
+        self.assertEqual(len(canvas.find_withtag("histogram")), 4)
+
+if __name__ == "__main__":
+    unittest.main()
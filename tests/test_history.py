@@ -0,0 +1,115 @@
+import os
+import tempfile
+import unittest
+from PIL import Image, ImageChops, ImageDraw
+from utilities.edit_graph import EditGraph, EditHistory
+from utilities.headless import create_editor, open_document
+from utilities.history import SnapshotStore, TILE_SIZE
+
+class TestSnapshotStore(unittest.TestCase):
+
+    def setUp(self):
+        self.image = Image.effect_noise((TILE_SIZE * 4, TILE_SIZE * 3), 50).convert("RGB")
+        self.tile_bytes = TILE_SIZE * TILE_SIZE * 3
+
+    def assertSameImage(self, first, second):
+        self.assertEqual(first.size, second.size)
+        self.assertIsNone(ImageChops.difference(first, second).getbbox())
+
+    def test_round_trip(self):
+        # Снимок восстанавливается без потерь, в том числе с палитрой
+        store = SnapshotStore()
+        self.assertSameImage(store.add(self.image).image(), self.image)
+        palette_image = self.image.convert("P")
+        restored = store.add(palette_image).image()
+        self.assertEqual(restored.getpalette(), palette_image.getpalette())
+        self.assertEqual(restored.tobytes(), palette_image.tobytes())
+
+    def test_unchanged_tiles_shared(self):
+        # Плитки, совпадающие с предыдущим снимком, хранятся один раз
+        store = SnapshotStore()
+        first = store.add(self.image)
+        self.assertEqual(store.memory_usage(), 12 * self.tile_bytes)
+        edited = self.image.copy()
+        ImageDraw.Draw(edited).line((10, 10, 20, 20), fill="red", width=3)
+        store.add(edited, first)
+        self.assertEqual(store.memory_usage(), 13 * self.tile_bytes)
+        store.remove(first)
+        self.assertEqual(store.memory_usage(), 12 * self.tile_bytes)
+
+    def test_budget_drops_old_snapshots(self):
+        # Без выгрузки старые снимки удаляются при превышении лимита
+        store = SnapshotStore(budget_bytes=15 * self.tile_bytes)
+        snapshots = [store.add(self.image.rotate(angle)) for angle in (0, 90, 180)]
+        self.assertEqual(len(store), 1)
+        self.assertIsNone(snapshots[0].image())
+        self.assertSameImage(snapshots[-1].image(), self.image.rotate(180))
+        self.assertLessEqual(store.memory_usage(), 15 * self.tile_bytes)
+
+    def test_budget_spills_to_disk(self):
+        # С выгрузкой старые снимки переносятся на диск и остаются доступны
+        with tempfile.TemporaryDirectory() as spill_dir:
+            store = SnapshotStore(budget_bytes=15 * self.tile_bytes, spill_to_disk=True, spill_dir=spill_dir)
+            first = store.add(self.image)
+            store.add(self.image.rotate(180))
+            self.assertEqual(len(store), 2)
+            self.assertEqual(store.memory_usage(), 12 * self.tile_bytes)
+            self.assertGreater(store.disk_usage(), 0)
+            self.assertSameImage(first.image(), self.image)
+            store.close()
+            self.assertEqual(os.listdir(spill_dir), [])
+            self.assertEqual(store.memory_usage(), 0)
+
+class TestEditHistorySnapshots(unittest.TestCase):
+
+    def setUp(self):
+        self.image = Image.effect_noise((TILE_SIZE * 2, TILE_SIZE * 2), 50).convert("RGB")
+        self.store = SnapshotStore()
+        self.history = EditHistory(maxlen=2, snapshots=self.store)
+
+    def test_versions_keep_snapshots(self):
+        # Отмена и повтор возвращают снимки своих версий
+        first, second = EditGraph(), EditGraph().set("color", brightness=1.2, contrast=1.0, saturation=1.0)
+        self.history.append(first, self.image)
+        self.history.append(second, self.image.rotate(90))
+        self.assertIs(self.history.undo(), first)
+        self.assertEqual(self.history.image().tobytes(), self.image.tobytes())
+        self.history.redo()
+        self.assertEqual(self.history.image().tobytes(), self.image.rotate(90).tobytes())
+
+    def test_dropped_versions_release_snapshots(self):
+        # Версии, вытесненные maxlen, отброшенные повтором или clear(), освобождают плитки
+        for angle in (0, 90, 180):
+            self.history.append(EditGraph(), self.image.rotate(angle))
+        self.assertEqual(len(self.store), 2)
+        self.history.undo()
+        self.history.append(EditGraph(), self.image)
+        self.assertEqual(len(self.store), 2)
+        self.history.clear()
+        self.assertEqual(len(self.store), 0)
+        self.assertEqual(self.store.memory_usage(), 0)
+
+class TestEditorUndoSnapshots(unittest.TestCase):
+
+    def test_undo_after_cache_eviction_uses_snapshot(self):
+        # Отмена после вытеснения кэша рендера берет изображение из снимка без пересчета графа
+        editor = create_editor((400, 300))
+        self.addCleanup(editor.history_snapshots.close)
+        image = Image.effect_noise((600, 400), 40).convert("RGB")
+        open_document(editor, image)
+        editor.filter_tab.brightness_scale.set(1.4)
+        editor.apply_adjustments()
+        editor.save_history()
+        brightened = editor.image.copy()
+        editor.filter_tab.brightness_scale.set(0.6)
+        editor.apply_adjustments()
+        editor.save_history()
+        editor.render_cache.clear()
+        editor.undo()
+        self.assertEqual(editor.render_cache.misses, 0)
+        self.assertIsNone(ImageChops.difference(editor.image, brightened).getbbox())
+        editor.undo()
+        self.assertIsNone(ImageChops.difference(editor.image, image).getbbox())
+
+if __name__ == '__main__':
+    unittest.main(argv=[''], exit=False)
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from PIL import Image
+from utilities.headless import create_editor, open_document
+from utilities.image_loader import LoadCancelled, LoadTask, load_document_image
+
+class TestImageLoader(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.png_path = os.path.join(temp_dir.name, "image.png")
+        self.jpeg_path = os.path.join(temp_dir.name, "image.jpg")
+        image = Image.effect_noise((1200, 900), 60).convert("RGB")
+        image.save(self.png_path, compress_level=1)
+        image.save(self.jpeg_path, quality=90)
+
+    def test_load_reports_progress(self):
+        # Прогресс доходит до конца, первый кадр вписан в холст; предпросмотр есть только у JPEG
+        task = LoadTask(self.png_path, (300, 200))
+        loaded = load_document_image(task, 10 ** 9, 4096)
+        self.assertEqual(task.progress, 1.0)
+        self.assertEqual(loaded.image.size, (1200, 900))
+        self.assertEqual(loaded.original_image.tobytes(), loaded.image.tobytes())
+        self.assertIsNot(loaded.original_image, loaded.image)
+        self.assertEqual(loaded.display_image.size, (266, 200))
+        self.assertIsNone(task.take_preview())
+
+    def test_jpeg_draft_preview(self):
+        task = LoadTask(self.jpeg_path, (300, 200))
+        load_document_image(task, 10 ** 9, 4096)
+        self.assertLessEqual(task.take_preview().width, 300)
+
+    def test_cancelled_load_stops(self):
+        task = LoadTask(self.png_path, (300, 200))
+        task.cancel()
+        with self.assertRaises(LoadCancelled):
+            load_document_image(task, 10 ** 9, 4096)
+
+    def test_editor_swaps_document_after_decode(self):
+        # Пока идет загрузка, документ прежний; история и ползунки меняются после декодирования
+        editor = open_document(create_editor((400, 300)), Image.new("RGB", (200, 100), "red"))
+        previous_image = editor.image
+        editor.load_image(self.png_path)
+        self.assertIs(editor.image, previous_image)
+        self.assertEqual(editor.image_canvas.type("load_progress"), "text")
+        self.assertTrue(editor.root.run_until(lambda: editor.load_task is None, timeout=30))
+        self.assertEqual(editor.image.size, (1200, 900))
+        self.assertEqual(editor.image_path, self.png_path)
+        self.assertEqual(len(editor.history), 1)
+        self.assertEqual(editor.edit_tab.width_scale.get(), 1200)
+        self.assertEqual(editor.display_size, (400, 300))
+        self.assertEqual(editor.image_canvas.find_withtag("load_progress"), ())
+
+    def test_new_load_cancels_previous(self):
+        editor = create_editor((400, 300))
+        editor.load_image(self.png_path)
+        first_task = editor.load_task
+        editor.load_image(self.jpeg_path)
+        self.assertTrue(first_task.cancelled)
+        self.assertTrue(editor.root.run_until(lambda: editor.load_task is None and editor.load_scheduler.is_idle(), timeout=30))
+        self.assertEqual(editor.image_path, self.jpeg_path)
+
+    @patch("photo_editor.messagebox.showerror")
+    def test_failed_load_keeps_document(self, mock_showerror):
+        editor = open_document(create_editor((400, 300)), Image.new("RGB", (200, 100), "red"))
+        editor.load_image(os.path.join(os.path.dirname(self.png_path), "missing.png"))
+        self.assertTrue(editor.root.run_until(lambda: editor.load_task is None, timeout=30))
+        mock_showerror.assert_called_once()
+        self.assertEqual(editor.image.size, (200, 100))
+
+if __name__ == '__main__':
+    unittest.main()
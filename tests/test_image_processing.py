@@ -0,0 +1,157 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from PIL import Image, ImageChops, ImageEnhance, ImageFilter, ImageStat
+from utilities.image_processing import apply_adjustments, apply_color_adjustments, apply_blur, resize_image, save_image, encoder_arguments, RESAMPLING_TIERS
+
+def make_test_image(mode, size=(120, 80)):
+    # Синтетическое изображение с градиентами и шумом во всех каналах
+    noise = Image.effect_noise(size, 80).convert("L")
+    gradient = Image.linear_gradient("L").resize(size)
+    radial = Image.radial_gradient("L").resize(size)
+    if mode == "L":
+        return noise
+    if mode == "LA":
+        return Image.merge("LA", (noise, gradient))
+    image = Image.merge("RGB", (gradient, noise, radial))
+    if mode == "RGBA":
+        image.putalpha(noise.transpose(Image.FLIP_LEFT_RIGHT))
+    return image
+
+def enhance_chain(image, brightness, contrast, saturation):
+    # Эталон: три последовательных прохода ImageEnhance
+    image = ImageEnhance.Brightness(image).enhance(brightness)
+    image = ImageEnhance.Contrast(image).enhance(contrast)
+    return ImageEnhance.Color(image).enhance(saturation)
+
+def max_difference(first, second):
+    extrema = ImageChops.difference(first, second).getextrema()
+    if isinstance(extrema[0], tuple):
+        return max(high for _, high in extrema)
+    return extrema[1]
+
+class TestImageProcessing(unittest.TestCase):
+
+    def test_color_adjustments_match_enhance_chain(self):
+        # Объединённое ядро совпадает с ImageEnhance в пределах 2 уровней
+        for mode in ("L", "LA", "RGB", "RGBA"):
+            image = make_test_image(mode)
+            for brightness, contrast, saturation in [(0.5, 2.0, 0.5), (1.3, 1.4, 1.7), (2.0, 0.5, 2.0), (0.8, 1.0, 1.0)]:
+                with self.subTest(mode=mode, factors=(brightness, contrast, saturation)):
+                    fused = apply_color_adjustments(image, brightness, contrast, saturation)
+                    expected = enhance_chain(image, brightness, contrast, saturation)
+                    self.assertEqual(fused.mode, image.mode)
+                    self.assertLessEqual(max_difference(fused, expected), 2)
+
+    def test_brightness_contrast_exact(self):
+        # Без насыщенности результат совпадает с ImageEnhance побайтно
+        image = make_test_image("RGB")
+        fused = apply_color_adjustments(image, 1.3, 1.4, 1.0)
+        self.assertEqual(max_difference(fused, enhance_chain(image, 1.3, 1.4, 1.0)), 0)
+
+    def test_alpha_preserved(self):
+        # Альфа-канал не изменяется
+        image = make_test_image("RGBA")
+        fused = apply_color_adjustments(image, 1.5, 1.5, 1.5)
+        self.assertEqual(max_difference(fused.getchannel("A"), image.getchannel("A")), 0)
+
+    def test_identity_returns_copy(self):
+        # Нейтральные настройки возвращают копию, а не исходный объект
+        image = make_test_image("RGB")
+        result = apply_color_adjustments(image, 1.0, 1.0, 1.0)
+        self.assertIsNot(result, image)
+        self.assertEqual(max_difference(result, image), 0)
+
+    def test_unsupported_mode_falls_back(self):
+        # Для прочих режимов используется цепочка ImageEnhance
+        image = make_test_image("RGB").convert("CMYK")
+        result = apply_color_adjustments(image, 1.2, 1.2, 1.2)
+        self.assertEqual(result.mode, "CMYK")
+
+    def test_apply_adjustments_size(self):
+        # Размер результата соответствует настройкам и не меньше 100 пикселей
+        image = make_test_image("RGB")
+        result = apply_adjustments(image, 250, 50, 1.1, 1.2, 0.9, 2)
+        self.assertEqual(result.size, (250, 100))
+
+    def test_resize_quality_tiers(self):
+        # Итоговое качество совпадает с прежним LANCZOS, быстрые уровни дают тот же размер
+        image = make_test_image("RGB", (1200, 900))
+        final = resize_image(image, 300, 200)
+        self.assertEqual(final.tobytes(), image.resize((300, 200), Image.LANCZOS).tobytes())
+        for quality in RESAMPLING_TIERS:
+            with self.subTest(quality=quality):
+                self.assertEqual(resize_image(image, 300, 200, quality).size, (300, 200))
+
+    def test_blur_fractional_radius(self):
+        # Дробный радиус не округляется до целого
+        image = make_test_image("RGB")
+        self.assertEqual(apply_blur(image, 0), image)
+        self.assertEqual(apply_blur(image, 1.5).tobytes(), image.filter(ImageFilter.GaussianBlur(1.5)).tobytes())
+        self.assertNotEqual(apply_blur(image, 0.6).tobytes(), image.tobytes())
+
+    def test_blur_scale_matches_resolution(self):
+        # Радиус для копии предпросмотра пересчитывается по ее масштабу
+        image = make_test_image("RGB", (400, 300))
+        self.assertEqual(apply_blur(image, 6, scale=0.5).tobytes(), image.filter(ImageFilter.GaussianBlur(3)).tobytes())
+
+    def test_large_radius_blur_close_to_exact(self):
+        # Размытие большого радиуса через уменьшенную копию близко к точному
+        image = make_test_image("RGB", (640, 480))
+        exact = apply_blur(image, 20, exact=True)
+        fast = apply_blur(image, 20)
+        self.assertEqual(fast.size, image.size)
+        self.assertEqual(exact.tobytes(), image.filter(ImageFilter.GaussianBlur(20)).tobytes())
+        mean_difference = ImageStat.Stat(ImageChops.difference(fast, exact)).mean
+        self.assertLess(max(mean_difference), 1.0)
+
+    def test_encoder_arguments(self):
+        image_format, arguments = encoder_arguments("photo.JPG", {"jpeg_quality": 92, "jpeg_subsampling": "4:4:4"})
+        self.assertEqual(image_format, "JPEG")
+        self.assertEqual(arguments, {"quality": 92, "progressive": False, "optimize": False, "subsampling": "4:4:4"})
+        self.assertEqual(encoder_arguments("scan.png", {"png_compress_level": 1}), ("PNG", {"compress_level": 1}))
+        with self.assertRaises(ValueError):
+            encoder_arguments("photo.unknown")
+
+    def test_save_image_reports_size_and_time(self):
+        image = make_test_image("RGBA")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            save_path = os.path.join(temp_dir, "result.jpg")
+            result = save_image(image, save_path, {"jpeg_quality": 95, "jpeg_progressive": True})
+            self.assertEqual(result["format"], "JPEG")
+            self.assertEqual(result["bytes"], os.path.getsize(save_path))
+            self.assertGreaterEqual(result["seconds"], 0)
+            with Image.open(save_path) as saved:
+                self.assertEqual(saved.mode, "RGB")
+                self.assertTrue(saved.info.get("progressive"))
+            # Временные файлы не остаются
+            self.assertEqual(os.listdir(temp_dir), ["result.jpg"])
+
+    def test_save_does_not_change_umask(self):
+        # Маска прав общая для процесса: поток сохранения ее не меняет, права нового файла - как у open()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            save_path = os.path.join(temp_dir, "result.png")
+            with patch("os.umask", side_effect=AssertionError("os.umask в потоке сохранения")):
+                save_image(make_test_image("RGB"), save_path)
+            plain_path = os.path.join(temp_dir, "plain")
+            open(plain_path, "w").close()
+            self.assertEqual(os.stat(save_path).st_mode & 0o777, os.stat(plain_path).st_mode & 0o777)
+
+    def test_failed_save_keeps_previous_file(self):
+        # Сбой во время кодирования не портит существующий файл
+        image = make_test_image("RGB")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            save_path = os.path.join(temp_dir, "result.png")
+            save_image(image, save_path)
+            with open(save_path, "rb") as saved_file:
+                previous = saved_file.read()
+            with patch.object(Image.Image, "save", side_effect=OSError("диск заполнен")):
+                with self.assertRaises(OSError):
+                    save_image(make_test_image("L"), save_path)
+            with open(save_path, "rb") as saved_file:
+                self.assertEqual(saved_file.read(), previous)
+            self.assertEqual(os.listdir(temp_dir), ["result.png"])
+
+if __name__ == '__main__':
+    unittest.main(argv=[''], exit=False)
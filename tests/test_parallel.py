@@ -0,0 +1,54 @@
+import unittest
+from unittest.mock import patch
+from PIL import Image
+from benchmarks.suite import make_image
+from utilities import parallel
+from utilities.image_processing import apply_blur, apply_color_adjustments
+
+class TestParallel(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(parallel.set_worker_count, None)
+
+    def render(self, workers, action):
+        parallel.set_worker_count(workers)
+        return action().tobytes()
+
+    def test_band_boxes_cover_image(self):
+        image = Image.new("L", (50, 1000))
+        boxes = parallel.band_boxes(image, workers=3)
+        self.assertEqual(len(boxes), 3)
+        self.assertEqual(boxes[0][1], 0)
+        self.assertEqual(boxes[-1][3], 1000)
+        for upper, lower in zip(boxes, boxes[1:]):
+            self.assertEqual(upper[3], lower[1])
+        # Полосы не бывают ниже MIN_BAND_ROWS строк
+        self.assertEqual(len(parallel.band_boxes(Image.new("L", (50, 100)), workers=8)), 1)
+
+    @patch("utilities.parallel.MIN_PARALLEL_PIXELS", 1)
+    def test_blur_matches_serial(self):
+        # Поля полос достаточны: результат совпадает с размытием всего изображения
+        for mode in ("RGB", "RGBA", "L"):
+            image = make_image(mode, 0.1)
+            for radius in (0.5, 2, 5.5):
+                with self.subTest(mode=mode, radius=radius):
+                    serial = self.render(1, lambda: apply_blur(image, radius))
+                    self.assertEqual(self.render(4, lambda: apply_blur(image, radius)), serial)
+
+    @patch("utilities.parallel.MIN_PARALLEL_PIXELS", 1)
+    def test_color_matches_serial(self):
+        # Средняя яркость для контрастности считается по всему изображению, а не по полосе
+        for mode in ("RGB", "RGBA", "L"):
+            image = make_image(mode, 0.1)
+            with self.subTest(mode=mode):
+                serial = self.render(1, lambda: apply_color_adjustments(image, 1.2, 1.6, 1.3))
+                self.assertEqual(self.render(3, lambda: apply_color_adjustments(image, 1.2, 1.6, 1.3)), serial)
+
+    def test_small_images_not_split(self):
+        parallel.set_worker_count(4)
+        self.assertFalse(parallel.should_split(Image.new("RGB", (100, 100))))
+        parallel.set_worker_count(1)
+        self.assertFalse(parallel.should_split(Image.new("RGB", (2000, 2000))))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,11 @@
+import os
+import tempfile
 import unittest
 from unittest.mock import Mock, patch
 from tkinter import Tk
 from PIL import Image
 from photo_editor import PhotoEditor
+from utilities.edit_graph import EditGraph
 
 class TestPhotoEditor(unittest.TestCase):
 
@@ -37,8 +40,11 @@ class TestPhotoEditor(unittest.TestCase):
         self.editor.draw_tab.redraw_items = Mock()  # Замокировать redraw_items
 
     def test_load_image(self):
-        # Проверка загрузки изображения
+        # Проверка загрузки изображения: декодирование в фоне, документ заменяется после его завершения
         self.editor.load_image('test_image.jpg')
+        self.assertIsNotNone(self.editor.load_task)
+        while self.editor.load_task is not None:
+            self.root.update()
         self.assertIsNotNone(self.editor.image)
         self.assertEqual(self.editor.image_path, 'test_image.jpg')
         self.editor.save_history.assert_called_once()  # Проверка вызова save_history
@@ -47,29 +53,37 @@ class TestPhotoEditor(unittest.TestCase):
     @patch('photo_editor.filedialog.asksaveasfilename', return_value='test_save.jpg')
     @patch('photo_editor.Image.Image.save')
     def test_save_image(self, mock_save, mock_asksaveasfilename):
-        # Проверка сохранения изображения
+        # Проверка сохранения изображения: кодирование в фоне во временный файл с параметрами JPEG
         self.editor.image = Image.new('RGB', (100, 100))
-        self.editor.save_image('test_save.jpg')
-        mock_save.assert_called_once_with('test_save.jpg')
+        with tempfile.TemporaryDirectory() as temp_dir:
+            save_path = os.path.join(temp_dir, 'test_save.jpg')
+            self.editor.save_image(save_path)
+            self.editor.pending_exports[0][1].result()
+            mock_save.assert_called_once()
+            self.assertEqual(mock_save.call_args.kwargs["format"], "JPEG")
+            self.assertEqual(mock_save.call_args.kwargs["quality"], 75)
+            self.assertTrue(os.path.exists(save_path))
 
     def test_undo(self):
         # Проверка отмены последнего действия
-        self.editor.history.append((Image.new('RGB', (100, 100)), Image.new('RGB', (100, 100)), {"brightness": 1.0, "contrast": 1.0, "saturation": 1.0, "width": 100, "height": 100, "blur": 0}, [], []))
-        self.editor.history.append((Image.new('RGB', (200, 200)), Image.new('RGB', (200, 200)), {"brightness": 1.0, "contrast": 1.0, "saturation": 1.0, "width": 200, "height": 200, "blur": 0}, [], []))
+        self.editor.history.append(EditGraph().set("resize", width=100, height=100))
+        self.editor.history.append(EditGraph().set("resize", width=200, height=200))
         self.editor.undo()
         self.assertEqual(len(self.editor.history), 1)
-        self.assertEqual(len(self.editor.redo_stack), 1)
+        self.assertEqual(self.editor.history.redo_count(), 1)
+        self.assertEqual(self.editor.edit_graph, EditGraph().set("resize", width=100, height=100))
         self.editor.update_display_image.assert_called()
         self.editor.set_slider_values.assert_called()
         self.editor.draw_tab.redraw_items.assert_called()
 
     def test_redo(self):
         # Проверка повтора последнего отмененного действия
-        self.editor.history.append((Image.new('RGB', (100, 100)), Image.new('RGB', (100, 100)), {"brightness": 1.0, "contrast": 1.0, "saturation": 1.0, "width": 100, "height": 100, "blur": 0}, [], []))
-        self.editor.redo_stack.append((Image.new('RGB', (200, 200)), Image.new('RGB', (200, 200)), {"brightness": 1.0, "contrast": 1.0, "saturation": 1.0, "width": 200, "height": 200, "blur": 0}, [], []))
+        self.editor.history.append(EditGraph().set("resize", width=100, height=100))
+        self.editor.history.append(EditGraph().set("resize", width=200, height=200))
+        self.editor.history.undo()
         self.editor.redo()
         self.assertEqual(len(self.editor.history), 2)
-        self.assertEqual(len(self.editor.redo_stack), 0)
+        self.assertEqual(self.editor.history.redo_count(), 0)
         self.editor.update_display_image.assert_called()
         self.editor.set_slider_values.assert_called()
         self.editor.draw_tab.redraw_items.assert_called()
@@ -85,10 +99,32 @@ class TestPhotoEditor(unittest.TestCase):
         self.editor.filter_tab.blur_scale.get = Mock(return_value=0)
         self.editor.apply_adjustments()
         self.editor.update_display_image.assert_called()
+
+    def test_apply_adjustments_preview(self):
+        # Проверка предпросмотра на уменьшенной копии и полного рендера по требованию
+        self.editor.original_image = Image.new('RGB', (2000, 1000))
+        self.editor.image = self.editor.original_image.copy()
+        self.editor.image_canvas.winfo_width = Mock(return_value=400)
+        self.editor.image_canvas.winfo_height = Mock(return_value=300)
+        self.editor.edit_tab.width_scale.get = Mock(return_value=2000)
+        self.editor.edit_tab.height_scale.get = Mock(return_value=1000)
+        self.editor.filter_tab.brightness_scale.get = Mock(return_value=1.5)
+        self.editor.filter_tab.contrast_scale.get = Mock(return_value=1.0)
+        self.editor.filter_tab.saturation_scale.get = Mock(return_value=1.0)
+        self.editor.filter_tab.blur_scale.get = Mock(return_value=0)
+        self.editor.apply_adjustments(interactive=True)
+        self.assertTrue(self.editor.full_render_pending)
+        while not self.editor.render_scheduler.is_idle():
+            self.root.update()
+        self.assertEqual(self.editor.preview_image.size, (400, 200))
+        self.editor.ensure_full_render()
+        self.assertIsNone(self.editor.preview_image)
+        self.assertEqual(self.editor.image.size, (2000, 1000))
     
     def test_crop_image(self):
         # Проверка обрезки изображения
         self.editor.image = Image.new('RGB', (100, 100))
+        self.editor.original_image = self.editor.image.copy()
         self.editor.selection_top_x = 10
         self.editor.selection_top_y = 10
         self.editor.selection_bottom_x = 50
@@ -0,0 +1,106 @@
+import json
+import os
+import pstats
+import tempfile
+import threading
+import unittest
+from PIL import Image
+from utilities import profiling
+from utilities.image_processing import apply_blur
+from utilities.headless import create_editor, open_document
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        profiling.disable()
+        profiling.reset()
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        profiling.disable()
+        profiling.reset()
+        self.temp_dir.cleanup()
+
+    def test_disabled_records_nothing(self):
+        # Выключенное профилирование возвращает общий пустой интервал и ничего не собирает
+        self.assertIs(profiling.span("a"), profiling.span("b"))
+        with profiling.span("a"):
+            pass
+        apply_blur(Image.new("RGB", (50, 50)), 2)
+        self.assertEqual(profiling.summary(), {})
+
+    def test_spans_aggregate_into_histograms(self):
+        # Длительности собираются по имени интервала
+        profiling.enable()
+        for _ in range(5):
+            with profiling.span("a"):
+                pass
+        with profiling.span("b", size=1):
+            with profiling.span("a"):
+                pass
+        stats = profiling.summary()
+        self.assertEqual(stats["a"]["count"], 6)
+        self.assertEqual(stats["b"]["count"], 1)
+        self.assertLessEqual(stats["a"]["p50"], stats["a"]["max"] + 1e-12)
+        self.assertIn("a", profiling.format_summary())
+
+    def test_decorated_operations_are_timed(self):
+        # Основные операции редактора помечены интервалами
+        profiling.enable()
+        editor = create_editor()
+        open_document(editor, Image.new("RGB", (300, 200), "gray"))
+        editor.filter_tab.blur_scale.set(2)
+        editor.apply_adjustments()
+        editor.save_history()
+        stats = profiling.summary()
+        for name in ("adjust", "blur", "display", "redraw", "history"):
+            self.assertIn(name, stats)
+
+    def test_spans_from_threads(self):
+        # Интервалы из нескольких потоков не теряются
+        profiling.enable()
+
+        def worker():
+            for _ in range(100):
+                with profiling.span("worker"):
+                    pass
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(profiling.summary()["worker"]["count"], 400)
+
+    def test_profile_next_action(self):
+        # cProfile выполняется только для следующего подходящего интервала
+        path = os.path.join(self.temp_dir.name, "blur.prof")
+        profiling.profile_next("blur", path)
+        self.assertTrue(profiling.is_enabled())
+        with profiling.span("resize"):
+            pass
+        self.assertFalse(os.path.exists(path))
+        apply_blur(Image.new("RGB", (100, 100)), 3)
+        self.assertTrue(os.path.exists(path))
+        pstats.Stats(path)
+        os.remove(path)
+        apply_blur(Image.new("RGB", (100, 100)), 3)
+        self.assertFalse(os.path.exists(path))
+
+    def test_export_chrome_trace(self):
+        # Трассировка - корректный JSON с полными событиями и именами потоков
+        profiling.enable()
+        with profiling.span("load", path="a.png"):
+            pass
+        path = os.path.join(self.temp_dir.name, "trace.json")
+        self.assertEqual(profiling.export_chrome_trace(path), 1)
+        with open(path, encoding="utf-8") as trace_file:
+            trace = json.load(trace_file)
+        events = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+        self.assertEqual(events[0]["name"], "load")
+        self.assertEqual(events[0]["args"], {"path": "a.png"})
+        self.assertGreaterEqual(events[0]["dur"], 0)
+        self.assertTrue(any(event["ph"] == "M" for event in trace["traceEvents"]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+from PIL import Image
+from utilities.edit_graph import EditGraph
+from utilities.render_cache import RenderCache, image_nbytes
+
+class TestRenderCache(unittest.TestCase):
+
+    def setUp(self):
+        self.image = Image.effect_noise((200, 150), 60).convert("RGB")
+        self.cache = RenderCache(10 * 1024 * 1024)
+
+    def test_lru_eviction_by_bytes(self):
+        # Вытесняется давно не использованная запись
+        tile = Image.new("RGB", (100, 100))
+        cache = RenderCache(image_nbytes(tile) * 2)
+        cache.put("a", tile)
+        cache.put("b", tile.copy())
+        cache.get("a")
+        cache.put("c", tile.copy())
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertLessEqual(cache.bytes_used, cache.max_bytes)
+
+    def test_graph_repeat_is_hit(self):
+        # Повторное вычисление графа с теми же узлами берется из кэша
+        graph = EditGraph().set("resize", width=300, height=200).set("color", brightness=1.2, contrast=1.0, saturation=1.0)
+        first = graph.evaluate(self.image, 1, self.cache)
+        hits = self.cache.hits
+        self.assertIs(graph.evaluate(self.image, 1, self.cache), first)
+        self.assertEqual(self.cache.hits, hits + 1)
+        # Другой исходник и другой уровень качества не смешиваются с первым результатом
+        self.assertIsNot(graph.evaluate(self.image.rotate(180), 2, self.cache), first)
+        self.assertIsNot(graph.evaluate(self.image, 1, self.cache, quality="interactive"), first)
+
+if __name__ == '__main__':
+    unittest.main(argv=[''], exit=False)
@@ -0,0 +1,67 @@
+import threading
+import time
+import unittest
+from utilities.render_scheduler import RenderScheduler
+
+class FakeRoot:
+    # Замена корневого окна Tk: after() только запоминает обработчики
+    def __init__(self):
+        self.callbacks = []
+
+    def after(self, delay, callback):
+        self.callbacks.append(callback)
+
+    def run_until_idle(self, scheduler, timeout=5):
+        deadline = time.monotonic() + timeout
+        while self.callbacks and time.monotonic() < deadline:
+            callback = self.callbacks.pop(0)
+            callback()
+            time.sleep(0.001)
+        return scheduler.is_idle()
+
+class TestRenderScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.root = FakeRoot()
+        self.version = 1
+        self.scheduler = RenderScheduler(self.root, lambda: self.version)
+        self.delivered = []
+
+    def test_latest_request_wins(self):
+        # Пока рендер занят, промежуточные запросы отбрасываются
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_render():
+            started.set()
+            release.wait(5)
+            return "first"
+
+        self.scheduler.submit(slow_render, self.delivered.append, self.version)
+        started.wait(5)
+        for value in ("second", "third", "fourth"):
+            self.scheduler.submit(lambda value=value: value, self.delivered.append, self.version)
+        release.set()
+        self.assertTrue(self.root.run_until_idle(self.scheduler))
+        self.assertNotIn("second", self.delivered)
+        self.assertNotIn("third", self.delivered)
+        self.assertEqual(self.delivered[-1], "fourth")
+
+    def test_stale_version_dropped(self):
+        # Результат для старой версии документа не применяется
+        self.scheduler.submit(lambda: "stale", self.delivered.append, self.version)
+        self.version += 1
+        self.assertTrue(self.root.run_until_idle(self.scheduler))
+        self.assertEqual(self.delivered, [])
+
+    def test_cancel(self):
+        # После отмены результат не применяется
+        release = threading.Event()
+        self.scheduler.submit(lambda: release.wait(5) and "late", self.delivered.append, self.version)
+        self.scheduler.cancel()
+        release.set()
+        self.assertTrue(self.root.run_until_idle(self.scheduler))
+        self.assertEqual(self.delivered, [])
+
+if __name__ == '__main__':
+    unittest.main(argv=[''], exit=False)
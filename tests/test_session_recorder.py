@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+from PIL import Image
+from benchmarks.suite import main
+from utilities.headless import create_editor, open_document, HeadlessEvent
+from utilities.session_recorder import SessionRecorder, load_session, replay_session, summarize_latency
+from gui.filter_tab import FilterTab
+
+class TestSessionRecorder(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.image_path = os.path.join(self.temp_dir.name, "source.png")
+        Image.effect_noise((600, 400), 40).convert("RGB").save(self.image_path)
+        self.recorder = SessionRecorder().install()
+
+    def tearDown(self):
+        self.recorder.uninstall()
+        self.temp_dir.cleanup()
+
+    def record(self):
+        # Перемещение ползунка, штрих, отмена и повтор
+        editor = create_editor((400, 300))
+        editor.load_image(self.image_path)
+        # Загрузка идет в фоне; пользователь видит изображение после ее завершения
+        editor.root.run_until(lambda: editor.load_task is None, timeout=30)
+        filter_tab = editor.filter_tab
+        for value in (1.1, 1.3, 1.5):
+            filter_tab.brightness_scale.set(value)
+            filter_tab.update_brightness()
+            editor.root.run_until(editor.render_scheduler.is_idle, timeout=10)
+        filter_tab.save_brightness(None)
+        draw_tab = editor.draw_tab
+        for x, y in ((10, 10), (60, 40), (120, 20)):
+            draw_tab.paint(HeadlessEvent(x, y))
+        draw_tab.reset(HeadlessEvent(120, 20))
+        editor.undo()
+        editor.redo()
+        return editor
+
+    def test_records_outer_calls_only(self):
+        self.record()
+        methods = [event["method"] for event in self.recorder.events]
+        self.assertEqual(methods, ["load_image"] + ["update_brightness"] * 3 + ["save_brightness"] + ["paint"] * 3 + ["reset", "undo", "redo"])
+        self.assertEqual([event["value"] for event in self.recorder.events[1:4]], [1.1, 1.3, 1.5])
+        self.assertEqual(self.recorder.events[0]["size"], [600, 400])
+        self.assertEqual(self.recorder.canvas_size, (400, 300))
+
+    def test_uninstall_restores_methods(self):
+        self.recorder.uninstall()
+        self.assertFalse(hasattr(FilterTab.update_brightness, "__wrapped__"))
+
+    def test_replay_reproduces_state(self):
+        # Воспроизведение приводит редактор в то же состояние и измеряет каждое событие
+        recorded = self.record()
+        path = os.path.join(self.temp_dir.name, "session.json")
+        self.recorder.save(path)
+        self.recorder.uninstall()
+        editor, results = replay_session(load_session(path))
+        self.assertEqual(len(results), len(self.recorder.events))
+        self.assertTrue(all(result["latency_ms"] is not None for result in results))
+        self.assertEqual(editor.filter_tab.brightness_scale.get(), recorded.filter_tab.brightness_scale.get())
+        self.assertEqual(editor.draw_tab.drawn_items, recorded.draw_tab.drawn_items)
+        self.assertEqual(len(editor.history), len(recorded.history))
+        self.assertEqual(summarize_latency(results)["filter_tab.update_brightness"]["count"], 3)
+
+    def test_replay_with_missing_source(self):
+        # Исходный файл недоступен: используется заменитель того же размера
+        self.record()
+        session = self.recorder.to_dict()
+        self.recorder.uninstall()
+        os.remove(self.image_path)
+        editor, results = replay_session(session)
+        self.assertEqual(editor.image.size, (600, 400))
+        self.assertEqual(len(results), len(session["events"]))
+
+    def test_replay_command(self):
+        editor = open_document(create_editor((400, 300)), Image.new("RGB", (300, 200), "gray"))
+        editor.filter_tab.blur_scale.set(3)
+        editor.filter_tab.update_blur()
+        path = os.path.join(self.temp_dir.name, "session.json")
+        self.recorder.save(path)
+        self.recorder.uninstall()
+        self.assertEqual(load_session(path)["source"]["size"], [300, 200])
+        self.assertEqual(main(["replay", path, "--budget-ms", "60000"]), 0)
+
+if __name__ == '__main__':
+    unittest.main()
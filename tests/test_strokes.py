@@ -0,0 +1,44 @@
+import unittest
+from PIL import Image, ImageDraw
+from utilities.strokes import Stroke, simplify_points
+
+class TestStroke(unittest.TestCase):
+
+    def test_points_are_compact(self):
+        # Точки хранятся в типизированном массиве, а не кортежами
+        stroke = Stroke("#000000", 3, (0, 0))
+        for x in range(1, 1000):
+            stroke.add_point(x, x % 7)
+        self.assertEqual(len(stroke), 1000)
+        self.assertEqual(stroke.nbytes(), 1000 * 2 * stroke.points.itemsize)
+        self.assertEqual(stroke.last_point(), (999, 999 % 7))
+        self.assertEqual(stroke.segments()[0], (0, 0, 1, 1))
+        self.assertFalse(hasattr(stroke, "__dict__"))
+
+    def test_simplify_removes_collinear_points(self):
+        # Точки на прямой удаляются, изломы сохраняются
+        stroke = Stroke("#000000", 3, [coordinate for x in range(11) for coordinate in (x, 0)])
+        stroke.add_point(10, 10)
+        simplified = stroke.simplified(0.5)
+        self.assertEqual(list(simplified.points), [0, 0, 10, 0, 10, 10])
+        self.assertEqual(len(stroke), 12)
+
+    def test_simplify_keeps_deviation_within_tolerance(self):
+        points = [0, 0, 5, 1, 10, 0, 15, 4, 20, 0]
+        self.assertEqual(list(simplify_points(points, 0)), points)
+        self.assertEqual(list(simplify_points(points, 2)), [0, 0, 10, 0, 15, 4, 20, 0])
+        self.assertEqual(list(simplify_points(points, 10)), [0, 0, 20, 0])
+
+    def test_draw_matches_separate_segments_on_straight_line(self):
+        # Одна ломаная рисует те же пиксели, что и отдельные сегменты на прямой
+        stroke = Stroke("#ff0000", 1, (10, 10, 20, 10, 30, 10))
+        joined = Image.new("RGB", (40, 20))
+        stroke.draw(ImageDraw.Draw(joined))
+        separate = Image.new("RGB", (40, 20))
+        draw = ImageDraw.Draw(separate)
+        for segment in stroke.segments():
+            draw.line(segment, fill="#ff0000", width=1)
+        self.assertEqual(joined.tobytes(), separate.tobytes())
+
+if __name__ == '__main__':
+    unittest.main()
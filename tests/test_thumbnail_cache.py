@@ -0,0 +1,124 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+from PIL import Image
+from gui.filmstrip import CELL_HEIGHT
+from utilities.headless import create_editor, create_filmstrip
+from utilities.thumbnail_cache import ThumbnailCache, list_images, make_thumbnail
+
+class TestThumbnailCache(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.images_dir = os.path.join(temp_dir.name, "images")
+        self.cache_dir = os.path.join(temp_dir.name, "cache")
+        os.mkdir(self.images_dir)
+        self.paths = []
+        for index in range(60):
+            path = os.path.join(self.images_dir, f"image{index:03d}.jpg")
+            Image.new("RGB", (320, 240), (index * 4, 100, 200)).save(path)
+            self.paths.append(path)
+        Image.new("RGBA", (100, 300), (0, 0, 0, 0)).save(os.path.join(self.images_dir, "alpha.png"))
+        with open(os.path.join(self.images_dir, "notes.txt"), "w") as text_file:
+            text_file.write("не изображение")
+
+    def open_filmstrip(self, editor):
+        filmstrip = create_filmstrip(editor, self.images_dir, ThumbnailCache(self.cache_dir))
+        # Уже начатые миниатюры дописываются до удаления временной папки
+        self.addCleanup(filmstrip.executor.shutdown, wait=True)
+        self.addCleanup(filmstrip.close)
+        return filmstrip
+
+    def test_list_images(self):
+        paths = list_images(self.images_dir)
+        self.assertEqual(len(paths), 61)
+        self.assertEqual(os.path.basename(paths[0]), "alpha.png")
+
+    def test_make_thumbnail(self):
+        self.assertEqual(make_thumbnail(self.paths[0], 128).size, (128, 96))
+        thumbnail = make_thumbnail(os.path.join(self.images_dir, "alpha.png"), 128)
+        self.assertEqual((thumbnail.mode, thumbnail.size), ("RGBA", (43, 128)))
+
+    def test_cache_hit_and_invalidation(self):
+        cache = ThumbnailCache(self.cache_dir)
+        self.assertIsNone(cache.get(self.paths[0]))
+        cache.thumbnail(self.paths[0])
+        self.assertEqual(cache.get(self.paths[0]).size, (128, 96))
+        # Измененный файл получает новый ключ, и старая миниатюра не используется
+        Image.new("RGB", (200, 200)).save(self.paths[0])
+        os.utime(self.paths[0], ns=(0, 0))
+        self.assertIsNone(cache.get(self.paths[0]))
+        self.assertEqual(cache.thumbnail(self.paths[0]).size, (128, 128))
+
+    def test_corrupt_entry_is_rebuilt(self):
+        cache = ThumbnailCache(self.cache_dir)
+        cache.thumbnail(self.paths[0])
+        entry_path = cache._entry_path(cache.key(self.paths[0]), ".jpg")
+        with open(entry_path, "wb") as entry_file:
+            entry_file.write(b"broken")
+        self.assertIsNone(cache.get(self.paths[0]))
+        self.assertFalse(os.path.exists(entry_path))
+
+    def test_eviction_keeps_recent(self):
+        cache = ThumbnailCache(self.cache_dir)
+        cache.thumbnail(self.paths[0])
+        entry_bytes = cache.total_bytes()
+        cache.max_bytes = entry_bytes * 10
+        for path in self.paths[1:30]:
+            cache.thumbnail(path)
+            # Первая миниатюра используется постоянно и не вытесняется
+            cache.get(self.paths[0])
+        self.assertLessEqual(cache.total_bytes(), cache.max_bytes)
+        self.assertEqual(cache.total_bytes(), sum(size for _, _, size in cache._entries()))
+        self.assertIsNotNone(cache.get(self.paths[0]))
+        self.assertIsNone(cache.get(self.paths[1]))
+
+    def test_filmstrip_loads_visible_cells(self):
+        editor = create_editor()
+        filmstrip = self.open_filmstrip(editor)
+        self.assertEqual(filmstrip.columns, 5)
+        self.assertTrue(editor.root.run_until(lambda: not filmstrip.requested))
+        # Видимые строки и одна строка ниже них
+        self.assertEqual(sorted(filmstrip.photos), list(range(25)))
+        self.assertEqual(len(filmstrip.canvas.find_withtag("thumbnail")), 25)
+
+        filmstrip.canvas.yview_moveto(0.5)
+        filmstrip.update_visible()
+        self.assertTrue(editor.root.run_until(lambda: not filmstrip.requested))
+        self.assertIn(40, filmstrip.photos)
+        self.assertNotIn(60, filmstrip.photos)
+
+    def test_scrolled_out_requests_are_cancelled(self):
+        editor = create_editor()
+        filmstrip = self.open_filmstrip(editor)
+        filmstrip.canvas.yview_moveto(1.0)
+        filmstrip.update_visible()
+        self.assertTrue(editor.root.run_until(lambda: not filmstrip.requested))
+        # Построены только миниатюры, которые уже строились до прокрутки, и ячейки внизу
+        self.assertLess(len([index for index in filmstrip.photos if index < 25]), 25)
+        self.assertIn(60, filmstrip.photos)
+
+    def test_second_open_uses_cache(self):
+        cache = ThumbnailCache(self.cache_dir)
+        for path in list_images(self.images_dir):
+            cache.thumbnail(path)
+        editor = create_editor()
+        with patch("utilities.thumbnail_cache.make_thumbnail", side_effect=AssertionError("миниатюра не из кэша")):
+            filmstrip = self.open_filmstrip(editor)
+            start = time.perf_counter()
+            self.assertTrue(editor.root.run_until(lambda: not filmstrip.requested, timeout=5.0))
+            self.assertLess(time.perf_counter() - start, 2.0)
+        self.assertNotIn(None, filmstrip.photos.values())
+
+    def test_double_click_opens_image(self):
+        editor = create_editor()
+        filmstrip = self.open_filmstrip(editor)
+        with patch.object(editor, "load_image") as load_image:
+            filmstrip.on_double_click(type("Event", (), {"x": 10, "y": CELL_HEIGHT + 10})())
+        load_image.assert_called_once_with(filmstrip.paths[5])
+
+if __name__ == "__main__":
+    unittest.main()
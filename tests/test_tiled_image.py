@@ -0,0 +1,127 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from PIL import Image, ImageChops, ImageFilter, ImageStat
+from utilities.headless import create_editor
+from utilities.strokes import Stroke
+from utilities.tiled_image import TiledImage, open_image
+
+def make_test_image(mode="RGB", size=(700, 530)):
+    noise = Image.effect_noise(size, 60).convert("L")
+    gradient = Image.linear_gradient("L").resize(size)
+    image = Image.merge("RGB", (noise, gradient, noise.transpose(Image.FLIP_TOP_BOTTOM)))
+    return image.convert(mode)
+
+class TestTiledImage(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def save(self, image, name):
+        path = os.path.join(self.temp_dir.name, name)
+        image.save(path)
+        return path
+
+    def assertSameImage(self, first, second):
+        self.assertEqual(first.size, second.size)
+        self.assertIsNone(ImageChops.difference(first, second).getbbox())
+
+    def test_read_region_uncompressed(self):
+        # Области несжатых файлов читаются по частям без полного декодирования
+        for mode, name in (("RGB", "image.tif"), ("RGBA", "image_rgba.tif"), ("RGB", "image.bmp"), ("L", "image.ppm")):
+            with self.subTest(name=name):
+                image = make_test_image(mode)
+                tiled = TiledImage(self.save(image, name), tile_size=128)
+                self.assertTrue(tiled.supports_regions)
+                box = (50, 100, 650, 470)
+                self.assertSameImage(tiled.read_region(box), image.crop(box))
+                self.assertIsNone(tiled._full_image)
+
+    def test_read_region_compressed_fallback(self):
+        # Сжатые форматы декодируются целиком, результат тот же
+        image = make_test_image()
+        tiled = TiledImage(self.save(image, "image.png"), tile_size=128)
+        self.assertFalse(tiled.supports_regions)
+        self.assertSameImage(tiled.read_region((10, 10, 300, 200)), image.crop((10, 10, 300, 200)))
+
+    def test_reduced(self):
+        # Уменьшенная копия сохраняет пропорции
+        tiled = TiledImage(self.save(make_test_image(), "image.tif"), tile_size=128)
+        self.assertEqual(tiled.reduced(350).size, (350, 265))
+
+    def test_save_tiled_tiff_round_trip(self):
+        # Потоковый плиточный TIFF читается обратно без потерь и тоже доступен по частям
+        image = make_test_image("RGBA")
+        tiled = TiledImage(self.save(image, "image.tif"), tile_size=128)
+        output_path = os.path.join(self.temp_dir.name, "output.tif")
+        tiled.save_tiled_tiff(output_path)
+        with Image.open(output_path) as result:
+            self.assertSameImage(result, image)
+        self.assertTrue(TiledImage(output_path, tile_size=128).supports_regions)
+        self.assertSameImage(TiledImage(output_path, tile_size=128).read_region((100, 90, 400, 300)), image.crop((100, 90, 400, 300)))
+
+    def test_open_image_pixel_limit(self):
+        # Ограничение проверяется по заголовку файла, глобальная настройка Pillow не меняется
+        path = self.save(make_test_image(), "image.png")
+        max_pixels = Image.MAX_IMAGE_PIXELS
+        with self.assertRaises(Image.DecompressionBombError):
+            open_image(path, max_pixels=700 * 530 - 1)
+        with open_image(path, max_pixels=700 * 530) as image:
+            self.assertEqual(image.size, (700, 530))
+        self.assertEqual(Image.MAX_IMAGE_PIXELS, max_pixels)
+
+    def test_save_with_halo_matches_full_blur(self):
+        # Размытие по плиткам с полями совпадает с размытием всего изображения
+        image = make_test_image()
+        tiled = TiledImage(self.save(image, "image.tif"), tile_size=128)
+        output_path = os.path.join(self.temp_dir.name, "blurred.tif")
+        tiled.save_tiled_tiff(output_path, process=lambda tile: tile.filter(ImageFilter.BoxBlur(2)), halo=4)
+        with Image.open(output_path) as result:
+            self.assertSameImage(result, image.filter(ImageFilter.BoxBlur(2)))
+
+    def open_tiled_document(self):
+        # Документ, открытый через плиточный движок, с рабочей копией вдвое меньше
+        image = make_test_image()
+        path = self.save(image, "image.tif")
+        tiled = TiledImage(path, tile_size=128)
+        editor = create_editor()
+        editor.finish_load(path, tiled.reduced(350), tiled)
+        self.addCleanup(editor.export_executor.shutdown, wait=True)
+        return editor, image
+
+    def test_export_full_resolution_applies_graph(self):
+        editor, image = self.open_tiled_document()
+        editor.filter_tab.brightness_scale.set(1.4)
+        editor.filter_tab.blur_scale.set(2)
+        editor.apply_adjustments()
+        output_path = os.path.join(self.temp_dir.name, "export.tif")
+        editor.export_full_resolution(output_path)
+        self.assertEqual(len(editor.pending_exports), 1)
+        result = editor.pending_exports[0][1].result(timeout=30)
+        self.assertEqual(result["path"], output_path)
+        with Image.open(output_path) as exported:
+            self.assertEqual(exported.size, image.size)
+            self.assertGreater(ImageStat.Stat(exported).mean[1], ImageStat.Stat(image).mean[1] * 1.2)
+            # Радиус размытия пересчитан к полному разрешению
+            self.assertLess(ImageStat.Stat(exported).stddev[0], ImageStat.Stat(image).stddev[0] / 2)
+
+    @patch("photo_editor.messagebox.showerror")
+    def test_export_full_resolution_refuses_geometry_and_overlays(self, showerror):
+        editor, _ = self.open_tiled_document()
+        stroke = Stroke("#ff0000", 3)
+        stroke.add_point(10, 10)
+        stroke.add_point(100, 100)
+        editor.draw_tab.drawn_items.append(stroke)
+        editor.save_history()
+        editor.export_full_resolution(os.path.join(self.temp_dir.name, "strokes.tif"))
+        editor.undo()
+        editor.edit_graph = editor.edit_graph.append("rotate", angle=30)
+        editor.export_full_resolution(os.path.join(self.temp_dir.name, "rotated.tif"))
+        self.assertEqual(showerror.call_count, 2)
+        self.assertEqual(editor.pending_exports, [])
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir.name, "strokes.tif")))
+
+if __name__ == '__main__':
+    unittest.main(argv=[''], exit=False)
@@ -0,0 +1,121 @@
+import os
+import tempfile
+import unittest
+from PIL import Image, ImageChops, ImageDraw
+from utilities.headless import create_editor, open_document, HeadlessEvent
+from utilities.workspace import PagedImage, Workspace
+
+class TestPagedImage(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_round_trip_modes(self):
+        # Выгрузка и загрузка сохраняют пиксели и палитру во всех режимах
+        source = Image.effect_noise((300, 520), 50)
+        for mode in ("L", "RGB", "RGBA", "P", "I", "F", "CMYK"):
+            with self.subTest(mode=mode):
+                image = source.convert(mode)
+                page = PagedImage.page_out(image, self.temp_dir.name)
+                restored = page.page_in()
+                self.assertEqual((restored.mode, restored.size), (mode, image.size))
+                self.assertEqual(restored.tobytes(), image.tobytes())
+                if mode == "P":
+                    self.assertEqual(restored.getpalette(), image.getpalette())
+                self.assertTrue(page.is_unchanged(restored))
+
+    def test_change_detected(self):
+        # Изменение загруженного изображения копирует его и делает страницу устаревшей
+        page = PagedImage.page_out(Image.new("RGB", (64, 64), "white"), self.temp_dir.name)
+        restored = page.page_in()
+        ImageDraw.Draw(restored).line((0, 0, 63, 63), fill="red")
+        self.assertFalse(page.is_unchanged(restored))
+        self.assertEqual(page.page_in().getpixel((10, 10)), (255, 255, 255))
+
+class TestWorkspace(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.editor = create_editor((400, 300))
+        self.editor.workspace = Workspace(self.editor, self.temp_dir.name)
+        self.first = Image.effect_noise((800, 600), 40).convert("RGB")
+        self.second = Image.linear_gradient("L").resize((500, 700))
+        open_document(self.editor, self.first, "first.png")
+        self.editor.filter_tab.brightness_scale.set(1.4)
+        self.editor.apply_adjustments()
+        self.editor.save_history()
+        draw_tab = self.editor.draw_tab
+        for x, y in ((10, 10), (50, 60)):
+            draw_tab.paint(HeadlessEvent(x, y))
+        draw_tab.reset(HeadlessEvent(50, 60))
+        self.first_rendered = self.editor.image.copy()
+        self.editor.workspace.new_document()
+        open_document(self.editor, self.second, "second.png")
+
+    def tearDown(self):
+        self.editor.history_snapshots.close()
+        self.temp_dir.cleanup()
+
+    def test_switch_restores_document(self):
+        workspace = self.editor.workspace
+        self.assertEqual(workspace.names(), ["first.png", "second.png"])
+        self.assertEqual(self.editor.draw_tab.drawn_items, [])
+        workspace.switch_to(0)
+        self.assertEqual(self.editor.image_path, "first.png")
+        self.assertIsNone(ImageChops.difference(self.editor.image, self.first_rendered).getbbox())
+        self.assertEqual(self.editor.filter_tab.brightness_scale.get(), 1.4)
+        self.assertEqual(len(self.editor.draw_tab.drawn_items), 1)
+        self.assertEqual(len(self.editor.image_canvas.find_withtag("stroke")), 1)
+        self.assertEqual(self.editor.display_size, (400, 300))
+        # Отмена возвращает предыдущие версии графа: без штриха, затем без яркости
+        self.editor.undo()
+        self.assertEqual(self.editor.draw_tab.drawn_items, [])
+        self.assertEqual(self.editor.filter_tab.brightness_scale.get(), 1.4)
+        self.editor.undo()
+        self.assertEqual(self.editor.filter_tab.brightness_scale.get(), 1.0)
+        self.assertIsNone(ImageChops.difference(self.editor.image, self.first).getbbox())
+
+    def test_inactive_documents_paged_out(self):
+        # Пиксели неактивного документа не хранятся в памяти; снимки его истории выгружены на диск
+        workspace = self.editor.workspace
+        document = workspace.documents[0]
+        self.assertIsNone(document.state["image"])
+        self.assertIsNone(document.state["original_image"])
+        self.assertEqual(len(document.state["history"]), 3)
+        self.assertGreater(self.editor.history_snapshots.disk_usage(), 0)
+        self.assertEqual(len(self.editor.render_cache), 0)
+        self.assertGreater(workspace.paged_bytes(), 0)
+
+    def test_unchanged_document_not_rewritten(self):
+        workspace = self.editor.workspace
+        workspace.switch_to(0)
+        paths = {field: page.path for field, page in workspace.documents[0].pages.items()}
+        workspace.switch_to(1)
+        self.assertEqual({field: page.path for field, page in workspace.documents[0].pages.items()}, paths)
+        self.assertEqual(workspace.resident_bytes(), 0)
+
+    def test_edited_document_rewritten(self):
+        workspace = self.editor.workspace
+        workspace.switch_to(0)
+        self.editor.rotate_image(90)
+        edited = self.editor.image.copy()
+        workspace.switch_to(1)
+        workspace.switch_to(0)
+        self.assertIsNone(ImageChops.difference(self.editor.image, edited).getbbox())
+
+    def test_close_document(self):
+        workspace = self.editor.workspace
+        workspace.close()
+        self.assertEqual(len(workspace), 1)
+        self.assertEqual(self.editor.image_path, "first.png")
+        workspace.close()
+        self.assertEqual(len(workspace), 1)
+        self.assertIsNone(self.editor.image)
+        self.assertEqual(self.editor.image_canvas.find_withtag("background"), ())
+        self.assertEqual(os.listdir(self.temp_dir.name), [])
+
+if __name__ == '__main__':
+    unittest.main()
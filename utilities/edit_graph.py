@@ -0,0 +1,407 @@
+"""
+Неразрушающее редактирование: правки документа как упорядоченная цепочка операций.
+
+EditGraph - неизменяемая последовательность узлов (resize, rotate, crop, color, blur,
+strokes, text), применяемых к исходному изображению. Результат каждого растрового
+узла кэшируется в RenderCache под ключом, включающим ключи всех предыдущих узлов,
+поэтому изменение одного узла пересчитывает только его и узлы после него.
+
+Изменение графа возвращает новый граф, а неизменившиеся узлы общие для всех версий.
+История документа - список графов (EditHistory), и отмена - перемещение указателя
+в этом списке: пиксели не сохраняются, результаты берутся из кэша или пересчитываются.
+
+Идущие подряд узлы resize, rotate и crop выполняются одним геометрическим
+преобразованием (utilities.geometry): изображение передискретизируется один раз и только
+в пределах итоговой обрезки. Результат такой группы кэшируется под ключом ее последнего узла.
+
+Узлы strokes и text всегда последние и задаются в координатах итогового изображения.
+На экране они показываются элементами холста (DrawTab), поэтому при выводе на экран
+вычисляется только растровая часть графа, а при сохранении - весь граф. Когда узлы
+resize, rotate и crop изменяют итоговое изображение, координаты штрихов и текста
+переводятся в новые (remap_overlays), и они остаются на тех же местах изображения.
+"""
+import logging
+import math
+from PIL import ImageDraw
+from utilities.image_processing import resize_image, apply_color_adjustments, apply_blur
+from utilities.fonts import get_font
+from utilities.geometry import EPSILON, apply_geometry, compose, invert, plan_geometry, transform_point
+
+# Узлы, которых в графе не больше одного; повторная установка заменяет параметры на месте
+SINGLETON_KINDS = ("resize", "color", "blur", "strokes", "text")
+
+# Векторные узлы в конце графа (в координатах итогового изображения)
+OVERLAY_KINDS = ("strokes", "text")
+
+# Геометрические узлы; идущие подряд объединяются в одно преобразование
+GEOMETRY_KINDS = ("resize", "rotate", "crop")
+
+def draw_strokes(image, strokes):
+    # Отрисовка штрихов (Stroke) на изображении на месте
+    draw = ImageDraw.Draw(image)
+    for stroke in strokes:
+        stroke.draw(draw)
+    return image
+
+def draw_texts(image, text_items):
+    # Отрисовка текстовых элементов DrawTab на изображении на месте
+    draw = ImageDraw.Draw(image)
+    for text_item in text_items:
+        font = get_font(text_item["font_family"], text_item["font_size"])
+        draw.text((text_item["x"], text_item["y"]), text_item["text"], fill=text_item["color"], font=font)
+    return image
+
+def _resize_size(node, scale):
+    return max(1, round(node["width"] * scale)), max(1, round(node["height"] * scale))
+
+def _resize(image, node, scale, quality):
+    size = _resize_size(node, scale)
+    if size == image.size:
+        return image
+    return resize_image(image, size[0], size[1], quality)
+
+def _rotate(image, node, scale, quality):
+    # Кратные 90 градусам углы - перестановка пикселей, остальные - фильтр уровня качества
+    return apply_geometry(image, [("rotate", node["angle"])], quality)
+
+def _crop(image, node, scale, quality):
+    # Прямоугольник задан долями размера входа, поэтому не зависит от масштаба предпросмотра
+    left, top, right, bottom = node["box"]
+    width, height = image.size
+    return image.crop((round(left * width), round(top * height), round(right * width), round(bottom * height)))
+
+def _color(image, node, scale, quality):
+    return apply_color_adjustments(image, node["brightness"], node["contrast"], node["saturation"])
+
+def _blur(image, node, scale, quality):
+    return apply_blur(image, node["radius"] * scale)
+
+def _strokes(image, node, scale, quality):
+    return draw_strokes(image.copy(), node["strokes"])
+
+def _text(image, node, scale, quality):
+    return draw_texts(image.copy(), node["items"])
+
+def geometry_step(node, size, scale):
+    # Шаг apply_geometry для узла resize, rotate или crop, применяемого к изображению размера size
+    if node.kind == "resize":
+        width, height = _resize_size(node, scale)
+        # Как resize_image: стороны не меньше 100 пикселей, если размер изменяется
+        return ("resize", size if (width, height) == size else (max(100, width), max(100, height)))
+    if node.kind == "rotate":
+        return ("rotate", node["angle"])
+    return ("crop", tuple(node["box"]))
+
+def _geometry(image, nodes, scale, quality):
+    # Группа идущих подряд геометрических узлов за одну передискретизацию
+    steps = []
+    size = image.size
+    for node in nodes:
+        step = geometry_step(node, size, scale)
+        steps.append(step)
+        size = plan_geometry(size, [step])[1]
+    return apply_geometry(image, steps, quality)
+
+# Операции узлов: вид -> функция (image, node, scale, quality) -> image
+OPERATIONS = {"resize": _resize, "rotate": _rotate, "crop": _crop, "color": _color, "blur": _blur,
+              "strokes": _strokes, "text": _text}
+
+class Node:
+    """Операция графа с параметрами; параметры не изменяются после создания."""
+
+    __slots__ = ("kind", "params")
+
+    def __init__(self, kind, **params):
+        if kind not in OPERATIONS:
+            raise ValueError(f"Неизвестная операция: {kind}")
+        self.kind = kind
+        self.params = params
+
+    def __getitem__(self, name):
+        return self.params[name]
+
+    def is_neutral(self):
+        # True, если узел не изменяет изображение и может быть пропущен
+        if self.kind == "color":
+            return self["brightness"] == self["contrast"] == self["saturation"] == 1.0
+        if self.kind == "blur":
+            return self["radius"] <= 0
+        if self.kind == "rotate":
+            return self["angle"] % 360 == 0
+        if self.kind == "crop":
+            return tuple(self["box"]) == (0, 0, 1, 1)
+        if self.kind == "strokes":
+            return not self["strokes"]
+        if self.kind == "text":
+            return not self["items"]
+        return False
+
+    def key(self):
+        # Ключ параметров растрового узла для кэша
+        return (self.kind,) + tuple(sorted(self.params.items()))
+
+    def __eq__(self, other):
+        return isinstance(other, Node) and self.kind == other.kind and self.params == other.params
+
+    __hash__ = None
+
+    def __repr__(self):
+        params = ", ".join(f"{name}={value!r}" for name, value in self.params.items())
+        return f"Node({self.kind!r}, {params})"
+
+class EditGraph:
+    """Неизменяемая цепочка узлов правки."""
+
+    __slots__ = ("nodes",)
+
+    def __init__(self, nodes=()):
+        self.nodes = tuple(nodes)
+
+    def set(self, kind, **params):
+        """
+        Устанавливает параметры узла вида kind из SINGLETON_KINDS.
+
+        Существующий узел заменяется на месте (если параметры не изменились, возвращается
+        тот же граф); нейтральный узел, которого еще нет, не добавляется.
+        """
+        node = Node(kind, **params)
+        for index, existing in enumerate(self.nodes):
+            if existing.kind == kind:
+                if existing == node:
+                    return self
+                return EditGraph(self.nodes[:index] + (node,) + self.nodes[index + 1:])
+        if node.is_neutral():
+            return self
+        return self._insert(node)
+
+    def append(self, kind, **params):
+        # Добавление новой операции после всех растровых узлов
+        return self._insert(Node(kind, **params))
+
+    def _insert(self, node):
+        if node.kind in OVERLAY_KINDS:
+            return EditGraph(self.nodes + (node,))
+        position = self._raster_length()
+        return EditGraph(self.nodes[:position] + (node,) + self.nodes[position:])
+
+    def _raster_length(self):
+        position = len(self.nodes)
+        while position and self.nodes[position - 1].kind in OVERLAY_KINDS:
+            position -= 1
+        return position
+
+    def find(self, kind):
+        # Первый узел вида kind или None
+        return next((node for node in self.nodes if node.kind == kind), None)
+
+    def raster(self):
+        # Граф без векторных узлов strokes и text
+        return EditGraph(self.nodes[:self._raster_length()])
+
+    def geometry(self, source_size):
+        """
+        Геометрия растровой части графа для исходного изображения размера source_size.
+
+        Returns:
+            tuple: (матрица из пикселей итогового изображения в пиксели исходного, размер итогового изображения).
+        """
+        steps = []
+        size = tuple(source_size)
+        for node in self.nodes[:self._raster_length()]:
+            if node.kind in GEOMETRY_KINDS and not node.is_neutral():
+                step = geometry_step(node, size, 1.0)
+                steps.append(step)
+                size = plan_geometry(size, [step])[1]
+        return plan_geometry(tuple(source_size), steps)
+
+    def remap_overlays(self, previous, source_size):
+        """
+        Переносит штрихи и текст графа previous в координаты итогового изображения этого графа.
+
+        Точки переводятся отображением "итоговое изображение previous -> исходное изображение ->
+        итоговое изображение графа", толщина штрихов и размер шрифта масштабируются. Текст
+        остается горизонтальным: переносится его левый верхний угол.
+
+        Args:
+            previous (EditGraph): Граф, в координатах которого заданы штрихи и текст.
+            source_size (tuple): Размер исходного изображения документа.
+
+        Returns:
+            EditGraph: Растровая часть графа с узлами strokes и text графа previous
+                (сам граф, если они совпадают с его собственными).
+        """
+        old_matrix, _ = previous.geometry(source_size)
+        new_matrix, _ = self.geometry(source_size)
+        overlays = previous.nodes[previous._raster_length():]
+        if all(abs(old - new) < EPSILON for old, new in zip(old_matrix, new_matrix)):
+            graph = EditGraph(self.raster().nodes + overlays)
+            return self if graph == self else graph
+        matrix = compose(invert(new_matrix), old_matrix)
+        scale = math.sqrt(abs(matrix[0] * matrix[4] - matrix[1] * matrix[3]))
+
+        def transform(x, y):
+            return transform_point(matrix, x, y)
+
+        graph = self.raster()
+        for node in overlays:
+            if node.kind == "strokes":
+                graph = graph.set("strokes", strokes=tuple(stroke.transformed(transform, scale) for stroke in node["strokes"]))
+            else:
+                items = []
+                for item in node["items"]:
+                    x, y = transform(item["x"], item["y"])
+                    items.append(dict(item, x=round(x), y=round(y), font_size=max(1, round(item["font_size"] * scale))))
+                graph = graph.set("text", items=tuple(items))
+        logging.debug("Штрихи и текст перенесены в координаты нового итогового изображения")
+        return graph
+
+    def evaluate(self, source, source_key, cache=None, scale=1.0, quality="final", overlays=False):
+        """
+        Применяет граф к исходному изображению.
+
+        Вычисление начинается с самого позднего узла, результат которого есть в кэше;
+        нейтральные узлы пропускаются и не занимают место в кэше.
+
+        Args:
+            source (PIL.Image.Image): Исходное изображение.
+            source_key: Идентификатор содержимого source.
+            cache (RenderCache): Кэш результатов узлов или None.
+            scale (float): Масштаб source относительно исходного изображения документа
+                (для предпросмотра на уменьшенной копии): размеры и радиусы узлов умножаются на него.
+            quality (str): Уровень качества изменения размера из RESAMPLING_TIERS.
+            overlays (bool): Применять ли векторные узлы strokes и text.
+
+        Returns:
+            PIL.Image.Image: Результат; может быть общим с кэшем или source и не должен изменяться на месте.
+        """
+        raster_length = self._raster_length()
+        stages = []
+        key = ("graph", source_key, scale, quality)
+        for node in self.nodes[:raster_length]:
+            if not node.is_neutral():
+                key = key + (node.key(),)
+                stages.append((key, node))
+
+        image = source
+        first_missing = 0
+        if cache is not None:
+            for index in range(len(stages) - 1, -1, -1):
+                cached = cache.get(stages[index][0])
+                if cached is not None:
+                    image = cached
+                    first_missing = index + 1
+                    break
+        index = first_missing
+        while index < len(stages):
+            end = index + 1
+            if stages[index][1].kind in GEOMETRY_KINDS:
+                while end < len(stages) and stages[end][1].kind in GEOMETRY_KINDS:
+                    end += 1
+            if end - index > 1:
+                image = _geometry(image, [node for _, node in stages[index:end]], scale, quality)
+            else:
+                image = OPERATIONS[stages[index][1].kind](image, stages[index][1], scale, quality)
+            if cache is not None:
+                cache.put(stages[end - 1][0], image)
+            index = end
+        logging.debug("Граф правки: %d узлов, пересчитано %d", len(stages), len(stages) - first_missing)
+
+        if overlays:
+            for node in self.nodes[raster_length:]:
+                if not node.is_neutral():
+                    image = OPERATIONS[node.kind](image, node, scale, quality)
+        return image
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def __eq__(self, other):
+        return isinstance(other, EditGraph) and self.nodes == other.nodes
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"EditGraph({list(self.nodes)!r})"
+
+class EditHistory:
+    """
+    Версии графа документа с указателем на текущую.
+
+    len() - число версий до текущей включительно (как длина стека отмены);
+    версии после указателя доступны для повтора до следующего append().
+    С хранилищем snapshots (utilities.history.SnapshotStore) версия может хранить
+    снимок своего изображения, чтобы отмена не пересчитывала граф.
+    """
+
+    def __init__(self, maxlen=100, snapshots=None):
+        self.maxlen = maxlen
+        self.snapshots = snapshots
+        self._versions = []
+        self._images = []
+        self._position = -1
+
+    def append(self, graph, image=None):
+        # Новая версия после текущей; версии для повтора отбрасываются
+        reference = self._images[self._position] if self._versions else None
+        self._discard(self._position + 1, len(self._versions))
+        snapshot = None
+        if image is not None and self.snapshots is not None:
+            snapshot = self.snapshots.add(image, reference)
+        self._versions.append(graph)
+        self._images.append(snapshot)
+        if len(self._versions) > self.maxlen:
+            self._discard(0, len(self._versions) - self.maxlen)
+        self._position = len(self._versions) - 1
+
+    def undo(self):
+        # Переход к предыдущей версии; None, если отменять нечего
+        if self._position <= 0:
+            return None
+        self._position -= 1
+        return self._versions[self._position]
+
+    def redo(self):
+        # Переход к следующей версии; None, если повторять нечего
+        if self._position + 1 >= len(self._versions):
+            return None
+        self._position += 1
+        return self._versions[self._position]
+
+    def current(self):
+        return self._versions[self._position] if self._versions else None
+
+    def image(self):
+        # Изображение текущей версии из снимка; None, если снимка нет или он удален по лимиту
+        snapshot = self._images[self._position] if self._versions else None
+        return snapshot.image() if snapshot is not None else None
+
+    def spill(self):
+        # Выгрузка снимков истории на диск; возвращает число байт
+        if self.snapshots is None:
+            return 0
+        return self.snapshots.spill(snapshot for snapshot in self._images if snapshot is not None)
+
+    def redo_count(self):
+        return len(self._versions) - self._position - 1
+
+    def clear(self):
+        self._discard(0, len(self._versions))
+        self._position = -1
+
+    def _discard(self, start, stop):
+        # Удаление версий [start, stop) вместе со снимками
+        for snapshot in self._images[start:stop]:
+            if snapshot is not None:
+                self.snapshots.remove(snapshot)
+        del self._versions[start:stop]
+        del self._images[start:stop]
+
+    def __len__(self):
+        return self._position + 1
+
+    def __getitem__(self, index):
+        # Версии до текущей включительно; history[-1] - текущая
+        return self._versions[:self._position + 1][index]
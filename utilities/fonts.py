@@ -0,0 +1,195 @@
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+from PIL import ImageFont
+
+# Расширения файлов шрифтов, которые понимает FreeType
+FONT_EXTENSIONS = (".ttf", ".otf", ".ttc")
+
+# Число загруженных шрифтов (файл, размер), хранящихся в памяти
+FONT_CACHE_SIZE = 64
+
+# Стили, предпочитаемые при выборе файла для семейства
+REGULAR_STYLES = ("regular", "book", "normal", "roman", "medium")
+
+def default_font_dirs():
+    # Системные и пользовательские каталоги шрифтов текущей платформы
+    home = os.path.expanduser("~")
+    if sys.platform.startswith("win"):
+        windows_dir = os.environ.get("WINDIR", "C:/Windows")
+        directories = [os.path.join(windows_dir, "Fonts")]
+        if os.environ.get("LOCALAPPDATA"):
+            directories.append(os.path.join(os.environ["LOCALAPPDATA"], "Microsoft", "Windows", "Fonts"))
+    elif sys.platform == "darwin":
+        directories = ["/System/Library/Fonts", "/Library/Fonts", os.path.join(home, "Library", "Fonts")]
+    else:
+        data_home = os.environ.get("XDG_DATA_HOME") or os.path.join(home, ".local", "share")
+        directories = ["/usr/share/fonts", "/usr/local/share/fonts", os.path.join(data_home, "fonts"), os.path.join(home, ".fonts")]
+    return directories
+
+def default_cache_path():
+    # Файл, в котором индекс шрифтов сохраняется между запусками
+    if sys.platform.startswith("win") and os.environ.get("LOCALAPPDATA"):
+        cache_dir = os.environ["LOCALAPPDATA"]
+    else:
+        cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_dir, "photo_editor", "font_index.json")
+
+def read_font_name(path):
+    # Семейство и стиль шрифта из его файла
+    return ImageFont.truetype(path, 10).getname()
+
+class FontIndex:
+    """
+    Индекс системных шрифтов: имя семейства -> файл шрифта.
+
+    Каталоги сканируются один раз; индекс сохраняется в JSON-файл вместе с
+    отпечатком каталогов (время изменения) и пересобирается, только когда
+    каталоги шрифтов изменились.
+    """
+
+    def __init__(self, directories=None, cache_path=None):
+        """
+        Args:
+            directories (list): Каталоги шрифтов (по умолчанию - системные каталоги платформы).
+            cache_path (str): Файл для сохранения индекса или None, чтобы не сохранять.
+        """
+        self.directories = list(directories) if directories is not None else default_font_dirs()
+        self.cache_path = cache_path
+        self.fonts = {}
+        self.aliases = {}
+        self._names = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        # Загрузка индекса из файла или сканирование каталогов; повторные вызовы ничего не делают
+        with self._lock:
+            if self._loaded:
+                return self
+            signature = self._signature()
+            if not self._read_cache(signature):
+                self.fonts, self.aliases = self._scan()
+                self._write_cache(signature)
+            self._names = {name.lower(): path for name, path in self.aliases.items()}
+            self._names.update((family.lower(), path) for family, path in self.fonts.items())
+            self._loaded = True
+            logging.info(f"Индекс шрифтов: {len(self.fonts)} семейств")
+            return self
+
+    def families(self):
+        # Отсортированный список семейств шрифтов
+        self.load()
+        return sorted(self.fonts, key=str.lower)
+
+    def find(self, family):
+        # Путь к файлу шрифта семейства или имени файла без расширения (без учета регистра) или None
+        self.load()
+        return self._names.get(family.lower()) if family else None
+
+    def _signature(self):
+        # Отпечаток каталогов шрифтов: время изменения каждого подкаталога
+        signature = {}
+        for directory in self.directories:
+            for root, _, _ in os.walk(directory):
+                try:
+                    signature[root] = os.stat(root).st_mtime_ns
+                except OSError:
+                    continue
+        return signature
+
+    def _scan(self):
+        # Чтение имен всех шрифтов в каталогах; возвращает семейства и имена файлов
+        candidates = {}
+        aliases = {}
+        for directory in self.directories:
+            for root, _, files in os.walk(directory):
+                for file_name in sorted(files):
+                    stem, extension = os.path.splitext(file_name)
+                    if extension.lower() not in FONT_EXTENSIONS:
+                        continue
+                    path = os.path.join(root, file_name)
+                    try:
+                        family, style = read_font_name(path)
+                    except Exception as e:
+                        logging.debug(f"Пропуск шрифта {path}: {e}")
+                        continue
+                    rank = 0 if (style or "").lower() in REGULAR_STYLES else 1
+                    if family and (family not in candidates or rank < candidates[family][0]):
+                        candidates[family] = (rank, path)
+                    # Имя файла без расширения тоже ищется (например, "arial" для arial.ttf)
+                    aliases.setdefault(stem, path)
+        return {family: path for family, (_, path) in candidates.items()}, aliases
+
+    def _read_cache(self, signature):
+        # Чтение сохраненного индекса, если каталоги с тех пор не менялись
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return False
+        try:
+            with open(self.cache_path, encoding="utf-8") as cache_file:
+                cached = json.load(cache_file)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Не удалось прочитать индекс шрифтов {self.cache_path}: {e}")
+            return False
+        if cached.get("directories") != self.directories or cached.get("signature") != signature:
+            return False
+        self.fonts = cached.get("fonts", {})
+        self.aliases = cached.get("aliases", {})
+        return True
+
+    def _write_cache(self, signature):
+        # Сохранение индекса вместе с отпечатком каталогов
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            partial_path = self.cache_path + ".part"
+            with open(partial_path, "w", encoding="utf-8") as cache_file:
+                json.dump({"directories": self.directories, "signature": signature, "fonts": self.fonts, "aliases": self.aliases}, cache_file, ensure_ascii=False)
+            os.replace(partial_path, self.cache_path)
+        except OSError as e:
+            logging.warning(f"Не удалось сохранить индекс шрифтов {self.cache_path}: {e}")
+
+@functools.lru_cache(maxsize=FONT_CACHE_SIZE)
+def load_font(path, size):
+    # Загруженный шрифт FreeType; кэшируется по (файл, размер)
+    return ImageFont.truetype(path, size)
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+def get_font_index():
+    # Общий индекс системных шрифтов с сохранением между запусками
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = FontIndex(cache_path=default_cache_path())
+        return _default_index.load()
+
+def get_font(family, size, index=None):
+    """
+    Возвращает шрифт семейства нужного размера.
+
+    Args:
+        family (str): Имя семейства шрифта.
+        size (int): Размер шрифта.
+        index (FontIndex): Индекс шрифтов (по умолчанию - общий индекс системных шрифтов).
+
+    Returns:
+        ImageFont: Шрифт FreeType или шрифт по умолчанию, если семейство не найдено.
+    """
+    path = (index or get_font_index()).find(family)
+    if path:
+        try:
+            return load_font(path, int(size))
+        except OSError as e:
+            logging.warning(f"Не удалось загрузить шрифт {path}: {e}")
+    return load_default_font()
+
+@functools.lru_cache(maxsize=1)
+def load_default_font():
+    # Шрифт по умолчанию, загружается один раз
+    return ImageFont.load_default()
@@ -0,0 +1,163 @@
+"""
+Объединенное геометрическое преобразование: изменение размера, поворот и обрезка за один проход.
+
+Цепочка шагов ("resize", (ширина, высота)), ("rotate", угол), ("crop", доли размера)
+сводится к одной аффинной матрице, отображающей пиксели результата в пиксели
+исходного изображения. Изображение передискретизируется один раз и только в пределах
+итогового прямоугольника, а не после каждого шага с повторной фильтрацией.
+
+Матрица, которая сводится к повороту на угол, кратный 90 градусам, и растяжению вдоль
+осей, выполняется без аффинного преобразования: transpose (перестановка пикселей без
+передискретизации), затем crop или resize с областью box фильтром уровня качества.
+Остальные матрицы выполняются через Image.transform.
+
+Размеры результата совпадают с последовательным выполнением шагов: поворот считается
+так же, как Image.rotate(angle, expand=True), доли обрезки округляются от размера
+изображения перед обрезкой.
+"""
+import math
+from PIL import Image
+from utilities.image_processing import resample
+
+# Фильтры Image.transform по уровням качества RESAMPLING_TIERS (LANCZOS для аффинного преобразования недоступен)
+TRANSFORM_FILTERS = {"draft": Image.NEAREST, "interactive": Image.BILINEAR, "final": Image.BICUBIC}
+
+# Во сколько раз исходное изображение должно быть больше результата, чтобы перед
+# аффинным преобразованием его уменьшить усреднением блоков в целое число раз:
+# Image.transform берет только соседние пиксели и без этого дает ступенчатость при уменьшении
+REDUCING_GAP = 2.0
+
+# Допуск при сравнении элементов матрицы
+EPSILON = 1e-9
+
+# Аффинная матрица (a, b, c, d, e, f): x' = a * x + b * y + c, y' = d * x + e * y + f
+IDENTITY = (1.0, 0.0, 0.0, 0.0, 1.0, 0.0)
+
+def compose(first, second):
+    # Матрица отображения x -> first(second(x))
+    a1, b1, c1, d1, e1, f1 = first
+    a2, b2, c2, d2, e2, f2 = second
+    return (a1 * a2 + b1 * d2, a1 * b2 + b1 * e2, a1 * c2 + b1 * f2 + c1,
+            d1 * a2 + e1 * d2, d1 * b2 + e1 * e2, d1 * c2 + e1 * f2 + f1)
+
+def invert(matrix):
+    # Обратная аффинная матрица
+    a, b, c, d, e, f = matrix
+    determinant = a * e - b * d
+    return (e / determinant, -b / determinant, (b * f - c * e) / determinant,
+            -d / determinant, a / determinant, (c * d - a * f) / determinant)
+
+def transform_point(matrix, x, y):
+    # Образ пикселя (x, y): отображается его центр, поэтому повороты на 90 градусов
+    # переводят пиксели в пиксели так же, как Image.transpose
+    x, y = x + 0.5, y + 0.5
+    a, b, c, d, e, f = matrix
+    return a * x + b * y + c - 0.5, d * x + e * y + f - 0.5
+
+def rotation_matrix(size, angle):
+    """
+    Обратное отображение и размер результата поворота, как у Image.rotate(angle, expand=True).
+
+    Returns:
+        tuple: (матрица из пикселей результата в пиксели изображения, (ширина, высота)).
+    """
+    width, height = size
+    radians = -math.radians(angle % 360.0)
+    cos, sin = round(math.cos(radians), 15), round(math.sin(radians), 15)
+    center_x, center_y = width / 2, height / 2
+    matrix = [cos, sin, 0.0, -sin, cos, 0.0]
+    matrix[2] = cos * -center_x + sin * -center_y + center_x
+    matrix[5] = -sin * -center_x + cos * -center_y + center_y
+    xs, ys = [], []
+    for x, y in ((0, 0), (width, 0), (width, height), (0, height)):
+        xs.append(matrix[0] * x + matrix[1] * y + matrix[2])
+        ys.append(matrix[3] * x + matrix[4] * y + matrix[5])
+    new_width = math.ceil(max(xs)) - math.floor(min(xs))
+    new_height = math.ceil(max(ys)) - math.floor(min(ys))
+    shift_x, shift_y = -(new_width - width) / 2.0, -(new_height - height) / 2.0
+    matrix[2], matrix[5] = (matrix[0] * shift_x + matrix[1] * shift_y + matrix[2],
+                            matrix[3] * shift_x + matrix[4] * shift_y + matrix[5])
+    return tuple(matrix), (new_width, new_height)
+
+def plan_geometry(size, steps):
+    """
+    Сводит шаги к одной матрице.
+
+    Args:
+        size (tuple): Размер исходного изображения.
+        steps (list): Шаги ("resize", (ширина, высота)), ("rotate", угол против часовой стрелки)
+            и ("crop", (left, top, right, bottom) в долях размера).
+
+    Returns:
+        tuple: (матрица из пикселей результата в пиксели исходного изображения, размер результата).
+    """
+    matrix = IDENTITY
+    width, height = size
+    for kind, value in steps:
+        if kind == "resize":
+            new_size = tuple(value)
+            step = (width / new_size[0], 0.0, 0.0, 0.0, height / new_size[1], 0.0)
+        elif kind == "rotate":
+            step, new_size = rotation_matrix((width, height), value)
+        elif kind == "crop":
+            left, top, right, bottom = value
+            box = (round(left * width), round(top * height), round(right * width), round(bottom * height))
+            step = (1.0, 0.0, float(box[0]), 0.0, 1.0, float(box[1]))
+            new_size = (box[2] - box[0], box[3] - box[1])
+        else:
+            raise ValueError(f"Неизвестный геометрический шаг: {kind}")
+        matrix = compose(matrix, step)
+        width, height = new_size
+    return matrix, (width, height)
+
+def _transposes(size):
+    # Повороты на 90, 180 и 270 градусов: (метод transpose, прямое отображение пикселей)
+    width, height = size
+    return ((Image.ROTATE_90, (0.0, 1.0, 0.0, -1.0, 0.0, float(width))),
+            (Image.ROTATE_180, (-1.0, 0.0, float(width), 0.0, -1.0, float(height))),
+            (Image.ROTATE_270, (0.0, -1.0, float(height), 1.0, 0.0, 0.0)))
+
+def _is_axis_aligned(matrix):
+    # True, если матрица только растягивает и сдвигает вдоль осей
+    a, b, _, d, e, _ = matrix
+    return abs(b) < EPSILON and abs(d) < EPSILON and a > EPSILON and e > EPSILON
+
+def apply_geometry(image, steps, quality="final"):
+    """
+    Выполняет шаги plan_geometry за одну передискретизацию.
+
+    Args:
+        image (PIL.Image.Image): Исходное изображение.
+        steps (list): Шаги (см. plan_geometry).
+        quality (str): Уровень качества из RESAMPLING_TIERS.
+
+    Returns:
+        PIL.Image.Image: Результат; области за пределами повернутого изображения черные (прозрачные для RGBA).
+    """
+    matrix, size = plan_geometry(image.size, steps)
+    if not _is_axis_aligned(matrix):
+        for method, forward in _transposes(image.size):
+            remainder = compose(forward, matrix)
+            if _is_axis_aligned(remainder):
+                image = image.transpose(method)
+                matrix = remainder
+                break
+    if _is_axis_aligned(matrix):
+        a, _, c, _, e, f = matrix
+        box = (c, f, c + a * size[0], f + e * size[1])
+        if abs(a - 1) < EPSILON and abs(e - 1) < EPSILON and all(abs(value - round(value)) < EPSILON for value in box):
+            box = tuple(round(value) for value in box)
+            return image.copy() if box == (0, 0) + image.size else image.crop(box)
+        # Область box не выходит за изображение (с точностью до ошибок округления)
+        box = (max(0.0, box[0]), max(0.0, box[1]), min(float(image.width), box[2]), min(float(image.height), box[3]))
+        return resample(image, size, quality, box=box)
+
+    a, b, c, d, e, f = matrix
+    # Число пикселей исходного изображения на пиксель результата вдоль стороны
+    reduction = math.sqrt(abs(a * e - b * d))
+    if reduction >= REDUCING_GAP and image.mode not in ("1", "P"):
+        # Пиксель уменьшенной копии - среднее блока factor x factor; остаток уменьшения меньше 2 раз
+        factor = int(reduction)
+        image = image.reduce(factor)
+        matrix = tuple(value / factor for value in matrix)
+    return image.transform(size, Image.AFFINE, matrix, TRANSFORM_FILTERS[quality])
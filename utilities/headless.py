@@ -0,0 +1,348 @@
+"""
+Редактор без графического интерфейса для тестов производительности и воспроизведения сессий.
+
+Создается настоящий PhotoEditor с настоящими EditTab, FilterTab и DrawTab, но вместо
+виджетов Tk используются легкие заменители с тем же интерфейсом: цикл событий с
+after(), ползунки, надписи и холст, хранящий свои элементы. Изображения для холста
+копируются так же, как это делает ImageTk.PhotoImage, поэтому время обновления
+экрана сопоставимо с настоящим (без вывода на экран).
+"""
+import heapq
+import itertools
+import time
+from photo_editor import PhotoEditor
+from gui.edit_tab import EditTab
+from gui.filter_tab import FilterTab, HISTOGRAM_WIDTH, HISTOGRAM_HEIGHT
+from gui.draw_tab import DrawTab
+from gui.filmstrip import Filmstrip
+
+class HeadlessRoot:
+    """Цикл событий с after()/after_cancel(); обработчики выполняются в update()."""
+
+    def __init__(self):
+        self._queue = []
+        self._cancelled = set()
+        self._ids = itertools.count(1)
+
+    def after(self, delay_ms, callback, *args):
+        job_id = f"after#{next(self._ids)}"
+        heapq.heappush(self._queue, (time.perf_counter() + delay_ms / 1000, job_id, callback, args))
+        return job_id
+
+    def after_cancel(self, job_id):
+        self._cancelled.add(job_id)
+
+    def update(self):
+        # Выполнение всех обработчиков, срок которых наступил
+        now = time.perf_counter()
+        while self._queue and self._queue[0][0] <= now:
+            _, job_id, callback, args = heapq.heappop(self._queue)
+            if job_id in self._cancelled:
+                self._cancelled.discard(job_id)
+                continue
+            callback(*args)
+
+    def update_idletasks(self):
+        pass
+
+    def run_until(self, condition, timeout=60.0):
+        # Прокрутка цикла событий, пока condition() не вернет True; False по истечении timeout
+        deadline = time.perf_counter() + timeout
+        while not condition():
+            if time.perf_counter() > deadline:
+                return False
+            self.update()
+            time.sleep(0.001)
+        return True
+
+    def pending(self):
+        # Число запланированных и не отмененных обработчиков
+        return sum(1 for entry in self._queue if entry[1] not in self._cancelled)
+
+class HeadlessWidget:
+    """Виджет без экрана: хранит параметры и привязки событий."""
+
+    def __init__(self, **options):
+        self.options = dict(options)
+        self.bindings = {}
+
+    def config(self, **options):
+        self.options.update(options)
+
+    configure = config
+
+    def cget(self, option):
+        return self.options.get(option, "")
+
+    def bind(self, sequence, handler, add=None):
+        self.bindings[sequence] = handler
+
+    def unbind(self, sequence, funcid=None):
+        self.bindings.pop(sequence, None)
+
+    def pack(self, **options):
+        pass
+
+    def grid(self, **options):
+        pass
+
+    def winfo_children(self):
+        return []
+
+    def destroy(self):
+        pass
+
+class HeadlessScale(HeadlessWidget):
+    """Ползунок: как и ttk.Scale, set() не вызывает обработчик command."""
+
+    def __init__(self, from_, to, value=None):
+        super().__init__(from_=from_, to=to)
+        self.value = from_ if value is None else value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = min(max(float(value), self.options["from_"]), self.options["to"])
+
+class HeadlessCombobox(HeadlessWidget):
+    def __init__(self, value=""):
+        super().__init__()
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+class HeadlessPhotoImage:
+    """
+    Заменитель ImageTk.PhotoImage: копирует пиксели в собственный буфер, как и
+    PhotoImage при передаче изображения в Tk.
+    """
+
+    def __init__(self, image):
+        if image.mode not in ("1", "L", "RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        else:
+            image = image.copy()
+        self.image = image
+
+    def width(self):
+        return self.image.width
+
+    def height(self):
+        return self.image.height
+
+class HeadlessCanvas(HeadlessWidget):
+    """Холст, хранящий элементы (тип, координаты, параметры, теги) без отрисовки."""
+
+    def __init__(self, width=1000, height=700):
+        super().__init__()
+        self.width = width
+        self.height = height
+        self.items = {}
+        # Смещение видимой области холста при прокрутке
+        self.x_offset = 0.0
+        self.y_offset = 0.0
+        self._ids = itertools.count(1)
+
+    def winfo_width(self):
+        return self.width
+
+    def winfo_height(self):
+        return self.height
+
+    def winfo_x(self):
+        return 0
+
+    def winfo_y(self):
+        return 0
+
+    def canvasx(self, x):
+        return x + self.x_offset
+
+    def canvasy(self, y):
+        return y + self.y_offset
+
+    def _scroll_height(self):
+        scrollregion = self.options.get("scrollregion")
+        return scrollregion[3] - scrollregion[1] if scrollregion else self.height
+
+    def yview_moveto(self, fraction):
+        # Как и в Tk, видимая область не выходит за scrollregion
+        limit = max(0.0, self._scroll_height() - self.height)
+        self.y_offset = min(max(fraction * self._scroll_height(), 0.0), limit)
+
+    def yview_scroll(self, number, what):
+        step = self.height * 0.9 if what == "pages" else (self.options.get("yscrollincrement") or self.height / 10)
+        self.yview_moveto((self.y_offset + number * step) / self._scroll_height())
+
+    def yview(self, *args):
+        # Команды полосы прокрутки: ("moveto", fraction) или ("scroll", number, what)
+        if not args:
+            height = self._scroll_height()
+            return self.y_offset / height, min(1.0, (self.y_offset + self.height) / height)
+        if args[0] == "moveto":
+            self.yview_moveto(float(args[1]))
+        elif args[0] == "scroll":
+            self.yview_scroll(int(args[1]), args[2])
+
+    def _create(self, item_type, coords, options):
+        item_id = next(self._ids)
+        tags = options.pop("tags", ())
+        if isinstance(tags, str):
+            tags = (tags,)
+        if len(coords) == 1 and isinstance(coords[0], (tuple, list)):
+            coords = coords[0]
+        self.items[item_id] = {"type": item_type, "coords": [float(value) for value in coords], "options": options, "tags": tuple(tags)}
+        return item_id
+
+    def create_image(self, *coords, **options):
+        return self._create("image", coords, options)
+
+    def create_line(self, *coords, **options):
+        return self._create("line", coords, options)
+
+    def create_text(self, *coords, **options):
+        return self._create("text", coords, options)
+
+    def create_rectangle(self, *coords, **options):
+        return self._create("rectangle", coords, options)
+
+    def _find(self, tag_or_id):
+        # Идентификаторы элементов по идентификатору, тегу или "all"
+        if isinstance(tag_or_id, int):
+            return [tag_or_id] if tag_or_id in self.items else []
+        if tag_or_id == "all":
+            return list(self.items)
+        return [item_id for item_id, item in self.items.items() if tag_or_id in item["tags"]]
+
+    def type(self, tag_or_id):
+        found = self._find(tag_or_id)
+        return self.items[found[0]]["type"] if found else None
+
+    def coords(self, tag_or_id, *coords):
+        found = self._find(tag_or_id)
+        if not found:
+            return []
+        if coords:
+            self.items[found[0]]["coords"] = [float(value) for value in coords]
+        return list(self.items[found[0]]["coords"])
+
+    def itemconfig(self, tag_or_id, **options):
+        for item_id in self._find(tag_or_id):
+            self.items[item_id]["options"].update(options)
+
+    def delete(self, *tags_or_ids):
+        for tag_or_id in tags_or_ids:
+            for item_id in self._find(tag_or_id):
+                del self.items[item_id]
+
+    def scale(self, tag_or_id, x_origin, y_origin, x_scale, y_scale):
+        for item_id in self._find(tag_or_id):
+            coords = self.items[item_id]["coords"]
+            for index in range(0, len(coords) - 1, 2):
+                coords[index] = x_origin + (coords[index] - x_origin) * x_scale
+                coords[index + 1] = y_origin + (coords[index + 1] - y_origin) * y_scale
+
+    def find_withtag(self, tag_or_id):
+        return tuple(self._find(tag_or_id))
+
+    def find_closest(self, x, y):
+        # Ближайший по первой точке элемент (упрощение поиска Tk)
+        if not self.items:
+            return ()
+        return (min(self.items, key=lambda item_id: (self.items[item_id]["coords"][0] - x) ** 2 + (self.items[item_id]["coords"][1] - y) ** 2),)
+
+    def tag_lower(self, tag_or_id, below=None):
+        pass
+
+    def tag_raise(self, tag_or_id, above=None):
+        pass
+
+    def tag_bind(self, tag_or_id, sequence, handler):
+        self.bindings[(tag_or_id, sequence)] = handler
+
+class HeadlessEvent:
+    """Событие мыши с координатами на холсте."""
+
+    def __init__(self, x=0, y=0, widget=None):
+        self.x = x
+        self.y = y
+        self.widget = widget
+
+def create_editor(canvas_size=(1000, 700)):
+    """
+    Создает PhotoEditor без экрана.
+
+    Состояние редактора и вкладок инициализируется их же методами init_state,
+    а виджеты, с которыми работают методы вкладок, заменяются заменителями без экрана.
+
+    Args:
+        canvas_size (tuple): Размер холста в пикселях.
+
+    Returns:
+        PhotoEditor: Редактор; его root - HeadlessRoot, холст - HeadlessCanvas.
+    """
+    editor = PhotoEditor.__new__(PhotoEditor)
+    editor.root = HeadlessRoot()
+    editor.init_state()
+    editor.photo_image_factory = HeadlessPhotoImage
+    editor.image_canvas = HeadlessCanvas(*canvas_size)
+    editor.status_label = HeadlessWidget(text="")
+
+    edit_tab = EditTab.__new__(EditTab)
+    edit_tab.editor = editor
+    edit_tab.width_scale = HeadlessScale(100, 2000)
+    edit_tab.height_scale = HeadlessScale(100, 2000)
+    edit_tab.width_value_label = HeadlessWidget(text="100")
+    edit_tab.height_value_label = HeadlessWidget(text="100")
+    edit_tab.manual_resize_button = HeadlessWidget(text="Ввести размеры вручную")
+    edit_tab.rotate_button = HeadlessWidget(text="Повернуть")
+    edit_tab.additional_controls_frame = HeadlessWidget()
+    editor.edit_tab = edit_tab
+
+    filter_tab = FilterTab.__new__(FilterTab)
+    filter_tab.editor = editor
+    for name in ("brightness", "contrast", "saturation"):
+        setattr(filter_tab, f"{name}_scale", HeadlessScale(0.5, 2.0, 1.0))
+        setattr(filter_tab, f"{name}_value_label", HeadlessWidget(text="1.0"))
+    filter_tab.blur_scale = HeadlessScale(0, 10, 0)
+    filter_tab.blur_value_label = HeadlessWidget(text="0")
+    filter_tab.histogram_canvas = HeadlessCanvas(HISTOGRAM_WIDTH, HISTOGRAM_HEIGHT)
+    editor.filter_tab = filter_tab
+
+    draw_tab = DrawTab.__new__(DrawTab)
+    draw_tab.editor = editor
+    draw_tab.init_state()
+    draw_tab.brush_size_scale = HeadlessScale(1, 10, draw_tab.brush_size)
+    draw_tab.font_combobox = HeadlessCombobox("Arial")
+    draw_tab.font_size_scale = HeadlessScale(10, 100, 20)
+    editor.draw_tab = draw_tab
+    return editor
+
+def create_filmstrip(editor, directory, cache, canvas_size=(720, 520)):
+    """
+    Создает окно обзора каталога без экрана и размещает ячейки, как после первого <Configure>.
+
+    Args:
+        editor (PhotoEditor): Редактор, созданный create_editor().
+        directory (str): Каталог с изображениями.
+        cache (ThumbnailCache): Кэш миниатюр.
+        canvas_size (tuple): Размер холста обзора в пикселях.
+    """
+    filmstrip = Filmstrip.__new__(Filmstrip)
+    filmstrip.window = HeadlessWidget()
+    filmstrip.canvas = HeadlessCanvas(*canvas_size)
+    filmstrip.init_state(editor, directory, cache)
+    filmstrip.photo_image_factory = HeadlessPhotoImage
+    editor.filmstrip = filmstrip
+    filmstrip.layout()
+    return filmstrip
+
+def open_document(editor, image, file_path="<memory>"):
+    # Открытие изображения из памяти как нового документа, как после загрузки файла
+    editor.finish_load(file_path, image)
+    return editor
@@ -0,0 +1,185 @@
+"""
+Гистограмма результата правки и автоуровни.
+
+Гистограмма считается не по изображению документа, а по маленькой копии исходника
+(не больше HISTOGRAM_PROXY_SIDE по большей стороне), к которой применяется граф правки.
+
+Яркость и контрастность - поканальная таблица (LUT), поэтому при их изменении пиксели
+не пересчитываются: гистограмма изображения перед узлом color запоминается, и новая
+гистограмма получается переносом ее столбцов через таблицу. Пиксели сканируются заново,
+только когда меняются узлы до color или после него есть изменяющие узлы (размытие),
+а также при насыщенности, отличной от 1 (матрица смешивает каналы).
+"""
+import logging
+import math
+from utilities.edit_graph import EditGraph
+from utilities.image_processing import LUMA_WEIGHTS, brightness_contrast_table
+
+# Большая сторона копии исходника, по которой считается гистограмма
+HISTOGRAM_PROXY_SIDE = 256
+
+# Доля самых темных и самых светлых пикселей, не учитываемая автоуровнями (шум, блики)
+AUTO_LEVELS_CLIP = 0.005
+
+# Диапазон ползунков яркости и контрастности FilterTab
+AUTO_LEVELS_RANGE = (0.5, 2.0)
+
+def histogram_proxy(image, side=HISTOGRAM_PROXY_SIDE):
+    # Уменьшенная в целое число раз копия изображения (усреднение блоков пикселей)
+    if image.mode not in ("L", "LA", "RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+    factor = max(1, math.ceil(max(image.size) / side))
+    return image.reduce(factor) if factor > 1 else image
+
+def compute_histogram(image):
+    """
+    Гистограммы каналов изображения; альфа-канал не учитывается.
+
+    Returns:
+        dict: Канал ("R", "G", "B", "L") -> список из 256 счетчиков; для серых изображений только "L".
+    """
+    if image.mode in ("L", "LA"):
+        return {"L": image.getchannel(0).histogram()}
+    rgb_image = image.convert("RGB") if image.mode != "RGB" else image
+    counts = rgb_image.histogram()
+    return {"R": counts[:256], "G": counts[256:512], "B": counts[512:], "L": rgb_image.convert("L").histogram()}
+
+def remap_histogram(histogram, table):
+    # Гистограмма изображения после поканальной таблицы table (256 значений)
+    remapped = {}
+    for channel, counts in histogram.items():
+        result = [0] * 256
+        for value, count in enumerate(counts):
+            if count:
+                result[table[value]] += count
+        remapped[channel] = result
+    return remapped
+
+def pixel_count(histogram):
+    return sum(next(iter(histogram.values())))
+
+def color_table(histogram, brightness, contrast):
+    # Таблица яркости и контрастности, построенная по гистограмме, как в apply_color_adjustments
+    if "R" in histogram:
+        counts, color_bands = histogram["R"] + histogram["G"] + histogram["B"], 3
+    else:
+        counts, color_bands = histogram["L"], 1
+    return brightness_contrast_table(counts, pixel_count(histogram), color_bands, brightness, contrast)
+
+def percentile_level(counts, fraction):
+    # Наименьшее значение, не меньше которого доля fraction пикселей
+    threshold = sum(counts) * fraction
+    total = 0
+    for value, count in enumerate(counts):
+        total += count
+        if total > threshold:
+            return value
+    return 255
+
+def auto_levels(histogram, clip=AUTO_LEVELS_CLIP):
+    """
+    Яркость и контрастность, растягивающие диапазон яркости изображения на 0-255.
+
+    Таблица apply_color_adjustments переводит значение v в b * c * v + b * M * (1 - c),
+    где M - средняя яркость изображения. Значения b и c подбираются так, чтобы уровень
+    яркости, темнее которого доля clip пикселей, стал 0, а уровень, светлее которого
+    доля clip, стал 255; результат ограничивается диапазоном ползунков.
+
+    Args:
+        histogram (dict): Гистограмма изображения до цветокоррекции (compute_histogram).
+        clip (float): Доля отбрасываемых пикселей с каждой стороны.
+
+    Returns:
+        tuple: (brightness, contrast), округленные до сотых.
+    """
+    luma = histogram["L"]
+    low = percentile_level(luma, clip)
+    high = percentile_level(luma, 1.0 - clip)
+    count = pixel_count(histogram)
+    if "R" in histogram:
+        mean = sum(weight * sum(value * number for value, number in enumerate(histogram[channel])) / count
+                   for weight, channel in zip(LUMA_WEIGHTS, "RGB"))
+    else:
+        mean = sum(value * number for value, number in enumerate(luma)) / count
+    if high - low < 1 or mean <= low:
+        return 1.0, 1.0
+    gain = 255 / (high - low)
+    contrast = mean / (mean - low)
+    brightness = gain / contrast
+    low_limit, high_limit = AUTO_LEVELS_RANGE
+    contrast = min(max(contrast, low_limit), high_limit)
+    brightness = min(max(brightness, low_limit), high_limit)
+    logging.debug("Автоуровни: диапазон %d-%d, яркость %.2f, контрастность %.2f", low, high, brightness, contrast)
+    return round(brightness, 2), round(contrast, 2)
+
+class HistogramTracker:
+    """
+    Гистограмма результата графа правки с переносом через таблицу при изменении яркости и контрастности.
+
+    Запоминаются последняя гистограмма перед узлом color и последняя полностью
+    пересчитанная гистограмма, поэтому перемещение ползунков яркости и
+    контрастности не читает пиксели. scans - число подсчетов по пикселям.
+    """
+
+    def __init__(self, side=HISTOGRAM_PROXY_SIDE):
+        self.side = side
+        self.scans = 0
+        self._proxy = None
+        self._base = None
+        self._full = None
+
+    def proxy(self, source):
+        # Копия исходника для гистограммы; пересоздается при смене исходника
+        if self._proxy is None or self._proxy[0] is not source:
+            self._proxy = (source, histogram_proxy(source, self.side))
+        return self._proxy[1]
+
+    @staticmethod
+    def split(graph):
+        # Изменяющие растровые узлы: (узлы до color, узел color или None, узлы после color)
+        nodes = [node for node in graph.raster() if not node.is_neutral()]
+        for index, node in enumerate(nodes):
+            if node.kind == "color":
+                return nodes[:index], node, nodes[index + 1:]
+        return nodes, None, []
+
+    def _scan(self, source, source_key, nodes):
+        # Гистограмма копии исходника после узлов nodes (с запоминанием последнего результата)
+        key = (source_key, self.side, tuple(node.key() for node in nodes))
+        for cached in (self._base, self._full):
+            if cached is not None and cached[0] == key:
+                return cached[1], key
+        proxy = self.proxy(source)
+        image = EditGraph(nodes).evaluate(proxy, ("histogram", source_key), scale=proxy.width / source.width, quality="interactive")
+        self.scans += 1
+        return compute_histogram(image), key
+
+    def base_histogram(self, source, source_key, graph):
+        """Гистограмма изображения перед узлом color графа (для автоуровней)."""
+        prefix, _, _ = self.split(graph)
+        histogram, key = self._scan(source, source_key, prefix)
+        self._base = (key, histogram)
+        return histogram
+
+    def update(self, source, source_key, graph):
+        """
+        Гистограмма результата растровой части графа.
+
+        Args:
+            source (PIL.Image.Image): Исходное изображение документа.
+            source_key: Идентификатор содержимого source.
+            graph (EditGraph): Граф правки.
+
+        Returns:
+            dict: Гистограмма (compute_histogram).
+        """
+        prefix, color, suffix = self.split(graph)
+        base = self.base_histogram(source, source_key, graph)
+        if color is None:
+            return base
+        saturate = color["saturation"] != 1.0 and "R" in base
+        if suffix or saturate:
+            histogram, key = self._scan(source, source_key, prefix + [color] + suffix)
+            self._full = (key, histogram)
+            return histogram
+        return remap_histogram(base, color_table(base, color["brightness"], color["contrast"]))
@@ -0,0 +1,262 @@
+import collections
+import hashlib
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+from PIL import Image
+
+# Размер стороны плитки, на которые делятся снимки изображений в истории
+TILE_SIZE = 256
+
+class TilePool:
+    """
+    Общее хранилище плиток изображений с подсчетом ссылок.
+
+    Плитки адресуются по содержимому, поэтому одинаковые участки разных состояний
+    хранятся в памяти один раз.
+    """
+
+    def __init__(self):
+        self._tiles = {}
+        self.bytes_used = 0
+
+    def add(self, key, data):
+        # Добавление ссылки на плитку; данные сохраняются только для новой плитки
+        tile = self._tiles.get(key)
+        if tile is None:
+            self._tiles[key] = [data, 1]
+            self.bytes_used += len(data)
+        else:
+            tile[1] += 1
+        return key
+
+    def retain(self, key):
+        # Дополнительная ссылка на уже хранящуюся плитку
+        self._tiles[key][1] += 1
+        return key
+
+    def release(self, key):
+        # Освобождение ссылки; плитка удаляется, когда ссылок не осталось
+        tile = self._tiles[key]
+        tile[1] -= 1
+        if tile[1] == 0:
+            del self._tiles[key]
+            self.bytes_used -= len(tile[0])
+
+    def get(self, key):
+        # Данные плитки или None, если плитки нет в памяти
+        tile = self._tiles.get(key)
+        return tile[0] if tile else None
+
+    def __len__(self):
+        return len(self._tiles)
+
+class TiledSnapshot:
+    """Изображение, сохраненное как список ключей плиток в TilePool."""
+
+    __slots__ = ("mode", "size", "palette", "boxes", "keys")
+
+    def __init__(self, mode, size, palette, boxes, keys):
+        self.mode = mode
+        self.size = size
+        self.palette = palette
+        self.boxes = boxes
+        self.keys = keys
+
+    @classmethod
+    def encode(cls, image, pool, references=()):
+        """
+        Разбивает изображение на плитки, копируя в пул только изменившиеся.
+
+        Args:
+            image (PIL.Image.Image): Сохраняемое изображение.
+            pool (TilePool): Пул плиток.
+            references (iterable): Предыдущие снимки; совпадающие с ними плитки
+                переиспользуются без хеширования.
+
+        Returns:
+            TiledSnapshot: Снимок изображения.
+        """
+        width, height = image.size
+        boxes = [(x, y, min(x + TILE_SIZE, width), min(y + TILE_SIZE, height))
+                 for y in range(0, height, TILE_SIZE) for x in range(0, width, TILE_SIZE)]
+        references = [reference for reference in references
+                      if reference is not None and reference.mode == image.mode and reference.size == image.size]
+        palette = image.getpalette() if image.mode == "P" else None
+
+        keys = []
+        for index, box in enumerate(boxes):
+            data = image.crop(box).tobytes()
+            key = None
+            for reference in references:
+                reference_key = reference.keys[index]
+                if pool.get(reference_key) == data:
+                    key = pool.retain(reference_key)
+                    break
+            if key is None:
+                key = pool.add(hashlib.blake2b(data, digest_size=16).digest(), data)
+            keys.append(key)
+        return cls(image.mode, image.size, palette, boxes, keys)
+
+    def decode(self, tile_data):
+        # Сборка изображения из данных плиток
+        image = Image.new(self.mode, self.size)
+        for box, data in zip(self.boxes, tile_data):
+            tile = Image.frombytes(self.mode, (box[2] - box[0], box[3] - box[1]), data)
+            image.paste(tile, box[:2])
+        if self.palette is not None:
+            image.putpalette(self.palette)
+        return image
+
+    def release(self, pool):
+        # Освобождение всех плиток снимка
+        for key in self.keys:
+            pool.release(key)
+
+class Snapshot:
+    """
+    Отрендеренное изображение одной версии истории.
+
+    Плитки хранятся в общем пуле или, после выгрузки, в файле на диске.
+    Снимок, удаленный по лимиту памяти, возвращает None вместо изображения.
+    """
+
+    __slots__ = ("pool", "tiled", "spill_path")
+
+    def __init__(self, pool, tiled):
+        self.pool = pool
+        self.tiled = tiled
+        self.spill_path = None
+
+    def image(self):
+        # Сборка изображения из пула или из файла на диске; None, если снимок удален
+        if self.tiled is None:
+            return None
+        if self.spill_path:
+            with open(self.spill_path, "rb") as spill_file:
+                tile_data = pickle.load(spill_file)
+        else:
+            tile_data = [self.pool.get(key) for key in self.tiled.keys]
+        return self.tiled.decode(tile_data)
+
+    def in_memory(self):
+        return self.tiled is not None and not self.spill_path
+
+    def spill(self, directory):
+        # Выгрузка плиток снимка на диск с освобождением памяти; возвращает число байт
+        if not self.in_memory():
+            return 0
+        tile_data = [self.pool.get(key) for key in self.tiled.keys]
+        file_descriptor, path = tempfile.mkstemp(suffix=".history", dir=directory)
+        with os.fdopen(file_descriptor, "wb") as spill_file:
+            pickle.dump(tile_data, spill_file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.tiled.release(self.pool)
+        self.spill_path = path
+        return os.path.getsize(path)
+
+    def discard(self):
+        # Освобождение всех ресурсов снимка
+        if self.spill_path:
+            try:
+                os.remove(self.spill_path)
+            except OSError as e:
+                logging.warning(f"Не удалось удалить файл истории {self.spill_path}: {e}")
+            self.spill_path = None
+        elif self.tiled is not None:
+            self.tiled.release(self.pool)
+        self.tiled = None
+
+class SnapshotStore:
+    """
+    Снимки версий истории с копированием при записи на уровне плиток и лимитом памяти.
+
+    Изображение каждого снимка хранится как ссылки на общие плитки; копируются только
+    плитки, отличающиеся от предыдущего снимка. При превышении лимита байт самые
+    старые снимки выгружаются на диск (если выгрузка включена) или удаляются.
+    Одно хранилище может быть общим для историй нескольких документов.
+    """
+
+    def __init__(self, budget_bytes=None, spill_to_disk=False, spill_dir=None):
+        """
+        Args:
+            budget_bytes (int): Лимит памяти на плитки в байтах или None без лимита.
+            spill_to_disk (bool): Выгружать старые снимки на диск вместо удаления.
+            spill_dir (str): Каталог выгрузки; по умолчанию временный каталог
+                создается при первой выгрузке и удаляется в close().
+        """
+        self.budget_bytes = budget_bytes
+        self.spill_to_disk = spill_to_disk
+        self._spill_dir = spill_dir
+        self._owns_spill_dir = spill_dir is None
+        self.pool = TilePool()
+        self._snapshots = collections.OrderedDict()
+
+    @property
+    def spill_dir(self):
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix="photo_editor_history_")
+        return self._spill_dir
+
+    def add(self, image, reference=None):
+        """
+        Сохраняет изображение как новый снимок.
+
+        Args:
+            image (PIL.Image.Image): Сохраняемое изображение.
+            reference (Snapshot): Снимок, плитки которого переиспользуются, если совпадают
+                (обычно снимок предыдущей версии).
+
+        Returns:
+            Snapshot: Снимок изображения.
+        """
+        references = (reference.tiled,) if reference is not None and reference.in_memory() else ()
+        snapshot = Snapshot(self.pool, TiledSnapshot.encode(image, self.pool, references))
+        self._snapshots[id(snapshot)] = snapshot
+        self._enforce_budget()
+        return snapshot
+
+    def remove(self, snapshot):
+        # Удаление снимка (версия ушла из истории)
+        self._snapshots.pop(id(snapshot), None)
+        snapshot.discard()
+
+    def spill(self, snapshots):
+        # Выгрузка снимков на диск (например, истории неактивного документа); возвращает число байт
+        return sum(snapshot.spill(self.spill_dir) for snapshot in snapshots)
+
+    def memory_usage(self):
+        # Объем памяти, занятой плитками, в байтах
+        return self.pool.bytes_used
+
+    def disk_usage(self):
+        # Объем выгруженных на диск снимков в байтах
+        return sum(os.path.getsize(snapshot.spill_path) for snapshot in self._snapshots.values() if snapshot.spill_path)
+
+    def close(self):
+        # Удаление всех снимков и собственного каталога выгрузки (при выходе из приложения)
+        for snapshot in self._snapshots.values():
+            snapshot.discard()
+        self._snapshots.clear()
+        if self._owns_spill_dir and self._spill_dir is not None:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
+
+    def _enforce_budget(self):
+        # Выгрузка или удаление самых старых снимков до соблюдения лимита; последний остается в памяти
+        if self.budget_bytes is None:
+            return
+        for key, snapshot in list(self._snapshots.items())[:-1]:
+            if self.pool.bytes_used <= self.budget_bytes:
+                return
+            if self.spill_to_disk:
+                snapshot.spill(self.spill_dir)
+            else:
+                del self._snapshots[key]
+                snapshot.discard()
+        if self.pool.bytes_used > self.budget_bytes:
+            logging.debug(f"Лимит истории превышен последним снимком: {self.pool.bytes_used} байт")
+
+    def __len__(self):
+        return len(self._snapshots)
@@ -0,0 +1,177 @@
+"""
+Загрузка изображения в фоновом потоке с прогрессом, предпросмотром и отменой.
+
+LoadTask связывает поток загрузки с потоком Tk: поток загрузки записывает в задачу
+долю прочитанного файла и уменьшенный предпросмотр, а редактор периодически забирает
+их через after(). Чтение файла идет через обертку, которая перед каждым блоком
+проверяет флаг отмены, поэтому отмененная загрузка прекращает декодирование сразу,
+а не после чтения всего файла.
+
+Для JPEG предпросмотр появляется до окончания декодирования: это декодирование
+в уменьшенном масштабе (draft). Остальные форматы показываются после загрузки
+с индикатором прогресса: частично декодированные пиксели публичным API Pillow недоступны.
+"""
+import logging
+import os
+import threading
+from utilities.image_processing import resample
+from utilities.profiling import timed
+from utilities.tiled_image import TiledImage, open_image
+
+class LoadCancelled(Exception):
+    """Загрузка отменена новой загрузкой или переключением документа."""
+
+class LoadTask:
+    """
+    Одна фоновая загрузка файла.
+
+    Поля progress (доля прочитанного файла от 0 до 1 или None, если она неизвестна)
+    и предпросмотр записываются потоком загрузки и читаются потоком Tk.
+    """
+
+    def __init__(self, path, canvas_size):
+        """
+        Args:
+            path (str): Путь к файлу изображения.
+            canvas_size (tuple): Размер холста, под который строятся предпросмотр и первый кадр.
+        """
+        self.path = path
+        self.canvas_size = canvas_size
+        self.progress = 0.0
+        self._preview = None
+        self._file_size = None
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def check(self):
+        # Прерывание загрузки в потоке загрузки, если она отменена
+        if self._cancelled.is_set():
+            raise LoadCancelled(self.path)
+
+    def post_preview(self, image):
+        # Новый предпросмотр для потока Tk (заменяет еще не показанный)
+        with self._lock:
+            self._preview = image
+
+    def take_preview(self):
+        # Предпросмотр, появившийся после предыдущего вызова, или None
+        with self._lock:
+            preview, self._preview = self._preview, None
+        return preview
+
+    def watch(self, image):
+        """
+        Подключает отслеживание чтения к открытому, но еще не декодированному изображению.
+
+        Файл изображения заменяется оберткой, которая обновляет progress и проверяет отмену.
+        """
+        file_object = getattr(image, "fp", None)
+        if file_object is None:
+            return
+        try:
+            self._file_size = os.fstat(file_object.fileno()).st_size
+        except (AttributeError, OSError, ValueError):
+            self._file_size = None
+        image.fp = _ProgressReader(file_object, self)
+
+    def _on_read(self, position):
+        # Вызывается оберткой файла из потока загрузки перед чтением очередного блока
+        self.check()
+        if self._file_size:
+            self.progress = min(position / self._file_size, 1.0)
+
+class _ProgressReader:
+    """Обертка файла изображения: отмена и прогресс перед каждым чтением."""
+
+    def __init__(self, file_object, task):
+        self._file = file_object
+        self._task = task
+
+    def read(self, size=-1):
+        self._task._on_read(self._file.tell())
+        return self._file.read(size)
+
+    def __getattr__(self, name):
+        # seek, tell, fileno, close и остальное - без изменений
+        return getattr(self._file, name)
+
+class LoadedImage:
+    """Результат фоновой загрузки, готовый к передаче редактору."""
+
+    __slots__ = ("path", "image", "original_image", "tiled_image", "display_image")
+
+    def __init__(self, path, image, original_image, tiled_image, display_image):
+        self.path = path
+        self.image = image
+        self.original_image = original_image
+        self.tiled_image = tiled_image
+        # Изображение, уменьшенное под холст LoadTask.canvas_size (первый кадр без пересчета)
+        self.display_image = display_image
+
+def fit_size(size, canvas_size):
+    # Размер изображения size, вписанного в холст (без увеличения), как в PhotoEditor.update_display_image
+    scale = min(canvas_size[0] / size[0], canvas_size[1] / size[1], 1.0)
+    return int(size[0] * scale), int(size[1] * scale)
+
+def fit_to_canvas(image, canvas_size, quality="final"):
+    # Изображение, уменьшенное под холст
+    width, height = fit_size(image.size, canvas_size)
+    size = (max(1, width), max(1, height))
+    if size == image.size:
+        return image
+    return resample(image, size, quality)
+
+@timed("load")
+def load_document_image(task, tiled_pixels, working_side):
+    """
+    Загружает изображение для нового документа в потоке загрузки.
+
+    Args:
+        task (LoadTask): Задача загрузки.
+        tiled_pixels (int): Изображения от этого числа пикселей открываются через TiledImage.
+        working_side (int): Большая сторона рабочей копии для TiledImage.
+
+    Returns:
+        LoadedImage: Декодированное изображение, его копия для рендера и первый кадр.
+
+    Raises:
+        LoadCancelled: Если задача отменена.
+    """
+    image = open_image(task.path)
+    tiled_image = None
+    if image.width * image.height >= tiled_pixels:
+        # Очень большое изображение: полное разрешение читается по плиткам по требованию
+        logging.info("Изображение %s открыто через плиточный движок", image.size)
+        image.close()
+        task.progress = None
+        tiled_image = TiledImage(task.path)
+        task.check()
+        image = tiled_image.reduced(working_side)
+    else:
+        if image.format == "JPEG":
+            _post_draft_preview(task, image.size)
+        task.check()
+        task.watch(image)
+        image.load()
+        task.progress = 1.0
+    task.check()
+    original_image = image.copy()
+    display_image = fit_to_canvas(image, task.canvas_size)
+    return LoadedImage(task.path, image, original_image, tiled_image, display_image)
+
+def _post_draft_preview(task, full_size):
+    # Первый кадр JPEG из декодирования в уменьшенном масштабе (1/2, 1/4 или 1/8)
+    with open_image(task.path) as draft:
+        draft.draft(draft.mode, fit_size(full_size, task.canvas_size))
+        if draft.size == full_size:
+            return
+        draft.load()
+        logging.info("Черновое декодирование JPEG: %s из %s", draft.size, full_size)
+        task.post_preview(fit_to_canvas(draft, task.canvas_size, "interactive"))
@@ -0,0 +1,132 @@
+"""
+Параллельная обработка одного изображения горизонтальными полосами.
+
+Изображение делится на полосы по числу потоков, каждая полоса обрабатывается в
+пуле потоков, и результаты вклеиваются в итоговое изображение. Pillow отпускает GIL
+на время своих циклов на C (point, convert, filter, crop, paste), поэтому полосы
+действительно обрабатываются на разных ядрах.
+
+Поканальные операции (таблицы, цветовые матрицы) применяются к полосам независимо.
+Для фильтров с окрестностью (размытие) полоса берется с полями halo строк сверху и
+снизу, которые после обработки отрезаются, поэтому результат совпадает с обработкой
+всего изображения.
+
+Число потоков задается переменной окружения PHOTO_EDITOR_WORKERS или set_worker_count();
+1 - обработка без пула.
+"""
+import logging
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+# Изображения меньше этого числа пикселей обрабатываются целиком: накладные расходы
+# на полосы сравнимы с самой обработкой
+MIN_PARALLEL_PIXELS = 1 << 20
+
+# Минимальная высота полосы в строках (без полей)
+MIN_BAND_ROWS = 64
+
+_worker_count = None
+_executor = None
+_executor_lock = threading.Lock()
+
+def _default_worker_count():
+    value = os.environ.get("PHOTO_EDITOR_WORKERS")
+    if value:
+        try:
+            return max(1, int(value))
+        except ValueError:
+            logging.warning("Некорректное значение PHOTO_EDITOR_WORKERS: %s", value)
+    return os.cpu_count() or 1
+
+def get_worker_count():
+    # Текущее число потоков обработки
+    global _worker_count
+    if _worker_count is None:
+        _worker_count = _default_worker_count()
+    return _worker_count
+
+def set_worker_count(count=None):
+    """
+    Задает число потоков обработки; None - значение по умолчанию
+    (PHOTO_EDITOR_WORKERS или число ядер). Текущий пул закрывается.
+    """
+    global _worker_count, _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+        _worker_count = _default_worker_count() if count is None else max(1, int(count))
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=get_worker_count(), thread_name_prefix="band")
+        return _executor
+
+def band_boxes(image, workers=None):
+    # Области полос (0, top, width, bottom): по одной на поток, не ниже MIN_BAND_ROWS строк
+    workers = get_worker_count() if workers is None else workers
+    count = max(1, min(workers, image.height // MIN_BAND_ROWS))
+    return [(0, image.height * index // count, image.width, image.height * (index + 1) // count) for index in range(count)]
+
+def should_split(image):
+    # True, если изображение стоит обрабатывать полосами
+    return get_worker_count() > 1 and image.width * image.height >= MIN_PARALLEL_PIXELS and image.height >= 2 * MIN_BAND_ROWS
+
+def map_bands(image, function, halo=0):
+    """
+    Применяет function к изображению по горизонтальным полосам в пуле потоков.
+
+    Args:
+        image (PIL.Image.Image): Исходное изображение.
+        function (callable): Обработка полосы: принимает изображение полосы (с полями)
+            и возвращает изображение того же размера; режим результата у всех полос одинаков.
+        halo (int): Число строк окрестности, нужных function сверху и снизу.
+
+    Returns:
+        PIL.Image.Image: Результат того же размера, что и image.
+    """
+    boxes = band_boxes(image)
+    if len(boxes) == 1:
+        return function(image)
+
+    def process(box):
+        top = max(0, box[1] - halo)
+        bottom = min(image.height, box[3] + halo)
+        result = function(image.crop((0, top, image.width, bottom)))
+        if top != box[1] or bottom != box[3]:
+            result = result.crop((0, box[1] - top, image.width, box[3] - top))
+        return result
+
+    output = None
+    # Полосы вклеиваются по мере готовности, пока остальные еще обрабатываются
+    for box, band in zip(boxes, _get_executor().map(process, boxes)):
+        if output is None:
+            output = Image.new(band.mode, image.size)
+        output.paste(band, box)
+    if image.mode == "P" and output.mode == "P":
+        output.putpalette(image.getpalette())
+    return output
+
+def histogram(image):
+    # Гистограмма изображения, посчитанная по полосам параллельно
+    if not should_split(image):
+        return image.histogram()
+    boxes = band_boxes(image)
+    total = None
+    for band_histogram in _get_executor().map(lambda box: image.crop(box).histogram(), boxes):
+        total = band_histogram if total is None else [a + b for a, b in zip(total, band_histogram)]
+    return total
+
+def blur_halo(radius):
+    """
+    Ширина полей для размытия по Гауссу радиуса radius.
+
+    GaussianBlur в Pillow - три прохода скользящего среднего, каждый из которых
+    расширяет окрестность не более чем на ceil(radius) + 1 пикселей.
+    """
+    return 3 * (math.ceil(radius) + 1)
@@ -0,0 +1,235 @@
+"""
+Именованные интервалы времени (spans) для основных операций редактора.
+
+Пример:
+    with span("blur", radius=radius):
+        image = image.filter(...)
+
+Пока профилирование выключено, span() возвращает общий пустой контекстный менеджер,
+и накладные расходы сводятся к одной проверке флага. Во включенном состоянии
+длительности собираются в гистограммы по имени интервала и в журнал событий,
+который экспортируется в формат Chrome trace-event (chrome://tracing, Perfetto).
+По запросу одно следующее действие выполняется под cProfile.
+"""
+import bisect
+import collections
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+
+# Границы корзин гистограммы в секундах: от 10 мкс до ~170 с с шагом в 2 раза
+HISTOGRAM_BOUNDS = tuple(1e-5 * 2 ** index for index in range(25))
+
+# Максимальное число событий в журнале трассировки; старые события вытесняются
+MAX_TRACE_EVENTS = 200000
+
+_enabled = False
+_lock = threading.Lock()
+_histograms = {}
+_events = collections.deque(maxlen=MAX_TRACE_EVENTS)
+_profile_request = None
+_local = threading.local()
+_origin = time.perf_counter()
+
+class Histogram:
+    """Гистограмма длительностей с логарифмическими корзинами."""
+
+    __slots__ = ("counts", "count", "total", "minimum", "maximum")
+
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(HISTOGRAM_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.minimum = seconds if self.minimum is None else min(self.minimum, seconds)
+        self.maximum = max(self.maximum, seconds)
+
+    def percentile(self, percent):
+        # Оценка перцентиля сверху: граница корзины, в которую он попадает
+        if not self.count:
+            return None
+        rank = self.count * percent / 100
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                return min(HISTOGRAM_BOUNDS[index] if index < len(HISTOGRAM_BOUNDS) else self.maximum, self.maximum)
+        return self.maximum
+
+    def summary(self):
+        return {"count": self.count, "total": self.total, "mean": self.total / self.count if self.count else None,
+                "min": self.minimum, "max": self.maximum,
+                "p50": self.percentile(50), "p90": self.percentile(90), "p99": self.percentile(99)}
+
+class _NullSpan:
+    # Пустой интервал для выключенного профилирования
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ("name", "args", "started", "profiler", "profile_path")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.profiler = None
+        self.profile_path = None
+
+    def __enter__(self):
+        depth = getattr(_local, "depth", 0)
+        _local.depth = depth + 1
+        # Запрошенный cProfile запускается на первом внешнем интервале подходящего имени
+        if depth == 0 and _profile_request is not None:
+            self._start_profile()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        finished = time.perf_counter()
+        _local.depth -= 1
+        if self.profiler is not None:
+            self._finish_profile()
+        _record(self.name, self.started, finished, self.args)
+        return False
+
+    def _start_profile(self):
+        global _profile_request
+        with _lock:
+            request = _profile_request
+            if request is None or (request[0] is not None and request[0] != self.name):
+                return
+            _profile_request = None
+        self.profile_path = request[1]
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def _finish_profile(self):
+        self.profiler.disable()
+        stream = io.StringIO()
+        statistics = pstats.Stats(self.profiler, stream=stream).sort_stats("cumulative")
+        statistics.print_stats(25)
+        if self.profile_path:
+            statistics.dump_stats(self.profile_path)
+        logging.info("Профиль операции %s%s:\n%s", self.name, f" сохранен в {self.profile_path}" if self.profile_path else "", stream.getvalue())
+
+def _record(name, started, finished, args):
+    # Добавление длительности в гистограмму и событие в журнал трассировки
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.add(finished - started)
+        event = {"name": name, "ph": "X", "ts": (started - _origin) * 1e6, "dur": (finished - started) * 1e6,
+                 "pid": os.getpid(), "tid": threading.get_ident()}
+        if args:
+            event["args"] = args
+        _events.append(event)
+
+def span(name, **args):
+    """
+    Интервал времени с именем name; используется как контекстный менеджер.
+
+    Args:
+        name (str): Имя операции (load, adjust, resize, blur, display, redraw, history, save...).
+        **args: Дополнительные сведения для события трассировки.
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+def timed(name):
+    # Декоратор: весь вызов функции - интервал name
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with _Span(name, None):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def enable():
+    # Включение сбора интервалов
+    global _enabled
+    _enabled = True
+
+def disable():
+    # Выключение сбора интервалов; собранные данные сохраняются
+    global _enabled
+    _enabled = False
+
+def is_enabled():
+    return _enabled
+
+def reset():
+    # Удаление собранных гистограмм, событий и запроса профиля
+    global _profile_request
+    with _lock:
+        _histograms.clear()
+        _events.clear()
+        _profile_request = None
+
+def profile_next(span_name=None, output_path=None):
+    """
+    Запрашивает cProfile для следующего действия.
+
+    Следующий внешний интервал с именем span_name (или любой, если None) выполняется
+    под cProfile; сводка пишется в журнал, а при заданном output_path профиль
+    сохраняется в файл для pstats/snakeviz. Включает сбор интервалов.
+    """
+    global _profile_request
+    with _lock:
+        _profile_request = (span_name, output_path)
+    enable()
+
+def summary():
+    # Сводка по именам интервалов: число, суммарное и среднее время, перцентили
+    with _lock:
+        return {name: histogram.summary() for name, histogram in sorted(_histograms.items())}
+
+def format_summary():
+    # Сводка в виде текстовой таблицы
+    lines = [f"{'Операция':<16} {'Число':>7} {'Всего, мс':>11} {'p50, мс':>9} {'p90, мс':>9} {'p99, мс':>9} {'Макс, мс':>9}"]
+    for name, stats in summary().items():
+        lines.append(f"{name:<16} {stats['count']:>7} {stats['total'] * 1000:>11.1f} {stats['p50'] * 1000:>9.2f} "
+                     f"{stats['p90'] * 1000:>9.2f} {stats['p99'] * 1000:>9.2f} {stats['max'] * 1000:>9.2f}")
+    return "\n".join(lines)
+
+def export_chrome_trace(path):
+    """
+    Сохраняет собранные события в формате Chrome trace-event JSON.
+
+    Args:
+        path (str): Путь к файлу трассировки.
+
+    Returns:
+        int: Число сохраненных событий.
+    """
+    with _lock:
+        events = list(_events)
+    thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+    metadata = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": thread_names.get(tid, str(tid))}}
+                for tid in sorted({event["tid"] for event in events})]
+    with open(path, "w", encoding="utf-8") as trace_file:
+        json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, trace_file, ensure_ascii=False)
+    return len(events)
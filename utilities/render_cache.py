@@ -0,0 +1,73 @@
+import collections
+import threading
+
+# Число байт на пиксель для распространенных режимов изображения
+BYTES_PER_PIXEL = {"1": 1, "L": 1, "P": 1, "LA": 2, "PA": 2, "RGB": 3, "YCbCr": 3, "LAB": 3, "HSV": 3,
+                   "RGBA": 4, "RGBX": 4, "CMYK": 4, "I": 4, "F": 4, "I;16": 2}
+
+def image_nbytes(image):
+    # Примерный объем памяти пикселей изображения в байтах
+    return image.width * image.height * BYTES_PER_PIXEL.get(image.mode, 4)
+
+class RenderCache:
+    """
+    LRU-кэш результатов рендера, ограниченный объемом в байтах.
+
+    Ключи - кортежи параметров рендера, значения - изображения PIL. Возвращаемые
+    изображения общие для всех обращений и не должны изменяться на месте.
+    Безопасен для одновременного использования из потока Tk и потока рендера.
+    """
+
+    def __init__(self, max_bytes):
+        """
+        Args:
+            max_bytes (int): Максимальный суммарный объем изображений в кэше.
+        """
+        self.max_bytes = max_bytes
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        # Изображение по ключу или None; найденная запись становится самой свежей
+        with self._lock:
+            image = self._entries.get(key)
+            if image is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return image
+
+    def put(self, key, image):
+        # Добавление изображения с вытеснением давно не использованных записей
+        size = image_nbytes(image)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes_used -= image_nbytes(previous)
+            self._entries[key] = image
+            self.bytes_used += size
+            while self.bytes_used > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes_used -= image_nbytes(evicted)
+
+    def clear(self):
+        # Очистка кэша со сбросом счетчиков
+        with self._lock:
+            self._entries.clear()
+            self.bytes_used = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        # Счетчики попаданий и промахов и текущий объем
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "bytes": self.bytes_used}
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,126 @@
+import logging
+import threading
+
+class RenderScheduler:
+    """
+    Фоновый рендер с принципом "побеждает последний запрос".
+
+    Запросы выполняются в отдельном потоке; если во время рендера поступило несколько
+    новых запросов, выполняется только самый свежий, остальные отбрасываются.
+    Результат передается обратно в цикл событий Tk через after() и применяется,
+    только если версия документа не изменилась (например, после отмены/повтора).
+    """
+
+    def __init__(self, root, get_version, poll_interval=15):
+        """
+        Args:
+            root: Корневое окно Tk, в цикле событий которого вызываются обработчики результата.
+            get_version (callable): Функция, возвращающая текущую версию документа.
+            poll_interval (int): Интервал проверки готовых результатов в миллисекундах.
+        """
+        self.root = root
+        self.get_version = get_version
+        self.poll_interval = poll_interval
+
+        self._condition = threading.Condition()
+        self._generation = 0
+        self._cancelled_generation = 0
+        self._delivered_generation = 0
+        self._pending = None
+        self._result = None
+        self._busy = False
+        self._polling = False
+        self._thread = None
+
+    def submit(self, render, on_done, version, on_error=None):
+        """
+        Ставит рендер в очередь, заменяя еще не начатый предыдущий запрос.
+
+        Args:
+            render (callable): Функция без аргументов, выполняющая рендер в фоновом потоке.
+            on_done (callable): Обработчик результата, вызывается в потоке Tk.
+            version (int): Версия документа, для которой выполняется рендер.
+            on_error (callable): Обработчик исключения рендера, вызывается в потоке Tk;
+                по умолчанию ошибка только записывается в журнал.
+        """
+        with self._condition:
+            self._generation += 1
+            if self._pending is not None:
+                logging.debug("Отброшен устаревший запрос рендера")
+            self._pending = (self._generation, version, render, on_done, on_error)
+            self._condition.notify()
+        self._ensure_thread()
+        self._schedule_poll()
+
+    def cancel(self):
+        # Отмена всех запросов: ожидающих, выполняющихся и готовых, но еще не примененных
+        with self._condition:
+            self._cancelled_generation = self._generation
+            self._pending = None
+            self._result = None
+
+    def is_idle(self):
+        # True, если нет ни ожидающих, ни выполняющихся, ни непримененных запросов
+        with self._condition:
+            return self._pending is None and not self._busy and self._result is None
+
+    def _ensure_thread(self):
+        # Ленивый запуск фонового потока
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="render-worker", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        # Цикл фонового потока: всегда берется самый свежий запрос
+        while True:
+            with self._condition:
+                while self._pending is None:
+                    self._condition.wait()
+                generation, version, render, on_done, on_error = self._pending
+                self._pending = None
+                self._busy = True
+            try:
+                result = render()
+                error = None
+            except Exception as e:
+                result = None
+                error = e
+            with self._condition:
+                self._busy = False
+                if generation > self._cancelled_generation and (self._result is None or self._result[0] < generation):
+                    self._result = (generation, version, on_done, on_error, result, error)
+
+    def _schedule_poll(self):
+        # Запуск периодической проверки результатов в потоке Tk
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_interval, self._poll)
+
+    def _poll(self):
+        # Применение готового результата в потоке Tk
+        with self._condition:
+            completed = self._result
+            self._result = None
+            idle = self._pending is None and not self._busy
+        if completed:
+            self._deliver(*completed)
+        if idle and completed is None:
+            self._polling = False
+        else:
+            self.root.after(self.poll_interval, self._poll)
+
+    def _deliver(self, generation, version, on_done, on_error, result, error):
+        # Передача результата, если он не устарел
+        if generation <= self._cancelled_generation or generation <= self._delivered_generation:
+            return
+        if version != self.get_version():
+            logging.debug("Результат рендера для версии %s отброшен, текущая версия %s", version, self.get_version())
+            return
+        self._delivered_generation = generation
+        if error is not None:
+            if on_error is not None:
+                on_error(error)
+            else:
+                logging.error(f"Ошибка фонового рендера: {error}")
+            return
+        on_done(result)
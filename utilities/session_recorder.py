@@ -0,0 +1,316 @@
+"""
+Запись действий пользователя в файл сессии и воспроизведение без экрана.
+
+SessionRecorder подменяет на время записи методы PhotoEditor, EditTab, FilterTab и
+DrawTab, через которые проходят действия пользователя (ползунки, рисование, текст,
+отмена/повтор, обрезка, изменение размера окна), и сохраняет для каждого вызова
+значения, нужные для его повторения. Записываются только внешние вызовы: например,
+update_brightness записывается, а вызываемый из него apply_adjustments - нет.
+
+replay_session() выполняет те же вызовы на редакторе без экрана
+(utilities.headless) и измеряет для каждого события задержку от ввода до пикселей:
+время до момента, когда фоновые рендеры завершены и результат выведен на холст.
+
+Пример:
+    PHOTO_EDITOR_RECORD=drag.json python main.py
+    python -m benchmarks replay drag.json --realtime
+"""
+import json
+import logging
+import os
+import time
+from PIL import Image
+
+# Формат файла сессии; меняется при несовместимых изменениях
+SESSION_VERSION = 1
+
+# Записываемые методы: цель -> {метод: способ записи}
+# slider - значение ползунка перед вызовом; pointer - координаты события мыши;
+# call - вызов без аргументов; path, resize, angle, color, text - см. _capture
+RECORDED_METHODS = {
+    "editor": {
+        "load_image": ("path",),
+        "undo": ("call",),
+        "redo": ("call",),
+        "start_area_selection": ("call",),
+        "get_selection_start_pos": ("pointer",),
+        "update_selection": ("pointer",),
+        "finalize_selection": ("pointer",),
+        "on_canvas_resize": ("resize",),
+    },
+    "edit_tab": {
+        "update_width": ("slider", "width_scale"),
+        "update_height": ("slider", "height_scale"),
+        "save_width": ("pointer",),
+        "save_height": ("pointer",),
+        "apply_rotation": ("angle",),
+    },
+    "filter_tab": {
+        "update_brightness": ("slider", "brightness_scale"),
+        "update_contrast": ("slider", "contrast_scale"),
+        "update_saturation": ("slider", "saturation_scale"),
+        "update_blur": ("slider", "blur_scale"),
+        "save_brightness": ("pointer",),
+        "save_contrast": ("pointer",),
+        "save_saturation": ("pointer",),
+        "save_blur": ("pointer",),
+    },
+    "draw_tab": {
+        "update_brush_size": ("slider", "brush_size_scale"),
+        "choose_color": ("color",),
+        "toggle_drawing": ("call",),
+        "paint": ("pointer",),
+        "reset": ("pointer",),
+        "add_text": ("text",),
+        "select_text": ("pointer",),
+        "drag_text": ("pointer",),
+        "release_text": ("pointer",),
+    },
+}
+
+def _target_classes():
+    # Классы целей (импорт откладывается: модули интерфейса тянут tkinter)
+    from photo_editor import PhotoEditor
+    from gui.edit_tab import EditTab
+    from gui.filter_tab import FilterTab
+    from gui.draw_tab import DrawTab
+    return {"editor": PhotoEditor, "edit_tab": EditTab, "filter_tab": FilterTab, "draw_tab": DrawTab}
+
+class SessionRecorder:
+    """
+    Запись действий пользователя.
+
+    install() подменяет методы классов, поэтому вызывается до создания PhotoEditor:
+    вкладки привязывают свои методы к виджетам при создании.
+    """
+
+    def __init__(self):
+        self.events = []
+        self.canvas_size = None
+        self.source = None
+        self.recording = False
+        self._originals = {}
+        self._depth = 0
+        self._started = None
+
+    def install(self):
+        # Подмена записываемых методов; запись начинается сразу
+        if self._originals:
+            return self
+        for target, cls in _target_classes().items():
+            for method_name, spec in RECORDED_METHODS[target].items():
+                original = cls.__dict__[method_name]
+                self._originals[(cls, method_name)] = original
+                setattr(cls, method_name, self._wrap(target, method_name, spec, original))
+        self.start()
+        return self
+
+    def uninstall(self):
+        # Восстановление исходных методов
+        self.stop()
+        for (cls, method_name), original in self._originals.items():
+            setattr(cls, method_name, original)
+        self._originals.clear()
+
+    def start(self):
+        self.recording = True
+        if self._started is None:
+            self._started = time.perf_counter()
+
+    def stop(self):
+        self.recording = False
+
+    def _wrap(self, target, method_name, spec, original):
+        recorder = self
+
+        def wrapper(instance, *args, **kwargs):
+            if not recorder.recording or recorder._depth:
+                return original(instance, *args, **kwargs)
+            editor = instance if target == "editor" else instance.editor
+            event = {"time": round(time.perf_counter() - recorder._started, 6), "target": target, "method": method_name}
+            event.update(_capture_before(spec, instance, args))
+            recorder._depth += 1
+            try:
+                result = original(instance, *args, **kwargs)
+            finally:
+                recorder._depth -= 1
+            event.update(_capture_after(spec, instance))
+            recorder._record(editor, event)
+            return result
+
+        wrapper.__name__ = original.__name__
+        wrapper.__doc__ = original.__doc__
+        wrapper.__wrapped__ = original
+        return wrapper
+
+    def _record(self, editor, event):
+        if self.canvas_size is None:
+            canvas = getattr(editor, "image_canvas", None)
+            if canvas is not None:
+                self.canvas_size = (canvas.winfo_width(), canvas.winfo_height())
+        if self.source is None and not self.events and getattr(editor, "image", None) is not None and event["method"] != "load_image":
+            # Запись начата с уже открытым изображением
+            self.source = {"path": getattr(editor, "image_path", None), "size": list(editor.image.size), "mode": editor.image.mode}
+        self.events.append(event)
+
+    def to_dict(self):
+        return {"version": SESSION_VERSION, "canvas": list(self.canvas_size) if self.canvas_size else None,
+                "source": self.source, "events": self.events}
+
+    def save(self, path):
+        # Сохранение сессии в JSON
+        with open(path, "w", encoding="utf-8") as session_file:
+            json.dump(self.to_dict(), session_file, ensure_ascii=False, indent=1)
+        logging.info("Сессия из %d событий сохранена в %s", len(self.events), path)
+
+def _capture_before(spec, instance, args):
+    # Значения, известные до вызова: ползунок, координаты, путь, размер окна, угол
+    kind = spec[0]
+    event = args[0] if args else None
+    if kind == "slider":
+        return {"value": float(getattr(instance, spec[1]).get())}
+    if kind == "pointer":
+        if event is None:
+            return {"x": None, "y": None}
+        return {"x": event.x, "y": event.y}
+    if kind == "resize":
+        return {"width": event.width, "height": event.height}
+    if kind == "path":
+        captured = {"path": os.path.abspath(args[0])}
+        try:
+            with Image.open(args[0]) as image:
+                captured.update(size=list(image.size), mode=image.mode)
+        except Exception:
+            pass
+        return captured
+    if kind == "angle":
+        return {"angle": instance.angle_entry.get()}
+    return {}
+
+def _capture_after(spec, instance):
+    # Значения, которые известны только после вызова: ответы диалогов
+    kind = spec[0]
+    if kind == "color":
+        return {"color": instance.color}
+    if kind == "text":
+        item = instance.text_items[-1] if instance.text_items else None
+        if item is None:
+            return {"item": None}
+        return {"item": {key: value for key, value in item.items() if key != "id"}}
+    return {}
+
+def load_session(path):
+    # Чтение файла сессии
+    with open(path, encoding="utf-8") as session_file:
+        session = json.load(session_file)
+    if session.get("version") != SESSION_VERSION:
+        raise ValueError(f"Неподдерживаемая версия файла сессии: {session.get('version')}")
+    return session
+
+def _stand_in_image(size, mode):
+    # Заменитель отсутствующего файла: градиент того же размера и режима
+    return Image.linear_gradient("L").resize(tuple(size), Image.BILINEAR).convert(mode)
+
+def _open_source(editor, source, image=None):
+    from utilities.headless import open_document
+    if image is None and source.get("path") and os.path.exists(source["path"]):
+        image = Image.open(source["path"])
+        image.load()
+    if image is None:
+        image = _stand_in_image(source["size"], source["mode"])
+    open_document(editor, image, source.get("path") or "<memory>")
+
+def _replay_event(editor, event, images):
+    # Повторение одного вызова на редакторе без экрана
+    from utilities.headless import HeadlessCombobox, HeadlessEvent
+    target = editor if event["target"] == "editor" else getattr(editor, event["target"])
+    method = getattr(target, event["method"])
+    kind = RECORDED_METHODS[event["target"]][event["method"]][0]
+    if kind == "slider":
+        getattr(target, RECORDED_METHODS[event["target"]][event["method"]][1]).set(event["value"])
+        method(None)
+    elif kind == "pointer":
+        method(None if event["x"] is None else HeadlessEvent(event["x"], event["y"]))
+    elif kind == "call":
+        method()
+    elif kind == "resize":
+        editor.image_canvas.width, editor.image_canvas.height = event["width"], event["height"]
+        method(HeadlessEvent())
+    elif kind == "path":
+        replacement = images.get(event["path"])
+        if replacement is None and os.path.exists(event["path"]):
+            method(event["path"])
+        else:
+            _open_source(editor, {"path": event["path"], "size": event.get("size", (1000, 750)), "mode": event.get("mode", "RGB")}, replacement)
+    elif kind == "angle":
+        target.angle_entry = HeadlessCombobox(event["angle"])
+        method()
+    elif kind == "color":
+        if event["color"] is not None:
+            target.color = event["color"]
+    elif kind == "text":
+        # Диалог ввода текста заменяется записанным ответом
+        if event["item"] is not None:
+            target.text_items.append(dict(event["item"], id=None))
+            target.update_text_on_canvas(target.text_items[-1])
+            target.save_history()
+
+def _is_settled(editor):
+    # Все фоновые рендеры и отложенная перерисовка завершены, результат выведен
+    return (editor.render_scheduler.is_idle() and editor.load_scheduler.is_idle() and editor.load_task is None
+            and editor.resize_settle_job is None)
+
+def replay_session(session, image=None, images=None, realtime=False, settle_timeout=60.0):
+    """
+    Воспроизводит сессию на редакторе без экрана.
+
+    Args:
+        session (dict): Сессия из load_session() или SessionRecorder.to_dict().
+        image (PIL.Image.Image): Изображение вместо исходного, если запись начата с открытым файлом.
+        images (dict): Изображения вместо файлов, открытых во время записи: путь -> изображение.
+        realtime (bool): Соблюдать интервалы между событиями, как при записи.
+        settle_timeout (float): Максимальное ожидание вывода результата одного события в секундах.
+
+    Returns:
+        tuple: (editor, results), где results - список словарей с полями index, target,
+        method, handler_ms (синхронная часть обработчика) и latency_ms (до вывода пикселей;
+        None, если результат не получен за settle_timeout).
+    """
+    from utilities.headless import create_editor
+    editor = create_editor(tuple(session["canvas"]) if session.get("canvas") else (1000, 700))
+    images = {os.path.abspath(path): value for path, value in (images or {}).items()}
+    if session.get("source") or image is not None:
+        _open_source(editor, session.get("source") or {"path": None}, image)
+        editor.root.run_until(lambda: _is_settled(editor), settle_timeout)
+
+    results = []
+    started = time.perf_counter()
+    for index, event in enumerate(session["events"]):
+        if realtime:
+            due = started + event["time"]
+            while time.perf_counter() < due:
+                editor.root.update()
+                time.sleep(0.001)
+        event_started = time.perf_counter()
+        _replay_event(editor, event, images)
+        handled = time.perf_counter()
+        settled = editor.root.run_until(lambda: _is_settled(editor), settle_timeout)
+        finished = time.perf_counter()
+        results.append({"index": index, "target": event["target"], "method": event["method"],
+                        "handler_ms": (handled - event_started) * 1000,
+                        "latency_ms": (finished - event_started) * 1000 if settled else None})
+    return editor, results
+
+def summarize_latency(results):
+    # Перцентили задержки по методам: метод -> {count, p50_ms, p90_ms, p99_ms, max_ms}
+    by_method = {}
+    for result in results:
+        if result["latency_ms"] is not None:
+            by_method.setdefault(f"{result['target']}.{result['method']}", []).append(result["latency_ms"])
+    summary = {}
+    for name, latencies in sorted(by_method.items()):
+        latencies.sort()
+        summary[name] = {"count": len(latencies), "max_ms": latencies[-1]}
+        for percent in (50, 90, 99):
+            summary[name][f"p{percent}_ms"] = latencies[min(len(latencies) - 1, int(len(latencies) * percent / 100))]
+    return summary
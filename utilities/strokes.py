@@ -0,0 +1,128 @@
+from array import array
+
+# Допуск упрощения штриха по умолчанию в пикселях изображения
+DEFAULT_SIMPLIFY_TOLERANCE = 0.5
+
+class Stroke:
+    """
+    Один штрих кисти: от нажатия до отпускания кнопки мыши.
+
+    Точки хранятся плоским типизированным массивом (x0, y0, x1, y1, ...) в пикселях
+    изображения, по 8 байт на точку вместо кортежа на каждый сегмент.
+    Завершенный штрих не изменяется, поэтому истории достаточно хранить ссылки на него.
+    """
+
+    __slots__ = ("color", "brush_size", "points")
+
+    def __init__(self, color, brush_size, points=()):
+        """
+        Args:
+            color (str): Цвет штриха.
+            brush_size (int): Толщина линии.
+            points (iterable): Плоская последовательность координат.
+        """
+        self.color = color
+        self.brush_size = brush_size
+        self.points = array("i", points)
+
+    def add_point(self, x, y):
+        # Добавление точки в конец штриха
+        self.points.append(int(round(x)))
+        self.points.append(int(round(y)))
+
+    def last_point(self):
+        # Последняя точка штриха или None для пустого штриха
+        if not self.points:
+            return None
+        return self.points[-2], self.points[-1]
+
+    def segments(self):
+        # Сегменты штриха в виде кортежей (x1, y1, x2, y2)
+        points = self.points
+        return [(points[i], points[i + 1], points[i + 2], points[i + 3]) for i in range(0, len(points) - 2, 2)]
+
+    def simplified(self, tolerance=DEFAULT_SIMPLIFY_TOLERANCE):
+        # Новый штрих с точками, упрощенными алгоритмом Рамера-Дугласа-Пекера
+        return Stroke(self.color, self.brush_size, simplify_points(self.points, tolerance))
+
+    def transformed(self, transform, scale=1.0):
+        """
+        Новый штрих с точками, переведенными функцией transform.
+
+        Args:
+            transform (callable): (x, y) -> (x, y) в новых координатах.
+            scale (float): Во сколько раз изменяется толщина линии.
+        """
+        points = array("i")
+        for index in range(0, len(self.points), 2):
+            x, y = transform(self.points[index], self.points[index + 1])
+            points.append(int(round(x)))
+            points.append(int(round(y)))
+        return Stroke(self.color, max(1, round(self.brush_size * scale)), points)
+
+    def draw(self, draw):
+        # Отрисовка штриха одной ломаной со скругленными соединениями
+        if len(self.points) >= 4:
+            draw.line(self.points.tolist(), fill=self.color, width=self.brush_size, joint="curve")
+
+    def nbytes(self):
+        # Объем памяти точек штриха в байтах
+        return len(self.points) * self.points.itemsize
+
+    def __len__(self):
+        return len(self.points) // 2
+
+    def __eq__(self, other):
+        if not isinstance(other, Stroke):
+            return NotImplemented
+        return self.color == other.color and self.brush_size == other.brush_size and self.points == other.points
+
+    def __repr__(self):
+        return f"Stroke(color={self.color!r}, brush_size={self.brush_size}, points={len(self)})"
+
+def simplify_points(points, tolerance):
+    """
+    Упрощает ломаную алгоритмом Рамера-Дугласа-Пекера.
+
+    Args:
+        points (array): Плоский массив координат (x0, y0, x1, y1, ...).
+        tolerance (float): Максимальное отклонение удаленных точек от результата в пикселях.
+
+    Returns:
+        array: Плоский массив оставшихся координат; первая и последняя точки сохраняются всегда.
+    """
+    count = len(points) // 2
+    if count < 3 or tolerance <= 0:
+        return array("i", points)
+
+    keep = bytearray(count)
+    keep[0] = keep[-1] = 1
+    tolerance_squared = tolerance * tolerance
+    # Обход отрезков через стек вместо рекурсии: длинные штрихи не упираются в лимит глубины
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        x1, y1 = points[2 * first], points[2 * first + 1]
+        dx, dy = points[2 * last] - x1, points[2 * last + 1] - y1
+        length_squared = dx * dx + dy * dy
+        farthest, farthest_distance = None, -1.0
+        for index in range(first + 1, last):
+            px, py = points[2 * index] - x1, points[2 * index + 1] - y1
+            if length_squared:
+                cross = dx * py - dy * px
+                distance = cross * cross / length_squared
+            else:
+                distance = px * px + py * py
+            if distance > farthest_distance:
+                farthest, farthest_distance = index, distance
+        if farthest is not None and farthest_distance > tolerance_squared:
+            keep[farthest] = 1
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+
+    simplified = array("i")
+    for index in range(count):
+        if keep[index]:
+            simplified.append(points[2 * index])
+            simplified.append(points[2 * index + 1])
+    return simplified
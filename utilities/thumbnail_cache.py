@@ -0,0 +1,213 @@
+"""
+Постоянный кэш миниатюр изображений на диске.
+
+Миниатюра хранится в отдельном файле, имя которого - хэш пути к изображению, времени
+его изменения и размера файла: измененный файл получает новую миниатюру, а старая
+со временем вытесняется. Время изменения файла миниатюры обновляется при каждом
+обращении, поэтому при превышении лимита объема удаляются давно не использованные.
+
+Миниатюры строятся с декодированием в уменьшенном масштабе там, где формат это
+позволяет (JPEG декодируется сразу в 1/2-1/8 размера).
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from PIL import Image
+from utilities.tiled_image import open_image
+
+# Большая сторона миниатюры в пикселях
+THUMBNAIL_SIDE = 128
+
+# Лимит объема кэша на диске
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+# После превышения лимита кэш сокращается до этой доли лимита, чтобы не чистить его при каждой записи
+EVICTION_TARGET = 0.9
+
+# Расширения файлов миниатюр: JPEG для изображений без прозрачности, PNG - с прозрачностью
+CACHE_EXTENSIONS = (".jpg", ".png")
+
+def default_cache_dir():
+    # Каталог кэша: PHOTO_EDITOR_THUMBNAIL_CACHE или пользовательский каталог кэша системы
+    directory = os.environ.get("PHOTO_EDITOR_THUMBNAIL_CACHE")
+    if directory:
+        return directory
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "photo_editor", "thumbnails")
+
+def list_images(directory):
+    """
+    Файлы изображений в каталоге (без подкаталогов), отсортированные по имени.
+
+    Изображением считается файл с расширением формата, который Pillow умеет открывать.
+    """
+    extensions = {extension for extension, image_format in Image.registered_extensions().items() if image_format in Image.OPEN}
+    with os.scandir(directory) as entries:
+        paths = [entry.path for entry in entries
+                 if entry.is_file() and os.path.splitext(entry.name)[1].lower() in extensions]
+    return sorted(paths, key=lambda path: os.path.basename(path).casefold())
+
+def make_thumbnail(path, side=THUMBNAIL_SIDE):
+    """
+    Строит миниатюру изображения с большей стороной не больше side.
+
+    Returns:
+        PIL.Image.Image: Миниатюра в режиме RGB, RGBA или L.
+    """
+    with open_image(path) as image:
+        # С reducing_gap thumbnail() сначала вызывает draft(): JPEG декодируется сразу
+        # в уменьшенном масштабе (не меньше чем в reducing_gap раз больше миниатюры)
+        image.thumbnail((side, side), Image.BILINEAR, reducing_gap=2.0)
+        if image.mode in ("RGB", "RGBA", "L"):
+            return image.copy()
+        has_alpha = "A" in image.getbands() or "transparency" in image.info
+        return image.convert("RGBA" if has_alpha else "RGB")
+
+class ThumbnailCache:
+    """Кэш миниатюр в каталоге на диске с ограничением объема; безопасен для нескольких потоков."""
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_CACHE_BYTES, side=THUMBNAIL_SIDE):
+        """
+        Args:
+            directory (str): Каталог кэша; по умолчанию default_cache_dir().
+            max_bytes (int): Лимит суммарного объема файлов миниатюр.
+            side (int): Большая сторона миниатюры.
+        """
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.side = side
+        self._lock = threading.Lock()
+        # Суммарный объем файлов кэша; считается при первой записи
+        self._total_bytes = None
+
+    def key(self, path):
+        # Ключ миниатюры: путь, время изменения и размер исходного файла, размер миниатюры
+        stat = os.stat(path)
+        identity = f"{os.path.abspath(path)}\0{stat.st_mtime_ns}\0{stat.st_size}\0{self.side}"
+        return hashlib.sha1(identity.encode("utf-8", "surrogatepass")).hexdigest()
+
+    def _entry_path(self, key, extension):
+        return os.path.join(self.directory, key[:2], key + extension)
+
+    def get(self, path):
+        """Миниатюра из кэша или None, если ее нет (или исходный файл изменился)."""
+        key = self.key(path)
+        for extension in CACHE_EXTENSIONS:
+            entry_path = self._entry_path(key, extension)
+            try:
+                with Image.open(entry_path) as image:
+                    image.load()
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                # Поврежденный файл (например, после сбоя диска) удаляется и строится заново
+                logging.warning(f"Поврежденная миниатюра {entry_path}: {e}")
+                self._remove(entry_path)
+                continue
+            try:
+                # Отметка обращения для вытеснения давно не использованных миниатюр
+                os.utime(entry_path)
+            except OSError:
+                pass
+            return image
+        return None
+
+    def put(self, path, thumbnail):
+        """Сохраняет миниатюру изображения path; запись атомарна, лимит объема соблюдается."""
+        key = self.key(path)
+        extension = ".png" if thumbnail.mode == "RGBA" else ".jpg"
+        entry_path = self._entry_path(key, extension)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(suffix=".part", dir=os.path.dirname(entry_path))
+        try:
+            with os.fdopen(file_descriptor, "wb") as temp_file:
+                if extension == ".png":
+                    thumbnail.save(temp_file, format="PNG", compress_level=1)
+                else:
+                    thumbnail.save(temp_file, format="JPEG", quality=85)
+            os.replace(temp_path, entry_path)
+        except BaseException:
+            self._remove(temp_path)
+            raise
+        size = os.path.getsize(entry_path)
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_bytes()
+            else:
+                self._total_bytes += size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def thumbnail(self, path):
+        """Миниатюра изображения path: из кэша или построенная и сохраненная в кэш."""
+        cached = self.get(path)
+        if cached is not None:
+            return cached
+        thumbnail = make_thumbnail(path, self.side)
+        try:
+            self.put(path, thumbnail)
+        except OSError as e:
+            # Кэш недоступен для записи: миниатюра все равно показывается
+            logging.warning(f"Не удалось сохранить миниатюру {path}: {e}")
+        return thumbnail
+
+    def total_bytes(self):
+        # Суммарный объем файлов кэша
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_bytes()
+            return self._total_bytes
+
+    def clear(self):
+        # Удаление всех миниатюр
+        with self._lock:
+            for entry_path, _, _ in self._entries():
+                self._remove(entry_path)
+            self._total_bytes = 0
+
+    def _entries(self):
+        # Файлы миниатюр: (путь, время последнего обращения, размер)
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        with os.scandir(self.directory) as buckets:
+            for bucket in buckets:
+                if not bucket.is_dir():
+                    continue
+                with os.scandir(bucket.path) as files:
+                    for entry in files:
+                        if entry.name.endswith(CACHE_EXTENSIONS):
+                            try:
+                                stat = entry.stat()
+                            except OSError:
+                                continue
+                            entries.append((entry.path, stat.st_mtime_ns, stat.st_size))
+        return entries
+
+    def _scan_bytes(self):
+        return sum(size for _, _, size in self._entries())
+
+    def _evict(self):
+        # Удаление давно не использованных миниатюр до EVICTION_TARGET лимита (под self._lock)
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        target = self.max_bytes * EVICTION_TARGET
+        removed = 0
+        for entry_path, _, size in entries:
+            if total <= target:
+                break
+            if self._remove(entry_path):
+                total -= size
+                removed += 1
+        self._total_bytes = total
+        logging.debug("Из кэша миниатюр удалено %d файлов, объем %d байт", removed, total)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
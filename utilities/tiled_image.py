@@ -0,0 +1,361 @@
+import collections
+import logging
+import os
+import struct
+import threading
+import time
+from PIL import Image
+
+# Сторона плитки по умолчанию для обработки и сохранения
+DEFAULT_TILE_SIZE = 512
+
+# Режимы, которые можно сохранить потоковой записью в плиточный TIFF
+TIFF_MODES = {"L": (1, 1, ()), "LA": (1, 2, (2,)), "RGB": (2, 3, ()), "RGBA": (2, 4, (2,))}
+
+# Наибольшее число пикселей документа: редактор работает со сканами и панорамами
+# больше ограничения Pillow по умолчанию (Image.MAX_IMAGE_PIXELS)
+MAX_DOCUMENT_PIXELS = 2_000_000_000
+
+def configure_pixel_limit(max_pixels=MAX_DOCUMENT_PIXELS):
+    """
+    Настраивает ограничение Pillow на размер открываемых изображений.
+
+    Вызывается один раз при запуске приложения, до появления фоновых потоков.
+    Pillow предупреждает об изображениях больше Image.MAX_IMAGE_PIXELS и отказывается
+    открывать изображения больше удвоенного значения, поэтому отказ наступает на max_pixels.
+
+    Args:
+        max_pixels (int): Наибольшее число пикселей изображения.
+    """
+    Image.MAX_IMAGE_PIXELS = max_pixels // 2
+
+def open_image(path, max_pixels=MAX_DOCUMENT_PIXELS):
+    """
+    Открывает изображение с проверкой числа пикселей до декодирования.
+
+    Глобальное ограничение Pillow не изменяется: Image.open проверяет его как обычно,
+    а ограничение max_pixels проверяется дополнительно по размеру из заголовка файла.
+
+    Args:
+        path (str): Путь к изображению.
+        max_pixels (int): Наибольшее число пикселей; None - без дополнительной проверки.
+
+    Returns:
+        PIL.Image.Image: Открытое (еще не декодированное) изображение.
+
+    Raises:
+        PIL.Image.DecompressionBombError: Если изображение больше ограничения.
+    """
+    image = Image.open(path)
+    if max_pixels is not None and image.width * image.height > max_pixels:
+        image.close()
+        raise Image.DecompressionBombError(f"Изображение {image.size} больше ограничения {max_pixels} пикселей")
+    return image
+
+class TiledImage:
+    """
+    Изображение, декодируемое по частям по мере обращения.
+
+    Для несжатых форматов (TIFF без сжатия, BMP, PPM и т. п.) декодируются только
+    полосы или плитки файла, пересекающие запрошенную область, поэтому пиковая
+    память зависит от размера плитки, а не от размера изображения. Для сжатых
+    форматов (JPEG, PNG, сжатый TIFF) Pillow не умеет декодировать часть файла:
+    изображение декодируется целиком один раз, а дальнейшая обработка все равно
+    идет по плиткам.
+    """
+
+    def __init__(self, path, tile_size=DEFAULT_TILE_SIZE, max_cached_chunks=16):
+        """
+        Args:
+            path (str): Путь к файлу изображения.
+            tile_size (int): Сторона плитки для обработки.
+            max_cached_chunks (int): Число декодированных частей файла, хранимых в памяти.
+        """
+        self.path = path
+        self.tile_size = tile_size
+        self.max_cached_chunks = max_cached_chunks
+        with open_image(path) as image:
+            self.size = image.size
+            self.mode = image.mode
+            self.format = image.format
+            self._chunks = self._split_chunks(image)
+        self._cache = collections.OrderedDict()
+        self._full_image = None
+        self._lock = threading.Lock()
+
+    @property
+    def width(self):
+        return self.size[0]
+
+    @property
+    def height(self):
+        return self.size[1]
+
+    @property
+    def supports_regions(self):
+        # True, если файл можно декодировать по частям
+        return self._chunks is not None
+
+    def _split_chunks(self, image):
+        # Разбиение описателей данных файла на независимо декодируемые части
+        tiles = list(image.tile)
+        if not tiles or any(tile[0] != "raw" for tile in tiles):
+            return None
+        chunks = []
+        for codec, extents, offset, args in tiles:
+            if isinstance(args, str):
+                args = (args, 0, 1)
+            rawmode, stride, ystep = (tuple(args) + (0, 1))[:3]
+            left, top, right, bottom = extents
+            if len(tiles) > 1 or bottom - top <= self.tile_size:
+                chunks.append(((left, top, right, bottom), (codec, offset, (rawmode, stride, ystep))))
+                continue
+            # Один несжатый блок на все изображение делится на полосы по tile_size строк
+            if not stride:
+                stride = self._raw_stride(image.mode, rawmode, right - left)
+                if stride is None:
+                    return None
+            height = bottom - top
+            for band_top in range(top, bottom, self.tile_size):
+                band_bottom = min(band_top + self.tile_size, bottom)
+                if ystep >= 0:
+                    band_offset = offset + (band_top - top) * stride
+                else:
+                    band_offset = offset + (height - (band_bottom - top)) * stride
+                chunks.append(((left, band_top, right, band_bottom), (codec, band_offset, (rawmode, stride, ystep))))
+        return chunks
+
+    @staticmethod
+    def _raw_stride(mode, rawmode, width):
+        # Длина строки в байтах для несжатых данных; None, если ее нельзя определить
+        try:
+            return len(Image.new(mode, (width, 1)).tobytes("raw", rawmode))
+        except Exception:
+            return None
+
+    def _decode_chunk(self, index):
+        # Декодирование одной части файла в отдельное изображение ее размера
+        with self._lock:
+            chunk_image = self._cache.get(index)
+            if chunk_image is not None:
+                self._cache.move_to_end(index)
+                return chunk_image
+        box, (codec, offset, (rawmode, stride, ystep)) = self._chunks[index]
+        size = (box[2] - box[0], box[3] - box[1])
+        stride = stride or self._raw_stride(self.mode, rawmode, size[0])
+        # Несжатые строки части лежат в файле подряд: читаются только они и
+        # распаковываются тем же декодером "raw", что и при полной загрузке
+        with open(self.path, "rb") as source:
+            source.seek(offset)
+            data = source.read(stride * size[1])
+        chunk_image = Image.frombytes(self.mode, size, data, codec, rawmode, stride, ystep)
+        with self._lock:
+            self._cache[index] = chunk_image
+            while len(self._cache) > self.max_cached_chunks:
+                self._cache.popitem(last=False)
+        return chunk_image
+
+    def _load_full(self):
+        # Полное декодирование для форматов без доступа к частям файла
+        with self._lock:
+            if self._full_image is None:
+                logging.info(f"Формат {self.format} не поддерживает частичное декодирование, файл декодируется целиком")
+                with open_image(self.path) as source:
+                    source.load()
+                    self._full_image = source.copy()
+            return self._full_image
+
+    def read_region(self, box):
+        """
+        Возвращает область изображения в исходном разрешении.
+
+        Args:
+            box (tuple): Область (x0, y0, x1, y1); выходящие за изображение части заполняются нулями.
+
+        Returns:
+            PIL.Image.Image: Изображение области.
+        """
+        box = tuple(int(value) for value in box)
+        if not self.supports_regions:
+            return self._load_full().crop(box)
+        region = Image.new(self.mode, (box[2] - box[0], box[3] - box[1]))
+        for index, (chunk_box, _) in enumerate(self._chunks):
+            left = max(box[0], chunk_box[0])
+            top = max(box[1], chunk_box[1])
+            right = min(box[2], chunk_box[2], self.width)
+            bottom = min(box[3], chunk_box[3], self.height)
+            if left >= right or top >= bottom:
+                continue
+            chunk_image = self._decode_chunk(index)
+            part = chunk_image.crop((left - chunk_box[0], top - chunk_box[1], right - chunk_box[0], bottom - chunk_box[1]))
+            region.paste(part, (left - box[0], top - box[1]))
+        return region
+
+    def iter_tiles(self, tile_size=None):
+        """
+        Перебирает плитки изображения построчно.
+
+        Yields:
+            tuple: Область плитки (x0, y0, x1, y1) в координатах изображения.
+        """
+        tile_size = tile_size or self.tile_size
+        for top in range(0, self.height, tile_size):
+            for left in range(0, self.width, tile_size):
+                yield (left, top, min(left + tile_size, self.width), min(top + tile_size, self.height))
+
+    def reduced(self, max_side):
+        """
+        Строит уменьшенную копию всего изображения, обрабатывая его по плиткам.
+
+        Args:
+            max_side (int): Максимальная длина большей стороны результата.
+
+        Returns:
+            PIL.Image.Image: Уменьшенное изображение.
+        """
+        scale = min(max_side / max(self.size), 1.0)
+        target_size = (max(1, round(self.width * scale)), max(1, round(self.height * scale)))
+        if not self.supports_regions:
+            with open_image(self.path) as source:
+                # Для JPEG декодирование сразу в уменьшенном масштабе
+                source.draft(self.mode, target_size)
+                return source.resize(target_size, Image.LANCZOS, reducing_gap=3.0)
+
+        # Каждая плитка уменьшается в целое число раз, итог - одно изменение размера
+        factor = max(1, int(1 / scale) if scale < 1.0 else 1)
+        tile_size = self.tile_size - self.tile_size % factor or factor
+        intermediate = Image.new(self.mode, (-(-self.width // factor), -(-self.height // factor)))
+        for box in self.iter_tiles(tile_size):
+            tile = self.read_region(box)
+            if factor > 1:
+                tile = tile.reduce(factor)
+            intermediate.paste(tile, (box[0] // factor, box[1] // factor))
+        if intermediate.size == target_size:
+            return intermediate
+        return intermediate.resize(target_size, Image.LANCZOS)
+
+    def save_tiled_tiff(self, path, process=None, halo=0):
+        """
+        Потоково сохраняет изображение в несжатый плиточный TIFF.
+
+        В памяти одновременно находится только одна плитка (с полями halo).
+
+        Args:
+            path (str): Путь к файлу результата.
+            process (callable): Обработка плитки: принимает изображение плитки с полями
+                и возвращает изображение того же размера и режима.
+            halo (int): Ширина полей вокруг плитки для фильтров с окрестностью (размытие).
+
+        Returns:
+            dict: Путь (path), размер файла в байтах (bytes) и время сохранения в секундах (seconds).
+        """
+        started = time.perf_counter()
+        with TiledTiffWriter(path, self.size, self.mode, self.tile_size) as writer:
+            for box in self.iter_tiles():
+                if process is None:
+                    tile = self.read_region(box)
+                else:
+                    expanded = (max(0, box[0] - halo), max(0, box[1] - halo),
+                                min(self.width, box[2] + halo), min(self.height, box[3] + halo))
+                    tile = process(self.read_region(expanded))
+                    tile = tile.crop((box[0] - expanded[0], box[1] - expanded[1],
+                                      box[2] - expanded[0], box[3] - expanded[1]))
+                writer.write_tile(tile)
+        return {"path": path, "bytes": os.path.getsize(path), "seconds": time.perf_counter() - started}
+
+class TiledTiffWriter:
+    """
+    Потоковая запись несжатого плиточного TIFF.
+
+    Плитки передаются построчно (слева направо, сверху вниз); каталог TIFF
+    записывается в конце файла, поэтому все изображение в памяти не нужно.
+    """
+
+    def __init__(self, path, size, mode, tile_size=DEFAULT_TILE_SIZE):
+        if mode not in TIFF_MODES:
+            raise ValueError(f"Режим {mode} не поддерживается для плиточного TIFF")
+        if tile_size % 16:
+            raise ValueError("Размер плитки TIFF должен быть кратен 16")
+        self.path = path
+        self.size = size
+        self.mode = mode
+        self.tile_size = tile_size
+        self.offsets = []
+        self.byte_counts = []
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "wb")
+        # Заголовок; смещение каталога заполняется при закрытии
+        self._file.write(b"II*\x00\x00\x00\x00\x00")
+        return self
+
+    def write_tile(self, tile):
+        # Запись очередной плитки; крайние плитки дополняются до полного размера
+        if tile.size != (self.tile_size, self.tile_size):
+            padded = Image.new(self.mode, (self.tile_size, self.tile_size))
+            padded.paste(tile, (0, 0))
+            tile = padded
+        data = tile.tobytes()
+        offset = self._file.tell()
+        if offset + len(data) > 0xFFFFFFFF:
+            raise ValueError("Файл TIFF превышает 4 ГБ")
+        self.offsets.append(offset)
+        self.byte_counts.append(len(data))
+        self._file.write(data)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self._write_directory()
+        finally:
+            self._file.close()
+        return False
+
+    def _write_directory(self):
+        # Запись каталога (IFD) с описанием плиток
+        photometric, samples, extra_samples = TIFF_MODES[self.mode]
+        tiles_across = -(-self.size[0] // self.tile_size)
+        tiles_down = -(-self.size[1] // self.tile_size)
+        if len(self.offsets) != tiles_across * tiles_down:
+            raise ValueError(f"Записано {len(self.offsets)} плиток из {tiles_across * tiles_down}")
+
+        # (тег, тип, значения); тип 3 - SHORT, 4 - LONG
+        entries = [
+            (256, 4, [self.size[0]]),
+            (257, 4, [self.size[1]]),
+            (258, 3, [8] * samples),
+            (259, 3, [1]),
+            (262, 3, [photometric]),
+            (277, 3, [samples]),
+            (284, 3, [1]),
+            (322, 4, [self.tile_size]),
+            (323, 4, [self.tile_size]),
+            (324, 4, self.offsets),
+            (325, 4, self.byte_counts),
+        ]
+        if extra_samples:
+            entries.append((338, 3, list(extra_samples)))
+
+        directory_offset = self._file.tell()
+        directory_offset += directory_offset % 2
+        directory_size = 2 + len(entries) * 12 + 4
+        extra_offset = directory_offset + directory_size
+        directory = struct.pack("<H", len(entries))
+        extra_data = b""
+        for tag, field_type, values in entries:
+            fmt = "<%d%s" % (len(values), "H" if field_type == 3 else "L")
+            packed = struct.pack(fmt, *values)
+            if len(packed) <= 4:
+                directory += struct.pack("<HHL", tag, field_type, len(values)) + packed.ljust(4, b"\x00")
+            else:
+                directory += struct.pack("<HHLL", tag, field_type, len(values), extra_offset + len(extra_data))
+                extra_data += packed
+        directory += struct.pack("<L", 0)
+
+        self._file.seek(0, 2)
+        if self._file.tell() % 2:
+            self._file.write(b"\x00")
+        self._file.write(directory + extra_data)
+        self._file.seek(4)
+        self._file.write(struct.pack("<L", directory_offset))
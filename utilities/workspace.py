@@ -0,0 +1,247 @@
+"""
+Рабочая область из нескольких открытых документов.
+
+В памяти находятся только пиксели активного документа: он живет в полях PhotoEditor.
+Изображения неактивных документов выгружаются в несжатые файлы во временном каталоге;
+версии графа правки в истории документа остаются в памяти, а снимки их изображений
+выгружаются на диск вместе с документом. При переключении файл
+отображается в память (mmap) и изображение создается поверх отображения без чтения
+всего файла; для режимов, которые Pillow не умеет отображать (например, RGB),
+пиксели декодируются прямо из отображения одним проходом.
+
+Загруженное изображение доступно только для чтения: первое изменение копирует его
+(так Pillow поступает с отображенными буферами), а неизмененное изображение при
+следующей выгрузке не записывается повторно.
+"""
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+from PIL import Image
+from utilities.render_cache import image_nbytes
+
+# Высота полосы строк, которыми изображение записывается в файл выгрузки
+PAGE_OUT_STRIP_ROWS = 256
+
+# Режимы, которые Image.frombuffer отображает из буфера без копирования
+MAPPED_MODES = ("L", "P", "RGBA", "CMYK", "I;16", "I;16L", "I;16B")
+
+# Изображения документа, выгружаемые на диск
+PAGED_FIELDS = ("image", "original_image")
+
+class PagedImage:
+    """Изображение, выгруженное в несжатый файл."""
+
+    __slots__ = ("path", "mode", "size", "palette", "info", "mapped")
+
+    def __init__(self, path, mode, size, palette, info):
+        self.path = path
+        self.mode = mode
+        self.size = size
+        self.palette = palette
+        self.info = info
+        # Изображение, созданное последним page_in (для проверки, изменялось ли оно)
+        self.mapped = None
+
+    @classmethod
+    def page_out(cls, image, directory):
+        """
+        Записывает пиксели изображения в новый файл в каталоге directory.
+
+        Запись идет полосами по PAGE_OUT_STRIP_ROWS строк, чтобы не создавать копию
+        всего изображения в памяти.
+        """
+        file_descriptor, path = tempfile.mkstemp(suffix=".page", dir=directory)
+        with os.fdopen(file_descriptor, "wb") as page_file:
+            for top in range(0, image.height, PAGE_OUT_STRIP_ROWS):
+                page_file.write(image.crop((0, top, image.width, min(top + PAGE_OUT_STRIP_ROWS, image.height))).tobytes())
+        palette = image.getpalette() if image.mode == "P" else None
+        return cls(path, image.mode, image.size, palette, dict(image.info))
+
+    def page_in(self):
+        # Создание изображения поверх отображенного в память файла
+        with open(self.path, "rb") as page_file:
+            mapping = mmap.mmap(page_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mode in MAPPED_MODES:
+            # Изображение ссылается на отображение; страницы читаются по мере обращения
+            image = Image.frombuffer(self.mode, self.size, mapping, "raw", self.mode, 0, 1)
+        else:
+            image = Image.frombytes(self.mode, self.size, mapping)
+            mapping.close()
+            # Как и у отображенных изображений, первое изменение создает копию,
+            # а неизмененное изображение не записывается при следующей выгрузке
+            image.readonly = 1
+        if self.palette is not None:
+            image.putpalette(self.palette)
+        image.info.update(self.info)
+        self.mapped = image
+        return image
+
+    def is_unchanged(self, image):
+        # True, если image - отображенное изображение, которое с тех пор не изменялось
+        return image is self.mapped and image.readonly
+
+    def discard(self):
+        # Удаление файла выгрузки
+        self.mapped = None
+        try:
+            os.remove(self.path)
+        except OSError as e:
+            # В Windows файл, отображенный в память, удаляется только после закрытия отображения
+            logging.warning(f"Не удалось удалить файл выгрузки {self.path}: {e}")
+
+class Document:
+    """Открытый документ: состояние PhotoEditor.get_document_state() и выгруженные изображения."""
+
+    __slots__ = ("state", "pages")
+
+    def __init__(self, state):
+        self.state = state
+        self.pages = {}
+
+    @property
+    def name(self):
+        path = self.state.get("image_path")
+        return os.path.basename(path) if path else "Без имени"
+
+class Workspace:
+    """
+    Список открытых документов PhotoEditor, из которых активен один.
+
+    Состояние активного документа хранится в самом редакторе; Document активного
+    документа обновляется при переключении.
+    """
+
+    def __init__(self, editor, scratch_dir=None):
+        """
+        Args:
+            editor: PhotoEditor, с которым работает рабочая область.
+            scratch_dir (str): Каталог для файлов выгрузки; по умолчанию временный
+                каталог создается при первой выгрузке и удаляется в close_all().
+        """
+        self.editor = editor
+        self._scratch_dir = scratch_dir
+        self._owns_scratch_dir = scratch_dir is None
+        self.documents = [Document({})]
+        self.active = 0
+
+    @property
+    def scratch_dir(self):
+        if self._scratch_dir is None:
+            self._scratch_dir = tempfile.mkdtemp(prefix="photo_editor_workspace_")
+        return self._scratch_dir
+
+    def __len__(self):
+        return len(self.documents)
+
+    def names(self):
+        names = [document.name for document in self.documents]
+        if self.editor.image_path:
+            names[self.active] = os.path.basename(self.editor.image_path)
+        return names
+
+    def new_document(self):
+        """Открывает пустой документ и делает его активным; возвращает его индекс."""
+        self._deactivate()
+        self.documents.append(Document(self.editor.blank_document_state()))
+        self.active = len(self.documents) - 1
+        self._activate()
+        return self.active
+
+    def switch_to(self, index):
+        """Делает документ index активным, выгружая текущий."""
+        if index == self.active:
+            return
+        if not 0 <= index < len(self.documents):
+            raise IndexError(f"Нет документа с номером {index}")
+        self._deactivate()
+        self.active = index
+        self._activate()
+        logging.info("Активный документ: %s", self.documents[index].name)
+
+    def close(self, index=None):
+        """Закрывает документ (по умолчанию активный); последний документ заменяется пустым."""
+        index = self.active if index is None else index
+        if index == self.active:
+            self._release(self.documents[index], self.editor.get_document_state())
+            del self.documents[index]
+            if not self.documents:
+                self.documents.append(Document(self.editor.blank_document_state()))
+            self.active = min(index, len(self.documents) - 1)
+            self._activate()
+        else:
+            self._release(self.documents[index], self.documents[index].state)
+            del self.documents[index]
+            if index < self.active:
+                self.active -= 1
+
+    def close_all(self):
+        # Освобождение всех выгруженных документов и каталога выгрузки (при выходе из приложения)
+        for index, document in enumerate(self.documents):
+            if index != self.active:
+                self._release(document, document.state)
+        self.documents = [self.documents[self.active]]
+        self.active = 0
+        if self._owns_scratch_dir and self._scratch_dir is not None:
+            shutil.rmtree(self._scratch_dir, ignore_errors=True)
+            self._scratch_dir = None
+
+    def resident_bytes(self):
+        # Объем пикселей документов в памяти (неактивные документы выгружены)
+        total = 0
+        for index, document in enumerate(self.documents):
+            state = self.editor.get_document_state() if index == self.active else document.state
+            for field in PAGED_FIELDS:
+                image = state.get(field)
+                if image is not None and not image.readonly:
+                    total += image_nbytes(image)
+        return total
+
+    def paged_bytes(self):
+        # Объем файлов выгрузки на диске
+        return sum(os.path.getsize(page.path) for document in self.documents for page in document.pages.values())
+
+    def _deactivate(self):
+        # Сохранение состояния активного документа и выгрузка его пикселей и истории
+        document = self.documents[self.active]
+        state = self.editor.get_document_state()
+        for field in PAGED_FIELDS:
+            image = state.get(field)
+            page = document.pages.get(field)
+            if image is None:
+                if page is not None:
+                    page.discard()
+                    del document.pages[field]
+                continue
+            if page is None or not page.is_unchanged(image):
+                if page is not None:
+                    page.discard()
+                document.pages[field] = PagedImage.page_out(image, self.scratch_dir)
+            document.pages[field].mapped = None
+            state[field] = None
+        if state.get("history") is not None:
+            state["history"].spill()
+        # Результаты рендера относятся к выгруженному документу и только занимали бы память
+        self.editor.render_cache.clear()
+        document.state = state
+        logging.debug("Документ %s выгружен: %d байт на диске", document.name, self.paged_bytes())
+
+    def _activate(self):
+        # Загрузка пикселей активного документа и передача его состояния редактору
+        document = self.documents[self.active]
+        state = dict(document.state)
+        for field, page in document.pages.items():
+            state[field] = page.page_in()
+        if not state:
+            state = self.editor.blank_document_state()
+        self.editor.set_document_state(state)
+        document.state = {}
+
+    def _release(self, document, state):
+        # Освобождение файлов выгрузки и истории документа
+        for page in document.pages.values():
+            page.discard()
+        document.pages.clear()
+        if state.get("history") is not None:
+            state["history"].clear()